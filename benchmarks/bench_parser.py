@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+商品解析器基準測試
+
+比較舊版逐項 dict.get 解析（不校驗字段）與按 FieldSpec 規則校驗的 ProductParser 在 10k 商品上的耗時。
+用法: python benchmarks/bench_parser.py [--items 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.popmart_api_client import PopmartProduct
+from src.services.product_parser import ProductParser
+
+
+def generate_raw_items(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """生成與上游 API 結構相同的原始商品數據"""
+    rng = random.Random(seed)
+    brands = ["SKULLPANDA", "MOLLY", "DIMOO", "LABUBU", "PUCKY", "HIRONO"]
+    items = []
+    for i in range(count):
+        brand = rng.choice(brands)
+        price = round(rng.uniform(100, 500), 2)
+        items.append({
+            'id': f"prod_{i:06d}",
+            'name': f"{brand} 系列 #{i}",
+            'description': f"{brand} 系列第 {i} 款",
+            'price': price,
+            'currency': 'HKD',
+            'original_price': price if rng.random() < 0.3 else None,
+            'discount_price': round(price * 0.8, 2) if rng.random() < 0.3 else None,
+            'image_url': f"https://example.com/images/{i}.jpg",
+            'image_urls': [f"https://example.com/images/{i}_{j}.jpg" for j in range(3)],
+            'product_url': f"https://www.popmart.com/hk/products/{i}",
+            'category_id': f"cat_{rng.randint(1, 5):02d}",
+            'category': "玩具公仔",
+            'brand_id': f"brand_{brands.index(brand) + 1:02d}",
+            'brand': brand,
+            'series': "太空系列",
+            'in_stock': rng.random() < 0.7,
+            'stock_quantity': rng.randint(0, 100),
+            'max_purchase_quantity': 5,
+            'is_new': rng.random() < 0.2,
+            'is_limited': rng.random() < 0.15,
+            'release_date': "2025-06-01",
+            'dimensions': {"height": 10.0, "width": 5.0, "depth": 5.0},
+            'weight': 0.2,
+            'material': "PVC",
+            'tags': ["公仔", brand],
+            'sku': f"SKU{i}",
+            'barcode': f"BAR{i}",
+            'view_count': rng.randint(100, 10000),
+            'like_count': rng.randint(10, 1000),
+            'review_count': rng.randint(0, 100),
+            'average_rating': round(rng.uniform(3.5, 5.0), 2)
+        })
+    return items
+
+
+def legacy_parse_product_data(item: Dict[str, Any]) -> PopmartProduct:
+    """舊版解析實現（逐字段 dict.get），作為對照"""
+    return PopmartProduct(
+        id=item.get('id', ''),
+        name=item.get('name', ''),
+        description=item.get('description', ''),
+        price=float(item.get('price', 0)),
+        currency=item.get('currency', 'HKD'),
+        original_price=float(item.get('original_price')) if item.get('original_price') else None,
+        discount_price=float(item.get('discount_price')) if item.get('discount_price') else None,
+        image_url=item.get('image_url', ''),
+        image_urls=item.get('image_urls', []),
+        video_url=item.get('video_url'),
+        product_url=item.get('product_url', ''),
+        category_id=item.get('category_id'),
+        category_name=item.get('category', ''),
+        brand_id=item.get('brand_id'),
+        brand_name=item.get('brand', ''),
+        series=item.get('series'),
+        in_stock=item.get('in_stock', True),
+        stock_quantity=item.get('stock_quantity'),
+        max_purchase_quantity=item.get('max_purchase_quantity'),
+        is_new=item.get('is_new', False),
+        is_limited=item.get('is_limited', False),
+        is_pre_order=item.get('is_pre_order', False),
+        is_blind_box=item.get('is_blind_box', False),
+        release_date=item.get('release_date'),
+        pre_order_start=item.get('pre_order_start'),
+        pre_order_end=item.get('pre_order_end'),
+        dimensions=item.get('dimensions'),
+        weight=item.get('weight'),
+        material=item.get('material'),
+        tags=item.get('tags', []),
+        sku=item.get('sku'),
+        barcode=item.get('barcode'),
+        view_count=item.get('view_count', 0),
+        like_count=item.get('like_count', 0),
+        review_count=item.get('review_count', 0),
+        average_rating=item.get('average_rating', 0.0)
+    )
+
+
+def legacy_parse_page(items: List[Dict[str, Any]]) -> List[PopmartProduct]:
+    """舊版逐項 try/except 解析循環"""
+    products = []
+    for item in items:
+        try:
+            products.append(legacy_parse_product_data(item))
+        except Exception:
+            continue
+    return products
+
+
+def best_of(func, repeat: int) -> float:
+    """取多次運行中的最短耗時"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="商品解析器基準測試")
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    items = generate_raw_items(args.items)
+    product_parser = ProductParser(PopmartProduct)
+
+    legacy = best_of(lambda: legacy_parse_page(items), args.repeat)
+    validated = best_of(lambda: product_parser.parse_page(items), args.repeat)
+
+    print(f"商品數: {args.items}")
+    print(f"舊版解析:       {legacy * 1000:.1f} ms ({args.items / legacy:,.0f} 項/秒)")
+    print(f"ProductParser: {validated * 1000:.1f} ms ({args.items / validated:,.0f} 項/秒)")
+    print(f"耗時比: {validated / legacy:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+PopmartProduct 內存與構造耗時基準測試
+
+比較舊版普通 dataclass（每實例 __dict__、三次 datetime.now()、asdict）
+與 slots 版本（駐留分類字符串、輪次時間戳、淺拷貝 to_dict）在 100k 商品上的表現。
+用法: python benchmarks/bench_product_model.py [--products 100000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.popmart_api_client import PopmartProduct
+from src.services.product_parser import ProductParser
+
+from bench_parser import generate_raw_items
+
+
+@dataclass
+class LegacyPopmartProduct:
+    """舊版商品數據結構（對照組）"""
+    id: str
+    name: str
+    price: float
+    currency: str = "HKD"
+    original_price: Optional[float] = None
+    discount_price: Optional[float] = None
+    image_url: str = ""
+    image_urls: List[str] = None
+    video_url: Optional[str] = None
+    product_url: str = ""
+    category_id: Optional[str] = None
+    category_name: Optional[str] = None
+    brand_id: Optional[str] = None
+    brand_name: Optional[str] = None
+    series: Optional[str] = None
+    in_stock: bool = True
+    stock_quantity: Optional[int] = None
+    max_purchase_quantity: Optional[int] = None
+    is_new: bool = False
+    is_limited: bool = False
+    is_pre_order: bool = False
+    is_blind_box: bool = False
+    release_date: Optional[str] = None
+    pre_order_start: Optional[str] = None
+    pre_order_end: Optional[str] = None
+    dimensions: Optional[Dict[str, float]] = None
+    weight: Optional[float] = None
+    material: Optional[str] = None
+    tags: List[str] = None
+    sku: Optional[str] = None
+    barcode: Optional[str] = None
+    view_count: int = 0
+    like_count: int = 0
+    review_count: int = 0
+    average_rating: float = 0.0
+    description: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    last_checked: str = ""
+
+    def __post_init__(self):
+        if self.tags is None:
+            self.tags = []
+        if self.image_urls is None:
+            self.image_urls = []
+        if self.dimensions is None:
+            self.dimensions = {}
+        if not self.last_checked:
+            self.last_checked = datetime.now().isoformat()
+        if not self.created_at:
+            self.created_at = datetime.now().isoformat()
+        self.updated_at = datetime.now().isoformat()
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def fresh_items(count: int) -> List[Dict[str, Any]]:
+    """生成原始數據，並讓分類字符串成為獨立對象（模擬 JSON 解碼結果）"""
+    items = generate_raw_items(count)
+    for item in items:
+        for key in ('brand', 'series', 'category', 'currency', 'material', 'category_id', 'brand_id'):
+            if isinstance(item.get(key), str):
+                item[key] = ''.join(list(item[key]))
+    return items
+
+
+def measure(label: str, build) -> Dict[str, float]:
+    """測量構造耗時與存活對象佔用的內存"""
+    # 耗時與內存分開測量，避免 tracemalloc 的開銷影響計時
+    gc.collect()
+    started = time.perf_counter()
+    products = build()
+    elapsed = time.perf_counter() - started
+    del products
+
+    gc.collect()
+    tracemalloc.start()
+    products = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for product in products:
+        product.to_dict()
+    to_dict_elapsed = time.perf_counter() - started
+
+    count = len(products)
+    result = {
+        'construct_seconds': elapsed,
+        'bytes_per_product': current / count,
+        'to_dict_seconds': to_dict_elapsed
+    }
+    print(f"{label}: 構造 {elapsed:.2f} 秒, 每商品 {current / count:,.0f} 字節, "
+          f"to_dict {to_dict_elapsed:.2f} 秒")
+    del products
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PopmartProduct 內存與構造耗時基準測試")
+    parser.add_argument('--products', type=int, default=100000)
+    args = parser.parse_args()
+    print(f"商品數: {args.products}")
+
+    legacy_parser = ProductParser(LegacyPopmartProduct)
+    slotted_parser = ProductParser(PopmartProduct)
+    timestamp = datetime.now().isoformat()
+    timestamps = {'created_at': timestamp, 'updated_at': timestamp, 'last_checked': timestamp}
+
+    items = fresh_items(args.products)
+    legacy = measure("舊版 dataclass", lambda: legacy_parser.parse_page(items))
+    items = fresh_items(args.products)
+    slotted = measure("slots 版本    ", lambda: slotted_parser.parse_page(items, **timestamps))
+
+    print(f"構造加速: {legacy['construct_seconds'] / slotted['construct_seconds']:.2f}x, "
+          f"內存節省: {1 - slotted['bytes_per_product'] / legacy['bytes_per_product']:.0%}, "
+          f"to_dict 加速: {legacy['to_dict_seconds'] / slotted['to_dict_seconds']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+MonitorService.update_products 夾具重放基準測試
+
+先對本地替身服務器錄製若干輪更新（--record），之後以錄製的真實響應與變化序列
+離線重放，按指定倍速衡量每輪耗時。也可以重放生產環境錄製的夾具。
+用法:
+    python benchmarks/bench_replay.py --record /tmp/session.ndjson.gz [--cycles 3]
+    python benchmarks/bench_replay.py --replay /tmp/session.ndjson.gz [--speed 0]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from src.models.product import db
+from src.services.fixture_recorder import summarize_fixture
+from src.services.monitor import MonitorService
+from src.services.popmart_api_client import PopmartAPIClient
+from src.services.standin_server import LatencyModel, StandinPopmartServer
+from src.services.synthetic_catalog import SyntheticCatalog
+
+
+def create_bench_app() -> Flask:
+    """內存數據庫的最小應用，供 MonitorService 寫入"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+async def run_cycles(app: Flask, api_client: PopmartAPIClient, cycles: int, keywords: List[str],
+                     between_cycles=None) -> List[float]:
+    """執行若干輪 update_products，返回每輪耗時"""
+    monitor_service = MonitorService(api_client)
+    durations = []
+    with app.app_context():
+        for cycle in range(cycles):
+            started_at = time.perf_counter()
+            await monitor_service.update_products(keywords)
+            durations.append(time.perf_counter() - started_at)
+            if between_cycles is not None:
+                await between_cycles(cycle)
+    return durations
+
+
+async def record(path: str, cycles: int, catalog_size: int, keywords: List[str]) -> List[float]:
+    """對替身服務器錄製更新輪次（每輪之間推進目錄以產生變化）"""
+    server = StandinPopmartServer(
+        catalog=SyntheticCatalog(size=catalog_size, seed=42, new_product_rate=0.002),
+        latency=LatencyModel('lognormal', 0.03, 0.5),
+        seed=42
+    )
+    base_url = await server.start()
+    api_client = PopmartAPIClient(base_url=base_url)
+    api_client.request_delay = (0, 0)
+    api_client.start_recording(path)
+
+    async def advance(cycle):
+        server.catalog.advance()
+
+    try:
+        async with api_client:
+            return await run_cycles(create_bench_app(), api_client, cycles, keywords, advance)
+    finally:
+        api_client.stop_recording()
+        await server.stop()
+
+
+async def replay(path: str, cycles: int, speed: float, keywords: List[str]) -> List[float]:
+    """以指定倍速重放夾具"""
+    api_client = PopmartAPIClient()
+    api_client.request_delay = (0, 0)
+    transport = api_client.use_replay(path, speed=speed)
+    durations = await run_cycles(create_bench_app(), api_client, cycles, keywords)
+    print(f"重放統計: {transport.get_stats()}")
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='update_products 夾具重放基準測試')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--record', metavar='PATH', help='錄製夾具到指定路徑')
+    group.add_argument('--replay', metavar='PATH', help='重放指定夾具')
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--catalog-size', type=int, default=2000)
+    parser.add_argument('--speed', type=float, default=0.0, help='重放倍速，0 表示不等待')
+    parser.add_argument('--keywords', nargs='*', default=['LABUBU', 'MOLLY'])
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    # 部分模塊導入時已配置日誌，這裡直接設置根日誌級別
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.record:
+        durations = asyncio.run(record(args.record, args.cycles, args.catalog_size, args.keywords))
+        summary = summarize_fixture(args.record)
+        print(f"已錄製 {summary['requests']} 個請求，狀態碼分佈: {summary['statuses']}")
+    else:
+        durations = asyncio.run(replay(args.replay, args.cycles, args.speed, args.keywords))
+
+    for cycle, duration in enumerate(durations, 1):
+        print(f"第 {cycle} 輪: {duration * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
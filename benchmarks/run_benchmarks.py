@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+更新流程與讀取接口基準測試套件（進程內運行，無需啟動服務器）
+
+覆蓋商品解析、_process_products（1k / 10k / 100k）、Product.to_dict、
+/api/products 分頁（Flask 測試客戶端）以及通知扇出（替身發送端）。
+結果寫入 JSON 以便跨版本比較；指定 --baseline 時任何一項的耗時超過
+基線 (1 + threshold) 倍，或 SQL 查詢數多於基線，即以非零狀態退出。
+用法:
+    python benchmarks/run_benchmarks.py [--quick] [--only parse,to_dict] [--output results.json]
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json --threshold 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 必須在導入 src.main 之前設置，使 create_app 使用內存數據庫且不自動啟動排程器
+os.environ.setdefault('POPMART_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('POPMART_SCHEDULER_AUTOSTART', '0')
+
+from src.main import app  # noqa: E402
+from src.models.product import Product, db  # noqa: E402
+from src.routes import monitor as monitor_routes  # noqa: E402
+from src.services.monitor import MonitorService  # noqa: E402
+from src.services.notification_service import NotificationService  # noqa: E402
+from src.services.popmart_api_client import PopmartAPIClient  # noqa: E402
+from src.services import query_stats  # noqa: E402
+from src.services.synthetic_catalog import SyntheticCatalog  # noqa: E402
+
+from bench_parser import generate_raw_items  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+QUICK_SIZES = (1000,)
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict[str, Dict[str, Any]]]] = {}
+
+
+def benchmark(name: str):
+    """註冊基準測試；函數返回 {結果名: 指標字典}，指標字典必須包含 seconds，可選 queries"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """多次運行取最短耗時"""
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+def reset_database():
+    """清空內存數據庫"""
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+
+def close_clients():
+    """關閉導入 src.main 與處理請求時啟動的 API 客戶端會話"""
+    async def close_all():
+        for client in (app.api_client, monitor_routes.api_client):
+            if client is not None:
+                await client.close_session()
+
+    asyncio.run(close_all())
+
+
+def seed_products(count: int):
+    """直接批量寫入 count 個商品，供讀取類基準使用"""
+    catalog = SyntheticCatalog(size=count, seed=7)
+    monitor_service = MonitorService(PopmartAPIClient())
+    with app.app_context():
+        db.session.add_all(monitor_service._create_product_from_api(p) for p in catalog.products)
+        db.session.commit()
+
+
+# ---- 基準測試 ----
+
+@benchmark('parse')
+def bench_parse(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """逐項 _parse_product_data 與整頁 parse_page"""
+    items = generate_raw_items(args.parse_items)
+    api_client = PopmartAPIClient()
+    api_client.set_cycle_timestamp()
+
+    def parse_each():
+        for item in items:
+            api_client._parse_product_data(item)
+
+    def parse_page():
+        api_client.product_parser.parse_page(items, **api_client._timestamp_fields())
+
+    results = {}
+    for name, func in (('parse_product_data', parse_each), ('parse_page', parse_page)):
+        seconds = best_of(func, args.repeat)
+        results[name] = {
+            'seconds': seconds,
+            'items': len(items),
+            'per_item_us': seconds / len(items) * 1e6
+        }
+    return results
+
+
+@benchmark('process_products')
+def bench_process_products(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """_process_products 首次入庫與再次更新（含變化檢測）"""
+    results = {}
+    for size in args.sizes:
+        reset_database()
+        catalog = SyntheticCatalog(size=size, seed=11)
+        monitor_service = MonitorService(PopmartAPIClient())
+        with app.app_context():
+            for phase in ('insert', 'update'):
+                if phase == 'update':
+                    catalog.stock_change_rate = 0.05
+                    catalog.advance()
+                collector = query_stats.start_collecting()
+                started_at = time.perf_counter()
+                asyncio.run(monitor_service._process_products(catalog.products, 'benchmark'))
+                seconds = time.perf_counter() - started_at
+                query_stats.stop_collecting(collector)
+                results[f'process_products_{phase}_{size}'] = {
+                    'seconds': seconds,
+                    'items': size,
+                    'per_item_us': seconds / size * 1e6,
+                    'queries': collector.count,
+                    'queries_per_item': collector.count / size
+                }
+    reset_database()
+    return results
+
+
+@benchmark('to_dict')
+def bench_to_dict(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """Product.to_dict 序列化"""
+    reset_database()
+    seed_products(args.read_products)
+    with app.app_context():
+        products = Product.query.all()
+        seconds = best_of(lambda: [p.to_dict() for p in products], args.repeat)
+    reset_database()
+    return {'product_to_dict': {
+        'seconds': seconds,
+        'items': len(products),
+        'per_item_us': seconds / len(products) * 1e6
+    }}
+
+
+@benchmark('api_products')
+def bench_api_products(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """/api/products 分頁讀取（Flask 測試客戶端）"""
+    reset_database()
+    seed_products(args.read_products)
+    client = app.test_client()
+    limit = 100
+    pages = max(min(args.read_products // limit, 20), 1)
+    results = {}
+    for label, page_numbers in (('first', [1] * pages), ('deep', list(range(1, pages + 1)))):
+        def fetch_pages():
+            for page in page_numbers:
+                response = client.get(f'/api/products?page={page}&limit={limit}')
+                assert response.status_code == 200, response.status_code
+        seconds = best_of(fetch_pages, args.repeat)
+        collector = query_stats.start_collecting()
+        fetch_pages()
+        query_stats.stop_collecting(collector)
+        results[f'api_products_{label}_page'] = {
+            'seconds': seconds,
+            'requests': len(page_numbers),
+            'per_request_ms': seconds / len(page_numbers) * 1e3,
+            'queries': collector.count
+        }
+    reset_database()
+    return results
+
+
+class StubResponse:
+    """替身 HTTP 響應"""
+
+    def __init__(self, status: int):
+        self.status = status
+
+    async def text(self) -> str:
+        return ''
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class StubSink:
+    """替身通知發送端：記錄請求並立即返回成功，替代 aiohttp 會話"""
+
+    def __init__(self):
+        self.sent: List[str] = []
+
+    def post(self, url: str, json: Dict[str, Any] = None, **kwargs) -> StubResponse:
+        self.sent.append(url)
+        return StubResponse(204 if 'discord' in url else 200)
+
+    async def close(self):
+        pass
+
+
+@benchmark('notification_fanout')
+def bench_notification_fanout(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """通知扇出到 Telegram 與 Discord（替身發送端）"""
+    notification_service = NotificationService({
+        'telegram': {'enabled': True, 'bot_token': 'bench-token', 'chat_id': '1'},
+        'discord': {'enabled': True, 'webhook_url': 'https://discord.com/api/webhooks/bench'}
+    })
+    sink = StubSink()
+    notification_service.session = sink
+    catalog = SyntheticCatalog(size=args.notifications, seed=13)
+    monitor_service = MonitorService(PopmartAPIClient())
+    product_data = [monitor_service._prepare_notification_data(p) for p in catalog.products]
+
+    async def fan_out():
+        for data in product_data:
+            await notification_service.send_stock_available_notification(data)
+            await notification_service.send_price_change_notification(data, data['price'] * 1.1, data['price'])
+
+    seconds = best_of(lambda: asyncio.run(fan_out()), args.repeat)
+    notifications = len(product_data) * 2
+    return {'notification_fanout': {
+        'seconds': seconds,
+        'notifications': notifications,
+        'messages_sent': len(sink.sent) // args.repeat,
+        'per_notification_us': seconds / notifications * 1e6
+    }}
+
+
+# ---- 運行與比較 ----
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    selected = args.only or list(BENCHMARKS)
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in selected:
+        print(f"運行 {name} ...", flush=True)
+        for result_name, metrics in BENCHMARKS[name](args).items():
+            results[result_name] = metrics
+            print(f"  {result_name}: {metrics['seconds'] * 1000:.1f} ms")
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'sizes': list(args.sizes),
+            'repeat': args.repeat,
+            'parse_items': args.parse_items,
+            'read_products': args.read_products,
+            'notifications': args.notifications
+        },
+        'results': results
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """與基線比較，返回超出閾值的回歸描述（耗時按閾值比較，查詢數增加即視為回歸）"""
+    regressions = []
+    for name, metrics in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('seconds'):
+            continue
+        if 'queries' in metrics and 'queries' in base and metrics['queries'] > base['queries']:
+            print(f"  {name}: 查詢數 {base['queries']} -> {metrics['queries']} 回歸")
+            regressions.append(f"{name} 查詢數從 {base['queries']} 增加到 {metrics['queries']}")
+        ratio = metrics['seconds'] / base['seconds']
+        status = '回歸' if ratio > 1 + threshold else 'OK'
+        print(f"  {name}: {base['seconds'] * 1000:.1f} ms -> {metrics['seconds'] * 1000:.1f} ms "
+              f"({ratio:.2f}x) {status}")
+        if ratio > 1 + threshold:
+            regressions.append(f"{name} 耗時為基線的 {ratio:.2f} 倍")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='更新流程與讀取接口基準測試套件')
+    parser.add_argument('--only', type=lambda v: [n for n in v.split(',') if n],
+                        help=f"只運行指定基準（逗號分隔）: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--sizes', type=lambda v: [int(n) for n in v.split(',')], default=list(DEFAULT_SIZES),
+                        help='_process_products 的商品數量（逗號分隔）')
+    parser.add_argument('--quick', action='store_true', help='只使用小規模數據，適合 CI')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--parse-items', type=int, default=10000)
+    parser.add_argument('--read-products', type=int, default=5000)
+    parser.add_argument('--notifications', type=int, default=1000)
+    parser.add_argument('--output', help='結果 JSON 路徑（默認 benchmarks/results/<時間>.json）')
+    parser.add_argument('--baseline', help='用於回歸檢查的基線 JSON')
+    parser.add_argument('--threshold', type=float, default=0.25, help='允許的相對變慢比例')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in (args.only or []) if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基準: {', '.join(unknown)}")
+    if args.quick:
+        args.sizes = list(QUICK_SIZES)
+        args.parse_items = min(args.parse_items, 2000)
+        args.read_products = min(args.read_products, 1000)
+        args.notifications = min(args.notifications, 200)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # 基準測試期間只保留錯誤日誌，避免日誌輸出影響計時
+    logging.getLogger().setLevel(logging.ERROR)
+
+    try:
+        report = run(args)
+    finally:
+        close_clients()
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"與基線比較 (閾值 +{args.threshold:.0%}):")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("性能回歸:\n  " + "\n  ".join(regressions))
+            return 1
+        print("未發現性能回歸")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
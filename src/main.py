@@ -24,8 +24,9 @@ def create_app():
     # 配置密鑰
     app.config['SECRET_KEY'] = 'popmart_monitor_secret_key'
 
-    # 配置數據庫
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'popmart_data.db')}"
+    # 配置數據庫（可通過 POPMART_DATABASE_URI 環境變量覆蓋，例如基準測試使用內存數據庫）
+    default_database_uri = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'popmart_data.db')}"
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('POPMART_DATABASE_URI', default_database_uri)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     db.init_app(app)
     
@@ -34,6 +35,10 @@ def create_app():
         db.create_all()
         logger.info("數據庫表已創建或已存在。")
 
+    # SQL 查詢計數與慢查詢日誌
+    from src.services import query_stats
+    query_stats.init_app(app, db)
+
     # 初始化 PopmartAPIClient
     api_client = PopmartAPIClient(region="hk")
     
@@ -79,10 +84,19 @@ def create_app():
     # 延遲導入 MonitorService 和 Scheduler
     from src.services.monitor import MonitorService
     from src.services.scheduler import Scheduler
+    from src.services.leader_election import LeaderElection, default_lock_path
+    from src.services.work_queue import WORK_QUEUE_ENABLED, WorkQueue
 
     # 初始化 MonitorService 和 Scheduler
     monitor_service = MonitorService(api_client, notification_config, auto_repair_config)
-    scheduler = Scheduler(monitor_service)
+    if WORK_QUEUE_ENABLED:
+        # 目錄分頁、庫存批次與詳情查詢寫入分片任務隊列，由 python -m src.worker 執行
+        monitor_service.work_queue = WorkQueue()
+        # 寫入任務時從規劃器的請求預算中預留上游請求
+        monitor_service.work_queue.budget = monitor_service.request_budget
+    # 多個 worker 進程間只有持有文件鎖的領導者執行排程任務
+    leader = LeaderElection(default_lock_path(app.config['SQLALCHEMY_DATABASE_URI']))
+    scheduler = Scheduler(monitor_service, app=app, leader=leader)
 
     # 將服務實例注入到 Flask app
     app.api_client = api_client
@@ -92,8 +106,14 @@ def create_app():
     # 註冊藍圖 (將藍圖註冊放在靜態文件服務之前)
     from src.routes.monitor import monitor_bp
     from src.routes.notification import notification_bp
+    from src.routes.metrics import metrics_bp
+    from src.routes.admin import admin_bp
+    from src.routes.scheduler import scheduler_bp
     app.register_blueprint(monitor_bp, url_prefix='/api')
     app.register_blueprint(notification_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    app.register_blueprint(scheduler_bp, url_prefix='/api')
 
     @app.route('/', defaults={'path': ''}) # 將此路由放在藍圖註冊之後
     @app.route('/<path:path>')
@@ -118,6 +138,9 @@ def create_app():
         # 我們將在應用關閉時處理資源清理
         pass
     
+    # 恢復上次保存的排程器設置，除非上次被手動停止，否則自動啟動
+    scheduler.restore()
+
     return app
 
 # 將 create_app() 的調用結果直接賦值給模組頂層的 app 變數
@@ -132,7 +155,7 @@ if __name__ == '__main__':
     def cleanup_on_exit():
         # 在應用退出時清理資源
         if hasattr(app, 'scheduler') and app.scheduler.is_running():
-            app.scheduler.stop()
+            app.scheduler.stop(persist=False)
             logger.info("排程器已停止")
         
         # 關閉API客戶端會話
@@ -142,3 +142,122 @@ class StockHistory(db.Model):
             'timestamp': self.timestamp
         }
 
+
+
+class MonitorState(db.Model):
+    """監控狀態數據模型（鍵值存儲，用於跨重啟保存爬取進度等狀態）"""
+    __tablename__ = 'monitor_state'
+
+    key = db.Column(db.String(255), primary_key=True)
+    value = db.Column(db.Text)  # JSON string
+    updated_at = db.Column(db.String(50), default=lambda: datetime.now().isoformat())
+
+    def __repr__(self):
+        return f'<MonitorState {self.key}>'
+
+    @classmethod
+    def get_value(cls, key, default=None):
+        """讀取狀態值"""
+        state = db.session.get(cls, key)
+        if state is None or state.value is None:
+            return default
+        return json.loads(state.value)
+
+    @classmethod
+    def set_value(cls, key, value, commit=True):
+        """寫入狀態值"""
+        state = db.session.get(cls, key)
+        if state is None:
+            state = cls(key=key)
+            db.session.add(state)
+        state.value = json.dumps(value, ensure_ascii=False)
+        state.updated_at = datetime.now().isoformat()
+        if commit:
+            db.session.commit()
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'value': json.loads(self.value) if self.value else None,
+            'updated_at': self.updated_at
+        }
+
+
+class ScheduleRun(db.Model):
+    """排程執行記錄數據模型"""
+    __tablename__ = 'schedule_runs'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(50), nullable=False, index=True)  # update / inventory
+    mode = db.Column(db.String(50))
+    scheduled_at = db.Column(db.String(50))
+    started_at = db.Column(db.String(50), index=True)
+    ended_at = db.Column(db.String(50))
+    lag = db.Column(db.Float)
+    duration = db.Column(db.Float)
+    status = db.Column(db.String(50), index=True)  # completed / failed / skipped
+    late = db.Column(db.Boolean, default=False)
+    skipped_ticks = db.Column(db.Integer, default=0)
+    products = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<ScheduleRun {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'mode': self.mode,
+            'scheduled_at': self.scheduled_at,
+            'started_at': self.started_at,
+            'ended_at': self.ended_at,
+            'lag': self.lag,
+            'duration': self.duration,
+            'status': self.status,
+            'late': self.late,
+            'skipped_ticks': self.skipped_ticks,
+            'products': self.products,
+            'error': self.error
+        }
+
+
+class WorkTask(db.Model):
+    """分片輪詢任務數據模型（由規劃器寫入，各 worker 進程以租約方式領取）"""
+    __tablename__ = 'work_tasks'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(50), nullable=False)  # pages / inventory / details
+    key = db.Column(db.String(255), index=True)  # 去重鍵，未完成的同鍵任務不重複寫入
+    payload = db.Column(db.Text)  # JSON string
+    priority = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(50), default='pending', index=True)  # pending / running / completed / failed
+    attempts = db.Column(db.Integer, default=0)
+    lease_owner = db.Column(db.String(255))
+    lease_expires_at = db.Column(db.Float)  # epoch 秒
+    created_at = db.Column(db.String(50), default=lambda: datetime.now().isoformat())
+    started_at = db.Column(db.String(50))
+    finished_at = db.Column(db.String(50))
+    result = db.Column(db.Text)  # JSON string
+    error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<WorkTask {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'key': self.key,
+            'payload': json.loads(self.payload) if self.payload else None,
+            'priority': self.priority,
+            'status': self.status,
+            'attempts': self.attempts,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': self.lease_expires_at,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error
+        }
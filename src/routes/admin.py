@@ -0,0 +1,338 @@
+from flask import Blueprint, current_app, jsonify, request, send_file
+import logging
+
+from src.models.product import db
+from src.services.memory_profiler import DEFAULT_TRACKED_TYPES, memory_profiler
+from src.services.profiling import PROFILE_MODES, profiling_controller
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__)
+
+# 下載格式對應的 MIME 類型
+_DOWNLOAD_MIMETYPES = {
+    'prof': 'application/octet-stream',
+    'txt': 'text/plain',
+    'folded': 'text/plain',
+    'json': 'application/json',
+}
+
+@admin_bp.route('/admin/profiling', methods=['GET'])
+def get_profiling_status():
+    """獲取分析預約狀態與已保存的分析結果"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'profiling': profiling_controller.get_status(),
+            'profiles': profiling_controller.list_profiles()
+        })
+    except Exception as e:
+        logger.error(f"獲取分析狀態失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'獲取分析狀態失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/profiling/arm', methods=['POST'])
+def arm_profiling():
+    """預約分析接下來 N 輪更新"""
+    try:
+        data = request.get_json(silent=True) or {}
+        runs = int(data.get('runs', 1))
+        mode = data.get('mode', 'cprofile')
+        interval = float(data.get('interval', 0.005))
+        if mode not in PROFILE_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"不支持的分析模式: {mode}，可選: {', '.join(PROFILE_MODES)}"
+            }), 400
+
+        status = profiling_controller.arm(runs=runs, mode=mode, interval=interval)
+        return jsonify({
+            'status': 'success',
+            'message': f'已預約分析接下來 {runs} 輪更新',
+            'profiling': status
+        })
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"預約分析失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'預約分析失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/profiling/disarm', methods=['POST'])
+def disarm_profiling():
+    """取消分析預約"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'message': '已取消分析預約',
+            'profiling': profiling_controller.disarm()
+        })
+    except Exception as e:
+        logger.error(f"取消分析預約失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'取消分析預約失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/profiling/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """獲取單份分析結果的元數據與該輪指標"""
+    try:
+        profile = profiling_controller.get_profile(profile_id)
+        if profile is None:
+            return jsonify({
+                'status': 'error',
+                'message': '分析結果不存在'
+            }), 404
+        return jsonify({
+            'status': 'success',
+            'profile': profile
+        })
+    except Exception as e:
+        logger.error(f"獲取分析結果失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'獲取分析結果失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/profiling/<profile_id>/download', methods=['GET'])
+def download_profile(profile_id):
+    """下載分析文件：format=prof (pstats)、txt (摘要)、folded (折疊棧) 或 json"""
+    try:
+        file_format = request.args.get('format')
+        if file_format is None:
+            profile = profiling_controller.get_profile(profile_id)
+            file_format = profile['formats'][0] if profile else 'json'
+
+        path = profiling_controller.profile_path(profile_id, file_format)
+        if path is None:
+            return jsonify({
+                'status': 'error',
+                'message': '分析文件不存在'
+            }), 404
+        return send_file(path, mimetype=_DOWNLOAD_MIMETYPES[file_format], as_attachment=True,
+                         download_name=f"{profile_id}.{file_format}")
+    except Exception as e:
+        logger.error(f"下載分析文件失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'下載分析文件失敗: {str(e)}'
+        }), 500
+
+def _is_scheduler_leader() -> bool:
+    """處理本請求的進程是否為排程器領導者（未啟用領導者選舉時視為是）"""
+    scheduler = getattr(current_app, 'scheduler', None)
+    leader = getattr(scheduler, 'leader', None)
+    return leader is None or leader.is_leader
+
+@admin_bp.route('/admin/memory', methods=['GET'])
+def get_memory_status():
+    """獲取內存追蹤狀態與已保存的快照
+
+    內存診斷只作用於處理請求的進程；is_leader 為 False 時結果不包含更新流程的內存分配。
+    """
+    try:
+        return jsonify({
+            'status': 'success',
+            'is_leader': _is_scheduler_leader(),
+            'memory': memory_profiler.get_status()
+        })
+    except Exception as e:
+        logger.error(f"獲取內存狀態失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'獲取內存狀態失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/start', methods=['POST'])
+def start_memory_tracing():
+    """開始追蹤內存分配"""
+    try:
+        data = request.get_json(silent=True) or {}
+        nframes = int(data.get('nframes', 1))
+        return jsonify({
+            'status': 'success',
+            'message': '已開始追蹤內存分配',
+            'memory': memory_profiler.start(nframes)
+        })
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"開始追蹤內存失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'開始追蹤內存失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/stop', methods=['POST'])
+def stop_memory_tracing():
+    """停止追蹤內存分配（已保存的快照保留）"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'message': '已停止追蹤內存分配',
+            'memory': memory_profiler.stop()
+        })
+    except Exception as e:
+        logger.error(f"停止追蹤內存失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'停止追蹤內存失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/snapshots', methods=['POST'])
+def take_memory_snapshot():
+    """保存一份內存快照"""
+    try:
+        data = request.get_json(silent=True) or {}
+        snapshot = memory_profiler.take_snapshot(str(data.get('label', '')))
+        return jsonify({
+            'status': 'success',
+            'message': f"已保存內存快照 #{snapshot['id']}",
+            'snapshot': snapshot
+        })
+    except RuntimeError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 409
+    except Exception as e:
+        logger.error(f"保存內存快照失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'保存內存快照失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/snapshots', methods=['DELETE'])
+def clear_memory_snapshots():
+    """刪除全部內存快照"""
+    try:
+        memory_profiler.clear_snapshots()
+        return jsonify({
+            'status': 'success',
+            'message': '已刪除全部內存快照'
+        })
+    except Exception as e:
+        logger.error(f"刪除內存快照失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'刪除內存快照失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/snapshots/<int:snapshot_id>', methods=['GET'])
+def get_memory_snapshot(snapshot_id):
+    """單份快照中佔用最多的分配位置：group_by=lineno|filename|traceback，limit"""
+    try:
+        group_by = request.args.get('group_by', 'lineno')
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({
+            'status': 'success',
+            'stats': memory_profiler.top_stats(snapshot_id, group_by, limit)
+        })
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': e.args[0]
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"獲取內存快照統計失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'獲取內存快照統計失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/snapshots/<int:snapshot_id>', methods=['DELETE'])
+def delete_memory_snapshot(snapshot_id):
+    """刪除單份內存快照"""
+    try:
+        if not memory_profiler.delete_snapshot(snapshot_id):
+            return jsonify({
+                'status': 'error',
+                'message': f'快照 #{snapshot_id} 不存在'
+            }), 404
+        return jsonify({
+            'status': 'success',
+            'message': f'已刪除內存快照 #{snapshot_id}'
+        })
+    except Exception as e:
+        logger.error(f"刪除內存快照失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'刪除內存快照失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/diff', methods=['GET'])
+def diff_memory_snapshots():
+    """對比兩份快照：from、to 為快照 ID，group_by=lineno|filename|traceback，limit"""
+    try:
+        old_id = request.args.get('from', type=int)
+        new_id = request.args.get('to', type=int)
+        if old_id is None or new_id is None:
+            return jsonify({
+                'status': 'error',
+                'message': '需要提供 from 和 to 快照 ID'
+            }), 400
+        group_by = request.args.get('group_by', 'lineno')
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({
+            'status': 'success',
+            'diff': memory_profiler.diff(old_id, new_id, group_by, limit)
+        })
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': e.args[0]
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"對比內存快照失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'對比內存快照失敗: {str(e)}'
+        }), 500
+
+@admin_bp.route('/admin/memory/objects', methods=['GET'])
+def get_object_counts():
+    """存活的 Product / PopmartProduct 等對象數與長期緩存的大小（types 可指定逗號分隔的類型名）"""
+    try:
+        types = request.args.get('types')
+        type_names = [name.strip() for name in types.split(',') if name.strip()] if types else DEFAULT_TRACKED_TYPES
+
+        caches = {'session_identity_map': len(db.session.identity_map)}
+        api_client = getattr(current_app, 'api_client', None)
+        if api_client is not None:
+            caches['mock_products'] = len(getattr(api_client, 'mock_products', None) or ())
+        monitor_service = getattr(current_app, 'monitor_service', None)
+        if monitor_service is not None:
+            caches['product_name_to_id_map'] = len(monitor_service.scraper.product_name_to_id_map)
+
+        return jsonify({
+            'status': 'success',
+            'objects': memory_profiler.object_counts(type_names),
+            'caches': caches
+        })
+    except Exception as e:
+        logger.error(f"統計對象數失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'統計對象數失敗: {str(e)}'
+        }), 500
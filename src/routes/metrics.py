@@ -0,0 +1,27 @@
+from flask import Blueprint, Response, jsonify, request
+import logging
+
+from src.services.metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """獲取更新輪次指標：默認 Prometheus 文本格式，format=json 時返回最近各輪的詳細數據"""
+    try:
+        if request.args.get('format') == 'json':
+            limit = request.args.get('limit', type=int)
+            return jsonify({
+                'status': 'success',
+                'metrics': metrics_registry.to_json(limit)
+            })
+
+        return Response(metrics_registry.to_prometheus(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"獲取指標失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'獲取指標失敗: {str(e)}'
+        }), 500
@@ -0,0 +1,241 @@
+from flask import Blueprint, current_app, jsonify, request
+import logging
+
+from src.models.product import MonitorState, ScheduleRun, WorkTask
+from src.services.scheduler import POLLING_POLICIES, SCHEDULE_MODES, SETTINGS_KEY
+
+logger = logging.getLogger(__name__)
+
+scheduler_bp = Blueprint('scheduler', __name__)
+
+# PATCH /scheduler 可修改的設置及其類型轉換
+_SETTING_PARSERS = {
+    'interval': int,
+    'inventory_interval': int,
+    'keywords': list,
+    'tier_intervals': dict,
+    'release_burst': dict,
+    'target_staleness': float,
+    'request_budget': int,
+    'polling_policy': str,
+    'mode': str,
+}
+
+
+def _parse_keywords(value):
+    """關鍵字可以是列表或逗號分隔的字符串"""
+    if isinstance(value, str):
+        return [keyword.strip() for keyword in value.split(',') if keyword.strip()]
+    return list(value or [])
+
+
+@scheduler_bp.route('/scheduler/status', methods=['GET'])
+def get_scheduler_status():
+    """獲取排程器狀態
+
+    多進程部署時各進程的內存狀態不同，running 與設置取自已保存的 scheduler_settings，
+    實際執行任務的進程見 leadership；local_running 為響應本次請求的進程是否在運行。
+    """
+    try:
+        scheduler = current_app.scheduler
+        status = scheduler.get_status()
+        status['local_running'] = status['running']
+        saved = MonitorState.get_value(SETTINGS_KEY)
+        if saved:
+            status['running'] = bool(saved.get('enabled'))
+            for key in ('mode', 'polling_policy', 'interval', 'inventory_interval', 'keywords'):
+                if key in saved:
+                    status[key] = saved[key]
+        return jsonify({
+            'status': 'success',
+            **status
+        })
+    except Exception as e:
+        logger.error(f"獲取排程器狀態失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'獲取排程器狀態失敗: {str(e)}'
+        }), 500
+
+@scheduler_bp.route('/scheduler/start', methods=['POST'])
+def start_scheduler():
+    """啟動排程器"""
+    try:
+        scheduler = current_app.scheduler
+        data = request.get_json(silent=True) or {}
+        current = scheduler.get_settings()
+        interval = int(data.get('interval', current['interval']))
+        inventory_interval = int(data.get('inventory_interval', current['inventory_interval']))
+        keywords = _parse_keywords(data.get('keywords', current['keywords']))
+        mode = data.get('mode')
+        if interval <= 0 or inventory_interval <= 0:
+            raise ValueError("執行間隔必須大於 0")
+
+        if scheduler.is_running():
+            return jsonify({
+                'status': 'error',
+                'message': '排程器已在運行中。'
+            }), 400
+        if not scheduler.start(interval=interval, keywords=keywords,
+                               inventory_interval=inventory_interval, mode=mode):
+            return jsonify({
+                'status': 'error',
+                'message': '排程器仍在完成上一次任務，請稍後再啟動。'
+            }), 409
+
+        return jsonify({
+            'status': 'success',
+            'message': f'排程器已啟動，每 {interval} 秒執行一次更新。',
+            'scheduler': scheduler.get_settings()
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"啟動排程器失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'啟動排程器失敗: {str(e)}'
+        }), 500
+
+@scheduler_bp.route('/scheduler/stop', methods=['POST'])
+def stop_scheduler():
+    """停止排程器"""
+    try:
+        scheduler = current_app.scheduler
+        if not scheduler.stop():
+            return jsonify({
+                'status': 'error',
+                'message': '排程器未在運行中。'
+            }), 400
+
+        return jsonify({
+            'status': 'success',
+            'message': '排程器已停止。'
+        })
+    except Exception as e:
+        logger.error(f"停止排程器失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'停止排程器失敗: {str(e)}'
+        }), 500
+
+@scheduler_bp.route('/scheduler', methods=['PATCH'])
+def update_scheduler_settings():
+    """修改排程器設置（間隔、關鍵字等），運行中立即生效"""
+    try:
+        scheduler = current_app.scheduler
+        data = request.get_json(silent=True) or {}
+        unknown = [key for key in data if key not in _SETTING_PARSERS]
+        if unknown:
+            raise ValueError(f"未知的排程器設置: {', '.join(unknown)}")
+        if not data:
+            raise ValueError("請提供要修改的設置")
+
+        settings = {}
+        for key, value in data.items():
+            if key == 'keywords':
+                settings[key] = _parse_keywords(value)
+            elif value is not None:
+                settings[key] = _SETTING_PARSERS[key](value)
+        for key in ('interval', 'inventory_interval'):
+            if key in settings and settings[key] <= 0:
+                raise ValueError(f"{key} 必須大於 0")
+        if 'mode' in settings and settings['mode'] not in SCHEDULE_MODES:
+            raise ValueError(f"不支持的排程模式: {settings['mode']}，可選: {', '.join(SCHEDULE_MODES)}")
+        if 'polling_policy' in settings and settings['polling_policy'] not in POLLING_POLICIES:
+            raise ValueError(f"不支持的輪詢策略: {settings['polling_policy']}，可選: {', '.join(POLLING_POLICIES)}")
+
+        scheduler.update_settings(**settings)
+        return jsonify({
+            'status': 'success',
+            'message': '排程器設置已更新',
+            'scheduler': scheduler.get_settings()
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"更新排程器設置失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'更新排程器設置失敗: {str(e)}'
+        }), 500
+
+@scheduler_bp.route('/scheduler/runs', methods=['GET'])
+def get_scheduler_runs():
+    """查詢排程執行記錄，可按類型與結果篩選"""
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        kind = request.args.get('kind')
+        status = request.args.get('status')
+
+        query = ScheduleRun.query
+        if kind:
+            query = query.filter(ScheduleRun.kind == kind)
+        if status:
+            query = query.filter(ScheduleRun.status == status)
+        total = query.count()
+        runs = query.order_by(ScheduleRun.id.desc()).offset((page - 1) * limit).limit(limit).all()
+
+        return jsonify({
+            'status': 'success',
+            'runs': [run.to_dict() for run in runs],
+            'total': total,
+            'page': page,
+            'limit': limit
+        })
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"查詢排程執行記錄失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'查詢排程執行記錄失敗: {str(e)}'
+        }), 500
+
+@scheduler_bp.route('/scheduler/tasks', methods=['GET'])
+def get_work_tasks():
+    """查詢分片任務隊列狀態與任務列表"""
+    try:
+        queue = current_app.monitor_service.work_queue
+        if queue is None:
+            return jsonify({
+                'status': 'error',
+                'message': '分片任務隊列未啟用（設置 POPMART_WORK_QUEUE=1 啟用）'
+            }), 400
+
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        kind = request.args.get('kind')
+        status = request.args.get('status')
+        query = WorkTask.query
+        if kind:
+            query = query.filter(WorkTask.kind == kind)
+        if status:
+            query = query.filter(WorkTask.status == status)
+        tasks = query.order_by(WorkTask.id.desc()).limit(limit).all()
+
+        return jsonify({
+            'status': 'success',
+            'queue': queue.get_stats(),
+            'tasks': [task.to_dict() for task in tasks]
+        })
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"查詢分片任務失敗: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f'查詢分片任務失敗: {str(e)}'
+        }), 500
@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import aiohttp
 
+from src.services.latency_histogram import LatencyTracker, endpoint_from_url
+
 logger = logging.getLogger(__name__)
 
 class AutoRepairService:
@@ -46,6 +48,11 @@ class AutoRepairService:
             'last_request_time': None
         }
         
+        # 滑動窗口延遲直方圖：每個上游端點與每個通知渠道
+        self.latency_window = self.config.get('latency_window', 300)
+        self.endpoint_latency = LatencyTracker(window_seconds=self.latency_window)
+        self.channel_latency = LatencyTracker(window_seconds=self.latency_window)
+        
         logger.info(f"自動修復服務已初始化，啟用狀態: {self.enabled}")
     
     def is_enabled(self) -> bool:
@@ -164,6 +171,14 @@ class AutoRepairService:
         if self.error_count >= self.max_errors:
             logger.error(f"錯誤次數過多({self.error_count})，建議檢查網絡或API狀態")
     
+    def record_endpoint_latency(self, url: str, seconds: float, status: Optional[int]):
+        """記錄上游請求延遲與狀態碼（status 為 None 表示請求異常）"""
+        self.endpoint_latency.record(endpoint_from_url(url), seconds, status)
+    
+    def record_channel_latency(self, channel: str, seconds: float, success: bool):
+        """記錄通知渠道的投遞延遲與結果"""
+        self.channel_latency.record(channel, seconds, 'ok' if success else 'failed')
+    
     def should_skip_request(self) -> bool:
         """判斷是否應該跳過請求"""
         if not self.enabled:
@@ -203,7 +218,9 @@ class AutoRepairService:
                 kwargs['proxy'] = proxy
             
             # 發送請求
+            started_at = time.monotonic()
             async with session.request(method, url, **kwargs) as response:
+                self.record_endpoint_latency(url, time.monotonic() - started_at, response.status)
                 self.record_request_success()
                 return response
                 
@@ -218,6 +235,18 @@ class AutoRepairService:
             success_rate = (self.request_stats['successful_requests'] / 
                           self.request_stats['total_requests']) * 100
         
+        endpoints = self.endpoint_latency.snapshot()
+        
+        # 窗口內成功率（狀態碼 < 400），反映當前而非歷史平均的健康狀況
+        recent_total = sum(stats['count'] for stats in endpoints.values())
+        recent_success = sum(
+            count
+            for stats in endpoints.values()
+            for status, count in stats['status_codes'].items()
+            if status.isdigit() and int(status) < 400
+        )
+        recent_success_rate = round(recent_success / recent_total * 100, 2) if recent_total else None
+        
         return {
             'enabled': self.enabled,
             'error_count': self.error_count,
@@ -227,7 +256,11 @@ class AutoRepairService:
             'success_rate': round(success_rate, 2),
             'last_error_time': self.last_error_time.isoformat() if self.last_error_time else None,
             'proxy_count': len(self.proxy_list),
-            'user_agent_count': len(self.user_agents)
+            'user_agent_count': len(self.user_agents),
+            'latency_window_seconds': self.latency_window,
+            'recent_success_rate': recent_success_rate,
+            'endpoints': endpoints,
+            'notification_channels': self.channel_latency.snapshot()
         }
     
     def update_config(self, config: Dict[str, Any]):
@@ -240,6 +273,12 @@ class AutoRepairService:
         self.recovery_time = self.config.get('recovery_time', 3600)
         self.proxy_list = self.config.get('proxy_list', [])
         
+        latency_window = self.config.get('latency_window', 300)
+        if latency_window != self.latency_window:
+            self.latency_window = latency_window
+            self.endpoint_latency = LatencyTracker(window_seconds=latency_window)
+            self.channel_latency = LatencyTracker(window_seconds=latency_window)
+        
         logger.info("自動修復服務配置已更新")
     
     def reset_stats(self):
@@ -252,5 +291,7 @@ class AutoRepairService:
             'failed_requests': 0,
             'last_request_time': None
         }
+        self.endpoint_latency.reset()
+        self.channel_latency.reset()
         logger.info("統計信息已重置")
 
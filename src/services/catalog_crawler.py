@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Any
+
+from src.services.popmart_api_client import PopmartAPIClient, PopmartProduct
+
+logger = logging.getLogger(__name__)
+
+class CatalogCrawler:
+    """全目錄爬蟲 - 以有限並發遍歷 get_products 的所有分頁"""
+
+    def __init__(self, api_client: PopmartAPIClient, page_size: int = 100,
+                 concurrency: int = 4, sort: str = "newest", max_pages: int = 1000):
+        self.api_client = api_client
+        self.page_size = page_size
+        self.concurrency = max(concurrency, 1)
+        self.sort = sort
+        self.max_pages = max_pages
+        self.last_stats: Dict[str, Any] = {}
+        # 頁碼游標：此頁之前的頁都已成功獲取並被消費完，停在第一個失敗或未處理的頁，中途取消時可從此頁繼續
+        self.cursor: Optional[int] = None
+        self._consumed: Set[int] = set()
+
+    def _consume(self, page: int):
+        """標記一頁已成功獲取並處理，推進連續完成的頁碼游標"""
+        self._consumed.add(page)
+        while self.cursor in self._consumed:
+            self._consumed.discard(self.cursor)
+            self.cursor += 1
+
+    async def crawl(self, category: str = None, start_page: int = 1) -> AsyncIterator[List[PopmartProduct]]:
+        """從 start_page 起遍歷全部分頁，每頁解析完成後立即產出，供處理階段流水線消費"""
+        started_at = time.monotonic()
+        stats = {'pages': 0, 'products': 0, 'failed_pages': 0, 'last_page': None, 'start_page': start_page}
+        self.cursor = start_page
+        self._consumed = set()
+
+        # 先獲取起始頁，從響應元數據得知總頁數
+        first_page, meta = await self.api_client.get_products_page(
+            page=start_page, limit=self.page_size, category=category, sort=self.sort
+        )
+        self._count_page(stats, first_page, meta)
+        if first_page:
+            yield first_page
+        if meta.get('ok'):
+            self._consume(start_page)
+
+        if not meta.get('ok'):
+            # 起始頁失敗時總頁數未知，不再逐頁試探到 max_pages
+            logger.warning(f"全目錄第 {start_page} 頁獲取失敗，本次爬取中止")
+        elif meta.get('is_last_page'):
+            stats['last_page'] = start_page
+        else:
+            last_page = meta.get('total_pages')
+            if last_page is not None:
+                last_page = min(last_page, self.max_pages)
+
+            state = {'next_page': start_page + 1, 'last_page': last_page}
+            # 有界隊列：處理跟不上時抓取協程暫停，避免整個目錄堆積在內存中
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+            workers = [
+                asyncio.create_task(self._worker(state, queue, category))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                finished_workers = 0
+                while finished_workers < len(workers):
+                    item = await queue.get()
+                    if item is None:
+                        finished_workers += 1
+                        continue
+                    page, page_products, page_meta = item
+                    self._count_page(stats, page_products, page_meta)
+                    if page_products:
+                        yield page_products
+                    if page_meta.get('ok'):
+                        self._consume(page)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+            stats['last_page'] = state['last_page']
+
+        elapsed = time.monotonic() - started_at
+        stats['elapsed'] = round(elapsed, 3)
+        stats['pages_per_second'] = round(stats['pages'] / elapsed, 2) if elapsed > 0 else None
+        self.last_stats = stats
+        logger.info(f"全目錄爬取完成: {stats['pages']} 頁, {stats['products']} 個商品, "
+                    f"{stats['failed_pages']} 頁失敗, 耗時 {stats['elapsed']} 秒 "
+                    f"({stats['pages_per_second']} 頁/秒)")
+
+    async def _worker(self, state: Dict[str, Optional[int]], queue: asyncio.Queue, category: Optional[str]):
+        """分頁抓取工作協程，從共享計數器領取頁碼直到最後一頁，結束時放入 None
+
+        被取消時不放入 None：消費端已停止讀取，向已滿的隊列寫入會一直阻塞。
+        """
+        try:
+            while True:
+                page = state['next_page']
+                last_page = state['last_page']
+                if page > self.max_pages or (last_page is not None and page > last_page):
+                    break
+                state['next_page'] = page + 1
+
+                products, meta = await self.api_client.get_products_page(
+                    page=page, limit=self.page_size, category=category, sort=self.sort
+                )
+                if meta.get('ok') and meta.get('is_last_page'):
+                    # 空頁代表上一頁已是最後一頁
+                    detected_last = page if products else page - 1
+                    if state['last_page'] is None or detected_last < state['last_page']:
+                        state['last_page'] = detected_last
+                await queue.put((page, products, meta))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"全目錄分頁抓取出錯: {e}", exc_info=True)
+        await queue.put(None)
+
+    def _count_page(self, stats: Dict[str, Any], products: List[PopmartProduct], meta: Dict[str, Any]):
+        """累計分頁統計"""
+        if meta.get('ok'):
+            stats['pages'] += 1
+            stats['products'] += len(products)
+        else:
+            stats['failed_pages'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取最近一次爬取的統計"""
+        return self.last_stats
+
+
+class NewArrivalCrawler:
+    """增量新品爬蟲 - 按最新排序逐頁遍歷，遇到商品全部已知的頁面即停止"""
+
+    def __init__(self, api_client: PopmartAPIClient, page_size: int = 50, max_pages: int = 200):
+        self.api_client = api_client
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.last_stats: Dict[str, Any] = {}
+
+    async def crawl(self, is_known: Callable[[str], bool], start_page: int = 1) -> AsyncIterator[List[PopmartProduct]]:
+        """從 start_page 起逐頁產出最新商品，直到某頁商品全部已知或到達最後一頁，每次最多 max_pages 頁"""
+        started_at = time.monotonic()
+        stats = {'pages': 0, 'products': 0, 'new_products': 0, 'stop_reason': None, 'start_page': start_page}
+
+        for page in range(start_page, start_page + self.max_pages):
+            products, meta = await self.api_client.get_products_page(
+                page=page, limit=self.page_size, sort="newest"
+            )
+            if not meta.get('ok'):
+                stats['stop_reason'] = 'request_failed'
+                break
+
+            new_count = sum(1 for product in products if not is_known(product.id))
+            stats['pages'] += 1
+            stats['products'] += len(products)
+            stats['new_products'] += new_count
+
+            if products:
+                yield products
+
+            if new_count == 0:
+                stats['stop_reason'] = 'all_known'
+                break
+            if meta.get('is_last_page'):
+                stats['stop_reason'] = 'last_page'
+                break
+        else:
+            stats['stop_reason'] = 'max_pages'
+
+        stats['elapsed'] = round(time.monotonic() - started_at, 3)
+        self.last_stats = stats
+        logger.info(f"增量新品爬取完成: {stats['pages']} 頁, 發現 {stats['new_products']} 個新商品, "
+                    f"停止原因: {stats['stop_reason']}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取最近一次爬取的統計"""
+        return self.last_stats
@@ -0,0 +1,209 @@
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# monitor_state 中保存模型狀態的鍵
+STATE_KEY = 'change_rate_model'
+
+_LN2 = math.log(2)
+
+
+def expected_staleness(rate: float, interval: float) -> float:
+    """泊松變化過程下，以固定間隔輪詢時數據過期的時間佔比：1 - (1 - e^(-λI)) / (λI)"""
+    x = rate * interval
+    if x <= 0:
+        return 0.0
+    if x < 1e-6:
+        return x / 2
+    return 1 - (1 - math.exp(-x)) / x
+
+
+class ChangeRateEstimator:
+    """按產品估計價格/庫存的變化率，並推導使過期佔比不超過目標值的輪詢間隔
+
+    每個產品保存指數衰減的變化次數與觀察時長（半衰期 half_life），
+    變化率 = (變化次數 + 先驗次數) / (觀察時長 + 先驗時長)。
+    變化事件從 StockHistory / PriceHistory 按自增ID增量讀取，模型狀態保存在 monitor_state 中。
+    """
+
+    def __init__(self, target_staleness: float = 0.1, min_interval: float = 15, max_interval: float = 21600,
+                 half_life: float = 7 * 86400, prior_changes: float = 0.5, prior_seconds: float = 86400,
+                 min_exposure: float = 86400, save_interval: float = 300):
+        self.target_staleness = target_staleness
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.half_life = half_life
+        self.prior_changes = prior_changes
+        self.prior_seconds = prior_seconds
+        self.min_exposure = min_exposure  # 觀察時長不足時估計值只用於加快輪詢
+        self.save_interval = save_interval
+        # 產品ID -> [衰減後變化次數, 衰減後觀察秒數, 最後更新時間 (epoch), 累計變化次數]
+        self.products: Dict[str, List[float]] = {}
+        self.cursors: Dict[str, int] = {'stock': 0, 'price': 0}
+        self._last_saved: Optional[float] = None
+        self._dirty = False
+
+    def _advance(self, entry: List[float], now: float):
+        """將衰減計數推進到 now"""
+        elapsed = now - entry[2]
+        if elapsed <= 0:
+            return
+        decay = math.exp(-elapsed * _LN2 / self.half_life)
+        entry[0] *= decay
+        # 觀察時長按同樣的衰減累積：∫ e^(-k(now-t)) dt
+        entry[1] = entry[1] * decay + (1 - decay) * self.half_life / _LN2
+        entry[2] = now
+
+    def track(self, product_ids: Iterable[str], now: Optional[float] = None):
+        """開始觀察產品（已觀察的產品不受影響）"""
+        now = now if now is not None else time.time()
+        for product_id in product_ids:
+            if product_id not in self.products:
+                self.products[product_id] = [0.0, 0.0, now, 0]
+                self._dirty = True
+
+    def observe_change(self, product_id: str, at: Optional[float] = None):
+        """記錄一次變化事件"""
+        at = at if at is not None else time.time()
+        entry = self.products.get(product_id)
+        if entry is None:
+            # 首次出現即有變化，從此刻開始觀察
+            entry = self.products[product_id] = [0.0, 0.0, at, 0]
+        self._advance(entry, at)
+        entry[0] += 1
+        entry[3] += 1
+        self._dirty = True
+
+    def rate(self, product_id: str, now: Optional[float] = None) -> float:
+        """估計的變化率（次/秒）"""
+        now = now if now is not None else time.time()
+        entry = self.products.get(product_id)
+        if entry is None:
+            return self.prior_changes / self.prior_seconds
+        self._advance(entry, now)
+        return (entry[0] + self.prior_changes) / (entry[1] + self.prior_seconds)
+
+    def interval_for_rate(self, rate: float) -> float:
+        """過期佔比恰好等於目標值的輪詢間隔（在全局上下限內）"""
+        if rate <= 0 or expected_staleness(rate, self.max_interval) <= self.target_staleness:
+            return self.max_interval
+        if expected_staleness(rate, self.min_interval) >= self.target_staleness:
+            return self.min_interval
+        low, high = self.min_interval, self.max_interval
+        for _ in range(40):
+            middle = (low + high) / 2
+            if expected_staleness(rate, middle) > self.target_staleness:
+                high = middle
+            else:
+                low = middle
+        return low
+
+    def interval_for(self, product_id: str, now: Optional[float] = None) -> float:
+        return self.interval_for_rate(self.rate(product_id, now))
+
+    def intervals(self, now: Optional[float] = None) -> Dict[str, float]:
+        """各產品的建議輪詢間隔；觀察時長不足 min_exposure 的產品只在建議更短間隔時給出"""
+        now = now if now is not None else time.time()
+        default_interval = self.interval_for_rate(self.prior_changes / self.prior_seconds)
+        result: Dict[str, float] = {}
+        for product_id, entry in self.products.items():
+            interval = self.interval_for(product_id, now)
+            if entry[1] >= self.min_exposure or interval < default_interval:
+                result[product_id] = interval
+        return result
+
+    def ingest_events(self, events: Iterable[Tuple[str, float]]) -> int:
+        """按時間順序記錄 (產品ID, epoch) 變化事件"""
+        count = 0
+        for product_id, at in sorted(events, key=lambda event: event[1]):
+            self.observe_change(product_id, at)
+            count += 1
+        return count
+
+    def ingest_from_db(self) -> int:
+        """讀取上次之後新增的庫存/價格歷史記錄（需要應用上下文）"""
+        from src.models.product import PriceHistory, StockHistory, db
+
+        events: List[Tuple[str, float]] = []
+        for name, model in (('stock', StockHistory), ('price', PriceHistory)):
+            rows = db.session.query(model.id, model.product_id, model.timestamp).filter(
+                model.id > self.cursors.get(name, 0)
+            ).order_by(model.id).all()
+            for row_id, product_id, timestamp in rows:
+                events.append((product_id, _to_epoch(timestamp)))
+                self.cursors[name] = row_id
+        count = self.ingest_events(events)
+        if count:
+            logger.info(f"變化率模型已記錄 {count} 個新的價格/庫存變化")
+        return count
+
+    def load(self) -> bool:
+        """從 monitor_state 載入模型狀態（需要應用上下文）"""
+        from src.models.product import MonitorState
+
+        state = MonitorState.get_value(STATE_KEY)
+        if not state:
+            return False
+        self.cursors.update(state.get('cursors', {}))
+        self.products = {product_id: list(entry) for product_id, entry in state.get('products', {}).items()}
+        logger.info(f"已載入 {len(self.products)} 個產品的變化率模型")
+        return True
+
+    def save(self, force: bool = False) -> bool:
+        """保存模型狀態，默認每 save_interval 秒最多保存一次"""
+        from src.models.product import MonitorState
+
+        now = time.monotonic()
+        if not self._dirty or (not force and self._last_saved is not None
+                               and now - self._last_saved < self.save_interval):
+            return False
+        MonitorState.set_value(STATE_KEY, {
+            'cursors': self.cursors,
+            'products': {
+                product_id: [round(entry[0], 6), round(entry[1], 1), round(entry[2], 3), entry[3]]
+                for product_id, entry in self.products.items()
+            }
+        })
+        self._last_saved = now
+        self._dirty = False
+        return True
+
+    def describe(self, product_id: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """單個產品的估計詳情"""
+        entry = self.products.get(product_id)
+        if entry is None:
+            return None
+        rate = self.rate(product_id, now)
+        interval = self.interval_for_rate(rate)
+        return {
+            'changes_per_day': round(rate * 86400, 4),
+            'changes_total': entry[3],
+            'observed_seconds': round(entry[1], 1),
+            'interval': round(interval, 1),
+            'expected_staleness': round(expected_staleness(rate, interval), 4)
+        }
+
+    def get_stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now if now is not None else time.time()
+        intervals = sorted(self.interval_for(product_id, now) for product_id in self.products)
+        return {
+            'products': len(self.products),
+            'target_staleness': self.target_staleness,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'at_min_interval': sum(1 for interval in intervals if interval <= self.min_interval),
+            'median_interval': round(intervals[len(intervals) // 2], 1) if intervals else None,
+            'cursors': dict(self.cursors)
+        }
+
+
+def _to_epoch(timestamp: Any) -> float:
+    """歷史表中的 ISO 時間字符串轉換為 epoch 秒"""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
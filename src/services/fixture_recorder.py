@@ -0,0 +1,169 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_FORMAT_VERSION = 1
+
+# 只記錄影響重放行為的響應頭
+RECORDED_RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Retry-After', 'Content-Type')
+RECORDED_REQUEST_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+def fixture_key(method: str, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, str, Tuple]:
+    """請求匹配鍵：方法、URL 路徑與排序後的參數（忽略主機，重放時可換 base_url）"""
+    path = urlsplit(url).path
+    normalized = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return method.upper(), path, normalized
+
+
+def iter_fixture(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行讀取 gzip NDJSON 夾具文件"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class FixtureRecorder:
+    """請求錄製器 - 將請求/響應對及時間信息寫入 gzip 壓縮的 NDJSON 夾具
+
+    第一行為元數據（格式版本、錄製時間、base_url、區域），之後每行一個交換記錄：
+    相對錄製開始的發送時間 offset、響應耗時 elapsed、請求與響應。
+    """
+
+    def __init__(self, path: str, base_url: str = None, region: str = None):
+        self.path = path
+        self.started_at = time.monotonic()
+        self.count = 0
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({
+            'type': 'meta',
+            'version': FIXTURE_FORMAT_VERSION,
+            'recorded_at': datetime.now().isoformat(),
+            'base_url': base_url,
+            'region': region
+        })
+        logger.info(f"開始錄製請求夾具: {path}")
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+
+    def record(self, method: str, url: str, params: Optional[Dict[str, Any]], request_headers: Optional[Dict[str, str]],
+               status: int, response_headers, body: bytes, sent_at: float, elapsed: float):
+        """記錄一次請求/響應交換"""
+        if self._file is None:
+            return
+        request_headers = request_headers or {}
+        self.count += 1
+        self._write({
+            'type': 'exchange',
+            'seq': self.count,
+            'offset': round(sent_at - self.started_at, 6),
+            'elapsed': round(elapsed, 6),
+            'method': method.upper(),
+            'url': url,
+            'params': {str(k): str(v) for k, v in (params or {}).items()},
+            'request_headers': {k: request_headers[k] for k in RECORDED_REQUEST_HEADERS if k in request_headers},
+            'status': status,
+            'headers': {k: response_headers[k] for k in RECORDED_RESPONSE_HEADERS if k in response_headers},
+            'body': body.decode('utf-8', errors='replace') if body else ''
+        })
+
+    def close(self):
+        """結束錄製"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"請求夾具錄製完成: {self.path} ({self.count} 個請求)")
+
+
+class ReplayTransport:
+    """夾具重放傳輸層 - 按錄製順序為相同請求返回錄製的響應
+
+    speed 為重放速度倍數：1.0 按錄製的響應耗時等待，10.0 加速十倍，
+    0 或 None 則不等待。同一請求按錄製順序依次返回，錄製次數用盡後重複最後一次響應。
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = 1.0):
+        self.path = path
+        self.speed = speed
+        self.meta: Dict[str, Any] = {}
+        self._exchanges: Dict[Tuple, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._last: Dict[Tuple, Dict[str, Any]] = {}
+        self.total = 0
+        self.stats = {'served': 0, 'repeated': 0, 'missing': 0}
+
+        for record in iter_fixture(path):
+            if record.get('type') == 'meta':
+                self.meta = record
+                continue
+            key = fixture_key(record['method'], record['url'], record.get('params'))
+            self._exchanges[key].append(record)
+            self.total += 1
+        logger.info(f"已載入請求夾具: {path} ({self.total} 個請求)")
+
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                      **kwargs) -> Tuple[int, Dict[str, str], bytes]:
+        """返回 (狀態碼, 響應頭, 響應體)"""
+        key = fixture_key(method, url, params)
+        queue = self._exchanges.get(key)
+        if queue:
+            record = queue.popleft()
+            self._last[key] = record
+            self.stats['served'] += 1
+        elif key in self._last:
+            record = self._last[key]
+            self.stats['repeated'] += 1
+        else:
+            self.stats['missing'] += 1
+            logger.warning(f"夾具中沒有匹配的請求: {method} {url} {params}")
+            return 404, {}, b''
+
+        if self.speed:
+            await asyncio.sleep(record.get('elapsed', 0.0) / self.speed)
+        return record['status'], dict(record.get('headers') or {}), record.get('body', '').encode('utf-8')
+
+    def remaining(self) -> int:
+        """尚未重放的錄製請求數"""
+        return sum(len(queue) for queue in self._exchanges.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取重放統計"""
+        return {**self.stats, 'total': self.total, 'remaining': self.remaining(), 'speed': self.speed}
+
+
+def summarize_fixture(path: str) -> Dict[str, Any]:
+    """統計夾具內容：請求數、各路徑與狀態碼分佈、錄製時長"""
+    paths: Dict[str, int] = defaultdict(int)
+    statuses: Dict[int, int] = defaultdict(int)
+    meta: Dict[str, Any] = {}
+    count = 0
+    duration = 0.0
+    total_elapsed = 0.0
+    for record in iter_fixture(path):
+        if record.get('type') == 'meta':
+            meta = record
+            continue
+        count += 1
+        paths[urlsplit(record['url']).path] += 1
+        statuses[record['status']] += 1
+        total_elapsed += record.get('elapsed', 0.0)
+        duration = max(duration, record.get('offset', 0.0) + record.get('elapsed', 0.0))
+    return {
+        'meta': meta,
+        'requests': count,
+        'duration': round(duration, 3),
+        'total_elapsed': round(total_elapsed, 3),
+        'paths': dict(paths),
+        'statuses': dict(statuses)
+    }
@@ -0,0 +1,154 @@
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+# 對數分桶：相鄰桶邊界相差 4%，任意分位數的相對誤差不超過約 2%
+_BUCKET_GROWTH = 1.04
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+_MIN_MS = 0.01
+
+_ID_SEGMENT = re.compile(r'^(?!v\d+$).*\d')
+
+
+def endpoint_from_url(url: str) -> str:
+    """將請求 URL 歸一為端點名：去掉主機與查詢參數，含數字的路徑段替換為 {id}"""
+    path = urlsplit(url).path or '/'
+    return '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+class _Slot:
+    __slots__ = ('epoch', 'buckets', 'statuses', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.epoch = -1
+        self.reset(-1)
+
+    def reset(self, epoch: int):
+        self.epoch = epoch
+        self.buckets: Dict[int, int] = {}
+        self.statuses: Dict[str, int] = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+class SlidingLatencyHistogram:
+    """滑動窗口對數分桶延遲直方圖（HDR 風格）
+
+    窗口分為若干時間槽，記錄時只寫當前槽（一次對數運算與兩次字典累加），
+    讀取時合併窗口內的槽計算 p50/p95/p99，過期的槽在輪轉時整體清零。
+    記錄與讀取可能來自不同線程，兩者都在鎖內訪問時間槽。
+    """
+
+    def __init__(self, window_seconds: float = 300, slots: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / slots
+        self.clock = clock
+        self._slots = [_Slot() for _ in range(slots)]
+        self.total_count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, status: Union[int, str, None] = None):
+        """記錄一次延遲（秒）與狀態"""
+        epoch = int(self.clock() // self.slot_seconds)
+        ms = seconds * 1000.0
+        index = int(math.log(ms / _MIN_MS) / _LOG_GROWTH) if ms > _MIN_MS else 0
+        status_key = 'error' if status is None else str(status)
+        with self._lock:
+            slot = self._slots[epoch % len(self._slots)]
+            if slot.epoch != epoch:
+                slot.reset(epoch)
+            buckets = slot.buckets
+            buckets[index] = buckets.get(index, 0) + 1
+            slot.statuses[status_key] = slot.statuses.get(status_key, 0) + 1
+            slot.count += 1
+            slot.total_ms += ms
+            if ms > slot.max_ms:
+                slot.max_ms = ms
+            self.total_count += 1
+
+    def _live_slots(self) -> List[_Slot]:
+        current_epoch = int(self.clock() // self.slot_seconds)
+        oldest_epoch = current_epoch - len(self._slots) + 1
+        return [slot for slot in self._slots if oldest_epoch <= slot.epoch <= current_epoch and slot.count]
+
+    @staticmethod
+    def _bucket_value(index: int) -> float:
+        """桶的代表值（桶上下邊界的幾何中點，毫秒）"""
+        if index == 0:
+            return _MIN_MS
+        return _MIN_MS * _BUCKET_GROWTH ** (index + 0.5)
+
+    def snapshot(self, percentiles=(50, 95, 99)) -> Dict[str, Any]:
+        """窗口內的延遲分位數（毫秒）與狀態碼計數"""
+        merged: Dict[int, int] = {}
+        statuses: Dict[str, int] = {}
+        count = 0
+        total_ms = 0.0
+        max_ms = 0.0
+        with self._lock:
+            for slot in self._live_slots():
+                for index, bucket_count in slot.buckets.items():
+                    merged[index] = merged.get(index, 0) + bucket_count
+                for status, status_count in slot.statuses.items():
+                    statuses[status] = statuses.get(status, 0) + status_count
+                count += slot.count
+                total_ms += slot.total_ms
+                max_ms = max(max_ms, slot.max_ms)
+            total_count = self.total_count
+
+        result: Dict[str, Any] = {
+            'window_seconds': self.window_seconds,
+            'count': count,
+            'total_count': total_count,
+            'status_codes': statuses,
+            'mean_ms': round(total_ms / count, 3) if count else None,
+            'max_ms': round(max_ms, 3) if count else None,
+        }
+        ordered = sorted(merged.items())
+        for percentile in percentiles:
+            result[f'p{percentile}_ms'] = self._percentile(ordered, count, percentile, max_ms)
+        return result
+
+    def _percentile(self, ordered: List, count: int, percentile: float, max_ms: float) -> Optional[float]:
+        if not count:
+            return None
+        rank = math.ceil(count * percentile / 100)
+        seen = 0
+        for index, bucket_count in ordered:
+            seen += bucket_count
+            if seen >= rank:
+                return round(min(self._bucket_value(index), max_ms), 3)
+        return round(max_ms, 3)
+
+
+class LatencyTracker:
+    """按鍵（端點或通知渠道）分組的滑動窗口延遲直方圖"""
+
+    def __init__(self, window_seconds: float = 300, slots: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.slots = slots
+        self.clock = clock
+        self._histograms: Dict[str, SlidingLatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float, status: Union[int, str, None] = None):
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, SlidingLatencyHistogram(self.window_seconds, self.slots, self.clock)
+                )
+        histogram.record(seconds, status)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        return {key: histogram.snapshot() for key, histogram in histograms}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 等不支持 fcntl 的平台
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# monitor_state 中記錄當前領導者的鍵
+LEADER_KEY = 'scheduler_leader'
+
+
+def default_lock_path(database_uri: str) -> str:
+    """按數據庫地址生成鎖文件路徑，使用同一數據庫的進程競爭同一把鎖"""
+    digest = hashlib.sha1(database_uri.encode('utf-8')).hexdigest()[:12]
+    return os.environ.get('POPMART_SCHEDULER_LOCK',
+                          os.path.join(tempfile.gettempdir(), f'popmart_scheduler_{digest}.lock'))
+
+
+class LeaderElection:
+    """本機多進程（如 gunicorn 多個 worker）間的排程器領導者選舉
+
+    使用 fcntl 文件鎖：持有鎖的進程即領導者，進程退出時鎖由系統釋放，
+    其他進程在下次嘗試時接管。領導者定期將心跳寫入 monitor_state，
+    任何進程都可以據此報告當前領導者；心跳超過 lease_ttl 未更新視為失聯。
+    """
+
+    def __init__(self, lock_path: str, heartbeat_interval: float = 10, lease_ttl: float = 30):
+        self.lock_path = lock_path
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_ttl = lease_ttl
+        self._file = None
+        self._pid: Optional[int] = None
+        self.acquired_at: Optional[str] = None
+        self._last_heartbeat: Optional[float] = None
+        if fcntl is None:
+            logger.warning("當前平台不支持 fcntl 文件鎖，排程器將以單進程模式運行")
+
+    @property
+    def identity(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def is_leader(self) -> bool:
+        # fork 出的子進程不繼承領導權
+        return self._pid == os.getpid()
+
+    def acquire(self) -> bool:
+        """嘗試成為領導者（不阻塞），返回本進程是否為領導者"""
+        if self.is_leader:
+            return True
+        self._file = None  # 丟棄 fork 前繼承的文件對象
+        if fcntl is not None:
+            lock_file = open(self.lock_path, 'a+')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(f"{self.identity}\n")
+            lock_file.flush()
+            self._file = lock_file
+        self._pid = os.getpid()
+        self.acquired_at = datetime.now().isoformat()
+        self._last_heartbeat = None
+        logger.info(f"本進程 ({self.identity}) 已成為排程器領導者")
+        return True
+
+    def heartbeat(self, force: bool = False) -> bool:
+        """領導者每 heartbeat_interval 秒寫入一次心跳（需要應用上下文）"""
+        if not self.is_leader:
+            return False
+        now = time.monotonic()
+        if not force and self._last_heartbeat is not None and now - self._last_heartbeat < self.heartbeat_interval:
+            return False
+        from src.models.product import MonitorState
+
+        MonitorState.set_value(LEADER_KEY, {
+            'identity': self.identity,
+            'hostname': socket.gethostname(),
+            'pid': os.getpid(),
+            'acquired_at': self.acquired_at,
+            'heartbeat_at': datetime.now().isoformat()
+        })
+        self._last_heartbeat = now
+        return True
+
+    def release(self):
+        """放棄領導權並清除心跳記錄（需要應用上下文）"""
+        if not self.is_leader:
+            return
+        from src.models.product import MonitorState, db
+
+        try:
+            record = MonitorState.get_value(LEADER_KEY) or {}
+            if record.get('identity') == self.identity:
+                MonitorState.set_value(LEADER_KEY, {**record, 'released_at': datetime.now().isoformat()})
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"清除排程器領導者記錄失敗: {e}", exc_info=True)
+        finally:
+            if self._file is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+            self._pid = None
+            self.acquired_at = None
+            logger.info(f"本進程 ({self.identity}) 已放棄排程器領導權")
+
+    def get_status(self) -> Dict[str, Any]:
+        """當前領導者信息（需要應用上下文）"""
+        from src.models.product import MonitorState
+
+        record = MonitorState.get_value(LEADER_KEY)
+        heartbeat_age = None
+        alive = False
+        if record and not record.get('released_at'):
+            try:
+                heartbeat_age = (datetime.now() - datetime.fromisoformat(record['heartbeat_at'])).total_seconds()
+                alive = heartbeat_age <= self.lease_ttl
+            except (KeyError, TypeError, ValueError):
+                pass
+        return {
+            'identity': self.identity,
+            'is_leader': self.is_leader,
+            'lock_path': self.lock_path if fcntl is not None else None,
+            'leader': record,
+            'leader_alive': alive,
+            'heartbeat_age': round(heartbeat_age, 3) if heartbeat_age is not None else None,
+            'lease_ttl': self.lease_ttl
+        }
@@ -0,0 +1,231 @@
+import gc
+import linecache
+import logging
+import os
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模塊
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 快照統計的分組方式
+GROUP_BY_OPTIONS = ('lineno', 'filename', 'traceback')
+
+# 默認統計實例數的類型
+DEFAULT_TRACKED_TYPES = ('Product', 'PopmartProduct', 'PriceHistory', 'StockHistory')
+
+# 快照中排除的分配來源（tracemalloc 自身與導入機制）
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MemorySnapshot:
+    """一份已保存的 tracemalloc 快照"""
+
+    def __init__(self, snapshot_id: int, label: str, snapshot: tracemalloc.Snapshot,
+                 traced_current: int, traced_peak: int):
+        self.snapshot_id = snapshot_id
+        self.label = label
+        self.snapshot = snapshot
+        self.taken_at = datetime.now().isoformat()
+        self.traced_current = traced_current
+        self.traced_peak = traced_peak
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.snapshot_id,
+            'label': self.label,
+            'taken_at': self.taken_at,
+            'traced_current_bytes': self.traced_current,
+            'traced_peak_bytes': self.traced_peak,
+            'traceback_limit': self.snapshot.traceback_limit
+        }
+
+
+class MemoryProfiler:
+    """運行中進程的內存診斷：啟停 tracemalloc、保存快照、按文件/行對比兩份快照並統計對象數
+
+    快照保存在內存中，只保留最近 max_snapshots 份；停止追蹤不會刪除已保存的快照。
+    追蹤與快照只作用於處理請求的進程：多進程部署時，要診斷更新流程須把請求發到排程器領導者進程，
+    狀態中的 pid 用於確認請求由哪個進程處理。
+    """
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self.snapshots: "OrderedDict[int, MemorySnapshot]" = OrderedDict()
+        self.started_at: Optional[str] = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def is_tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, nframes: int = 1) -> Dict[str, Any]:
+        """開始追蹤內存分配；nframes 為每次分配保存的調用棧深度"""
+        if nframes < 1:
+            raise ValueError("nframes 必須大於 0")
+        if tracemalloc.is_tracing():
+            if tracemalloc.get_traceback_limit() == nframes:
+                return self.get_status()
+            # 調整棧深度需要重新開始追蹤
+            tracemalloc.stop()
+        tracemalloc.start(nframes)
+        self.started_at = datetime.now().isoformat()
+        logger.info(f"已開始追蹤內存分配 (調用棧深度: {nframes})")
+        return self.get_status()
+
+    def stop(self) -> Dict[str, Any]:
+        """停止追蹤並釋放 tracemalloc 佔用的內存"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("已停止追蹤內存分配")
+        self.started_at = None
+        return self.get_status()
+
+    def take_snapshot(self, label: str = '') -> Dict[str, Any]:
+        """保存一份快照並返回其摘要"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc 未啟動，請先開始追蹤")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            entry = MemorySnapshot(snapshot_id, label, snapshot, traced_current, traced_peak)
+            self.snapshots[snapshot_id] = entry
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        logger.info(f"已保存內存快照 #{snapshot_id} (已追蹤 {traced_current / 1024 / 1024:.1f} MB)")
+        return entry.to_dict()
+
+    def delete_snapshot(self, snapshot_id: int) -> bool:
+        with self._lock:
+            return self.snapshots.pop(snapshot_id, None) is not None
+
+    def clear_snapshots(self):
+        with self._lock:
+            self.snapshots.clear()
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [entry.to_dict() for entry in self.snapshots.values()]
+
+    def _get(self, snapshot_id: int) -> MemorySnapshot:
+        with self._lock:
+            entry = self.snapshots.get(snapshot_id)
+        if entry is None:
+            raise KeyError(f"快照 #{snapshot_id} 不存在")
+        return entry
+
+    def top_stats(self, snapshot_id: int, group_by: str = 'lineno', limit: int = 20) -> Dict[str, Any]:
+        """單份快照中佔用最多的分配位置"""
+        _check_group_by(group_by)
+        entry = self._get(snapshot_id)
+        stats = entry.snapshot.statistics(group_by)
+        return {
+            'snapshot': entry.to_dict(),
+            'group_by': group_by,
+            'total_bytes': sum(stat.size for stat in stats),
+            'total_blocks': sum(stat.count for stat in stats),
+            'top': [_stat_to_dict(stat) for stat in stats[:limit]]
+        }
+
+    def diff(self, old_id: int, new_id: int, group_by: str = 'lineno', limit: int = 20) -> Dict[str, Any]:
+        """對比兩份快照，按增長字節數排序"""
+        _check_group_by(group_by)
+        old_entry = self._get(old_id)
+        new_entry = self._get(new_id)
+        stats = new_entry.snapshot.compare_to(old_entry.snapshot, group_by)
+        return {
+            'from': old_entry.to_dict(),
+            'to': new_entry.to_dict(),
+            'group_by': group_by,
+            'size_diff_bytes': sum(stat.size_diff for stat in stats),
+            'count_diff': sum(stat.count_diff for stat in stats),
+            'top': [_stat_diff_to_dict(stat) for stat in stats[:limit]]
+        }
+
+    def object_counts(self, type_names: Iterable[str] = DEFAULT_TRACKED_TYPES) -> Dict[str, int]:
+        """按類型名統計存活對象數（遍歷 gc 追蹤的全部對象，大堆上可能需要數百毫秒）"""
+        wanted = set(type_names)
+        counts = Counter()
+        for obj in gc.get_objects():
+            name = type(obj).__name__
+            if name in wanted:
+                counts[name] += 1
+        return {name: counts.get(name, 0) for name in type_names}
+
+    def get_status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        status: Dict[str, Any] = {
+            'pid': os.getpid(),
+            'tracing': tracing,
+            'started_at': self.started_at,
+            'traceback_limit': tracemalloc.get_traceback_limit() if tracing else None,
+            'traced_current_bytes': None,
+            'traced_peak_bytes': None,
+            'tracemalloc_overhead_bytes': None,
+            'max_rss_bytes': _max_rss_bytes(),
+            'snapshots': self.list_snapshots()
+        }
+        if tracing:
+            status['traced_current_bytes'], status['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+            status['tracemalloc_overhead_bytes'] = tracemalloc.get_tracemalloc_memory()
+        return status
+
+
+def _check_group_by(group_by: str):
+    if group_by not in GROUP_BY_OPTIONS:
+        raise ValueError(f"不支持的分組方式: {group_by}，可選: {', '.join(GROUP_BY_OPTIONS)}")
+
+
+def _frames_to_list(traceback: tracemalloc.Traceback) -> List[Dict[str, Any]]:
+    return [
+        {
+            'filename': frame.filename,
+            'lineno': frame.lineno,
+            'line': linecache.getline(frame.filename, frame.lineno).strip()
+        }
+        for frame in traceback
+    ]
+
+
+def _stat_to_dict(stat: tracemalloc.Statistic) -> Dict[str, Any]:
+    return {
+        'size_bytes': stat.size,
+        'count': stat.count,
+        'traceback': _frames_to_list(stat.traceback)
+    }
+
+
+def _stat_diff_to_dict(stat: tracemalloc.StatisticDiff) -> Dict[str, Any]:
+    return {
+        'size_bytes': stat.size,
+        'size_diff_bytes': stat.size_diff,
+        'count': stat.count,
+        'count_diff': stat.count_diff,
+        'traceback': _frames_to_list(stat.traceback)
+    }
+
+
+def _max_rss_bytes() -> Optional[int]:
+    """進程峰值常駐內存（Linux 上 ru_maxrss 單位為 KB，macOS 為字節）"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024
+
+
+# 進程內共享的內存分析器
+memory_profiler = MemoryProfiler()
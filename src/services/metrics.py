@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每輪記錄的計數器
+CYCLE_COUNTERS = (
+    'requests',
+    'request_errors',
+    'bytes_downloaded',
+    'products_processed',
+    'rows_written',
+    'db_commits',
+    'db_queries',
+    'slow_queries',
+    'notifications_sent',
+    'notification_failures',
+)
+
+# 每輪累計的耗時（秒），用於區分上游延遲、解析、數據庫提交與通知發送
+CYCLE_TIMERS = (
+    'request_seconds',
+    'parse_seconds',
+    'db_seconds',
+    'db_query_seconds',
+    'notification_seconds',
+)
+
+
+class CycleMetrics:
+    """單輪更新的指標：各階段與各來源耗時、請求數、下載字節、處理商品數、寫入行數與通知數"""
+
+    def __init__(self, kind: str = 'update'):
+        self.kind = kind
+        self.started_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.status = 'running'
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.sources: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = dict.fromkeys(CYCLE_COUNTERS, 0)
+        self.timers: Dict[str, float] = dict.fromkeys(CYCLE_TIMERS, 0.0)
+        self.top_queries: List[Dict[str, Any]] = []  # 執行次數最多的 SQL 語句
+
+    @contextmanager
+    def stage(self, name: str):
+        """計時一個階段（可跨 await）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    @contextmanager
+    def source(self, name: str, products: int = 0):
+        """計時一批來源商品的處理"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.sources.setdefault(name, {'seconds': 0.0, 'products': 0, 'batches': 0})
+            entry['seconds'] += time.perf_counter() - started
+            entry['products'] += products
+            entry['batches'] += 1
+
+    def incr(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+
+    def add_time(self, timer: str, seconds: float):
+        self.timers[timer] += seconds
+
+    def finish(self, status: str = 'completed'):
+        self.status = status
+        self.duration = time.perf_counter() - self._started
+        self.finished_at = datetime.now().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = self.duration if self.duration is not None else time.perf_counter() - self._started
+        return {
+            'kind': self.kind,
+            'status': self.status,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration': round(duration, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'sources': {
+                name: {**entry, 'seconds': round(entry['seconds'], 6)}
+                for name, entry in self.sources.items()
+            },
+            'counters': dict(self.counters),
+            'timers': {name: round(seconds, 6) for name, seconds in self.timers.items()},
+            'top_queries': self.top_queries,
+            'products_per_second': (
+                round(self.counters['products_processed'] / duration, 2) if duration > 0 else None
+            )
+        }
+
+
+class MetricsRegistry:
+    """保存最近 N 輪更新指標的環形緩衝區，並維護進程級累計計數"""
+
+    def __init__(self, max_runs: int = 50):
+        self.runs: Deque[CycleMetrics] = deque(maxlen=max_runs)
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def start_cycle(self, kind: str = 'update') -> CycleMetrics:
+        """開始記錄一輪，立即放入緩衝區以便查看進行中的輪次"""
+        cycle = CycleMetrics(kind)
+        with self._lock:
+            self.runs.append(cycle)
+        return cycle
+
+    def finish_cycle(self, cycle: CycleMetrics, status: str = 'completed'):
+        """結束一輪並累計到進程級總數"""
+        cycle.finish(status)
+        with self._lock:
+            totals = self.totals.setdefault(cycle.kind, {'runs': 0, 'failed_runs': 0, 'partial_runs': 0,
+                                                         'seconds': 0.0})
+            totals['runs'] += 1
+            if status == 'partial':
+                totals['partial_runs'] += 1
+            elif status != 'completed':
+                totals['failed_runs'] += 1
+            totals['seconds'] += cycle.duration
+            for name, value in cycle.counters.items():
+                totals[name] = totals.get(name, 0) + value
+            for name, value in cycle.timers.items():
+                totals[name] = totals.get(name, 0.0) + value
+        logger.info(f"更新輪次指標 ({cycle.kind}): 耗時 {cycle.duration:.2f} 秒, "
+                    f"{cycle.counters['requests']} 個請求, {cycle.counters['products_processed']} 個商品, "
+                    f"{cycle.counters['db_queries']} 次查詢, {cycle.counters['rows_written']} 行寫入, "
+                    f"{cycle.counters['notifications_sent']} 條通知")
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """最近的輪次（最新在前）"""
+        with self._lock:
+            runs = list(self.runs)
+        runs.reverse()
+        if limit is not None:
+            runs = runs[:limit]
+        return [run.to_dict() for run in runs]
+
+    def to_json(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        with self._lock:
+            totals = {kind: dict(values) for kind, values in self.totals.items()}
+        return {'totals': totals, 'runs': self.recent(limit)}
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式：進程級累計計數與最近一輪完成的各階段耗時"""
+        lines: List[str] = []
+
+        def metric(name: str, metric_type: str, help_text: str, samples: List[tuple]):
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        with self._lock:
+            totals = {kind: dict(values) for kind, values in self.totals.items()}
+            last_finished: Dict[str, CycleMetrics] = {}
+            for run in self.runs:
+                if run.duration is not None:
+                    last_finished[run.kind] = run
+
+        metric('popmart_cycles_total', 'counter', 'Completed update cycles',
+               [({'kind': kind}, int(values['runs'])) for kind, values in totals.items()])
+        metric('popmart_cycles_failed_total', 'counter', 'Failed update cycles',
+               [({'kind': kind}, int(values['failed_runs'])) for kind, values in totals.items()])
+        metric('popmart_cycles_partial_total', 'counter', 'Update cycles cut short by their deadline',
+               [({'kind': kind}, int(values.get('partial_runs', 0))) for kind, values in totals.items()])
+        metric('popmart_cycle_seconds_total', 'counter', 'Total time spent in update cycles',
+               [({'kind': kind}, values['seconds']) for kind, values in totals.items()])
+        for counter in CYCLE_COUNTERS:
+            metric(f'popmart_{counter}_total', 'counter', f'Total {counter.replace("_", " ")}',
+                   [({'kind': kind}, int(values.get(counter, 0))) for kind, values in totals.items()])
+        for timer in CYCLE_TIMERS:
+            metric(f'popmart_{timer}_total', 'counter', f'Total {timer.replace("_", " ")}',
+                   [({'kind': kind}, values.get(timer, 0.0)) for kind, values in totals.items()])
+
+        metric('popmart_last_cycle_duration_seconds', 'gauge', 'Duration of the last finished cycle',
+               [({'kind': kind}, run.duration) for kind, run in last_finished.items()])
+        metric('popmart_last_cycle_stage_seconds', 'gauge', 'Per-stage time of the last finished cycle',
+               [({'kind': kind, 'stage': stage}, seconds)
+                for kind, run in last_finished.items() for stage, seconds in run.stages.items()])
+        metric('popmart_last_cycle_source_seconds', 'gauge', 'Per-source processing time of the last finished cycle',
+               [({'kind': kind, 'source': source}, entry['seconds'])
+                for kind, run in last_finished.items() for source, entry in run.sources.items()])
+        metric('popmart_last_cycle_source_products', 'gauge', 'Products processed per source in the last finished cycle',
+               [({'kind': kind, 'source': source}, entry['products'])
+                for kind, run in last_finished.items() for source, entry in run.sources.items()])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# 進程內共享的指標註冊表
+metrics_registry = MetricsRegistry()
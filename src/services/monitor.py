@@ -1,17 +1,40 @@
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Set
 from datetime import datetime
 import json
 
 from src.services.popmart_api_client import PopmartAPIClient, PopmartProduct
 from src.services.specific_monsters_scraper import SpecificMonstersScraper
+from src.services.catalog_crawler import CatalogCrawler, NewArrivalCrawler
 from src.services.notification_service import NotificationService
 from src.services.auto_repair_service import AutoRepairService
-from src.models.product import Product, PriceHistory, StockHistory, db
+from src.services.metrics import CycleMetrics, metrics_registry
+from src.services.profiling import profiling_controller
+from src.services.request_budget import RequestBudget
+from src.services.work_queue import WorkQueue
+from src.services import query_stats
+from src.models.product import Product, PriceHistory, StockHistory, MonitorState, db
 
 logger = logging.getLogger(__name__)
 
+# 完整更新的階段（默認執行順序）及進度提示
+UPDATE_STAGES = ('new_arrivals', 'limited', 'catalog', 'specific', 'keywords')
+UPDATE_STAGE_MESSAGES = {
+    'new_arrivals': "正在獲取新品...",
+    'limited': "正在獲取限量商品...",
+    'catalog': "正在爬取全目錄...",
+    'specific': "正在獲取特定監控產品...",
+    'keywords': "正在搜索關鍵字產品...",
+}
+
+# 超過期限時已有進展但未完成、結轉到下一輪的階段與關鍵字
+CARRY_OVER_KEY = 'update_carry_over'
+# 全目錄爬取的頁碼游標，中途取消後從此頁繼續
+CATALOG_CRAWL_KEY = 'catalog_crawl'
+
 class MonitorService:
     """監控服務"""
     
@@ -19,13 +42,43 @@ class MonitorService:
                  auto_repair_config: Dict[str, Any] = None):
         self.api_client = api_client
         self.scraper = SpecificMonstersScraper(api_client)
+        self.catalog_crawler = CatalogCrawler(api_client)
+        self.new_arrival_crawler = NewArrivalCrawler(api_client)
         self.notification_service = NotificationService(notification_config)
         self.auto_repair_service = AutoRepairService(auto_repair_config)
         self.update_progress = {"status": "idle", "percentage": 0, "message": ""}
         self._running = False
+        self.inventory_batch_size = 50  # 每次 check_inventory 的最大產品數
+        self.catalog_crawl_interval = 3600  # 全目錄爬取間隔（秒）
+        self._last_catalog_crawl: Optional[datetime] = None
+        self._known_product_ids: Optional[Set[str]] = None  # 已入庫產品ID的內存集合
+        # 本輪開始時數據庫尚無產品（初始入庫）：新增的產品不發送新品與限量商品通知
+        self._seeding = False
+        
+        # 當前輪次的指標，通過請求與通知觀察者累計
+        self.current_metrics: Optional[CycleMetrics] = None
+        self.api_client.request_observers.append(self._observe_request)
+        self.notification_service.delivery_observers.append(self._observe_delivery)
+
+        # 全局請求預算：每次上游請求（含重試）前登記，超出窗口上限時拒絕
+        self.request_budget = RequestBudget()
+        self.api_client.request_guard = self.request_budget.guard
+
+        # 設置後目錄分頁與監控產品詳情改為寫入分片任務隊列，由 worker 進程執行
+        self.work_queue: Optional[WorkQueue] = None
+        self.detail_batch_size = 20  # 每個詳情分片任務的產品數
 
-    async def update_products(self, keywords: List[str] = None):
-        """協調產品數據的更新流程"""
+        # 設置期限時單個階段最多佔用期限的比例，其餘時間留給後續階段
+        self.stage_deadline_share = 0.5
+        self._pending_keywords: List[str] = []
+
+    async def update_products(self, keywords: List[str] = None, deadline: Optional[float] = None):
+        """協調產品數據的更新流程
+
+        設置 deadline（秒）時，超過期限的階段被協作取消：已處理的產品已逐個提交。
+        取消前已有進展的階段（全目錄頁碼游標前進、完成了部分關鍵字）結轉到下一輪，
+        仍按默認順序執行；沒有進展的階段不結轉，按自身節奏重新執行。
+        """
         if self._running:
             logger.warning("更新任務已在進行中，請勿重複觸發")
             return
@@ -33,87 +86,393 @@ class MonitorService:
         self._running = True
         self.update_progress = {"status": "running", "percentage": 0, "message": "正在更新產品數據..."}
         logger.info("開始更新產品數據...")
+        # 本輪解析的所有商品共用同一個時間戳
+        self.api_client.set_cycle_timestamp()
+        metrics = self._start_metrics('update')
+        status = 'failed'
+        # 僅在通過管理接口預約時分析本輪
+        profile = profiling_controller.start('update')
+        deadline_at = time.monotonic() + deadline if deadline else None
         
         try:
-            # 1. 獲取新品
-            self.update_progress["message"] = "正在獲取新品..."
-            new_arrivals = await self.api_client.get_new_arrivals(limit=50)
-            if new_arrivals:
-                await self._process_products(new_arrivals, "新品")
-            self.update_progress["percentage"] = 25
-
-            # 2. 獲取限量商品
-            self.update_progress["message"] = "正在獲取限量商品..."
-            limited_products = await self.api_client.get_limited_products(limit=50)
-            if limited_products:
-                await self._process_products(limited_products, "限量商品")
-            self.update_progress["percentage"] = 50
-
-            # 3. 處理特定監控產品 (通過 scraper)
-            self.update_progress["message"] = "正在獲取特定監控產品..."
-            specific_products = await self.scraper.get_all_products()
-            if specific_products:
-                await self._process_products(specific_products, "特定監控產品")
-            self.update_progress["percentage"] = 75
-
-            # 4. 如果有關鍵字，進行搜索並處理
-            if keywords and len(keywords) > 0:
-                self.update_progress["message"] = "正在搜索關鍵字產品..."
-                for i, keyword in enumerate(keywords):
-                    search_results = await self.api_client.search_products(keyword, limit=20)
-                    if search_results:
-                        await self._process_products(search_results, f"搜索結果: {keyword}")
-                    self.update_progress["percentage"] = 75 + (i + 1) / len(keywords) * 20
-
-            self.update_progress = {"status": "completed", "percentage": 100, "message": "產品數據更新完成。"}
-            logger.info("產品數據更新完成。")
+            self._seeding = not self._get_known_product_ids()
+            if self._seeding:
+                logger.info("數據庫尚無產品，本輪為初始入庫，不發送新品與限量商品通知")
+            carry_over = MonitorState.get_value(CARRY_OVER_KEY, {})
+            stages = self._plan_update_stages(carry_over.get('stages', []))
+            if carry_over.get('stages'):
+                logger.info(f"上一輪結轉的階段本輪繼續: {', '.join(carry_over['stages'])}")
+            # 上一輪未搜索的關鍵字排在前面
+            self._pending_keywords = [k for k in carry_over.get('keywords', []) if k in (keywords or [])]
+            self._pending_keywords += [k for k in (keywords or []) if k not in self._pending_keywords]
+
+            unfinished: List[str] = []
+            carried: List[str] = []
+            for i, stage in enumerate(stages):
+                if stage == 'keywords' and not self._pending_keywords:
+                    continue
+                remaining = deadline_at - time.monotonic() if deadline_at is not None else None
+                if remaining is not None and remaining <= 0:
+                    unfinished.append(stage)
+                    continue
+                self.update_progress["message"] = UPDATE_STAGE_MESSAGES[stage]
+                progress = self._stage_progress(stage)
+                with metrics.stage(stage):
+                    try:
+                        await asyncio.wait_for(self._run_update_stage(stage), self._stage_timeout(remaining, deadline))
+                    except asyncio.TimeoutError:
+                        # 被取消的階段可能留下未提交的寫入
+                        db.session.rollback()
+                        unfinished.append(stage)
+                        if progress is not None and self._stage_progress(stage) != progress:
+                            carried.append(stage)
+                            logger.warning(f"更新階段 {stage} 超過本輪期限，已取消並結轉到下一輪")
+                        else:
+                            logger.warning(f"更新階段 {stage} 超過本輪期限且沒有進展，已取消，不結轉")
+                self.update_progress["percentage"] = round((i + 1) / len(stages) * 95)
+
+            MonitorState.set_value(CARRY_OVER_KEY, {
+                'stages': carried,
+                'keywords': self._pending_keywords if 'keywords' in carried else [],
+                'updated_at': datetime.now().isoformat()
+            })
+            if unfinished:
+                status = 'partial'
+                message = f"產品數據部分更新，未完成的階段: {', '.join(unfinished)}"
+                if carried:
+                    message += f"（結轉到下一輪: {', '.join(carried)}）"
+                logger.warning(message)
+            else:
+                status = 'completed'
+                message = "產品數據更新完成。"
+                logger.info(message)
+            self.update_progress = {"status": status, "percentage": 100, "message": message}
 
         except Exception as e:
             logger.error(f"產品數據更新失敗: {e}", exc_info=True)
             self.update_progress = {"status": "failed", "percentage": 0, "message": f"產品數據更新失敗: {str(e)}"}
         finally:
+            self._finish_metrics(status)
+            if profile is not None:
+                profiling_controller.finish(profile, metrics.to_dict())
+            self.api_client.cycle_timestamp = None
+            self._seeding = False
             self._running = False
 
-    async def _process_products(self, products: List[PopmartProduct], source: str):
-        """處理獲取的產品列表，包括保存和變化檢測"""
+    def _plan_update_stages(self, carried: List[str]) -> List[str]:
+        """本輪要執行的階段，按默認順序；全目錄到期或上一輪結轉時才執行"""
+        return [stage for stage in UPDATE_STAGES
+                if stage != 'catalog' or stage in carried or self._is_catalog_crawl_due()]
+
+    def _stage_progress(self, stage: str) -> Optional[Any]:
+        """階段可續做的進度標記，取消前後不同即表示有進展；不可續做的階段返回 None"""
+        if stage == 'catalog' and self.work_queue is None:
+            state = MonitorState.get_value(CATALOG_CRAWL_KEY, {})
+            return state.get('next_page', 1) if state.get('in_progress') else 1
+        if stage == 'keywords':
+            return len(self._pending_keywords)
+        return None
+
+    def _stage_timeout(self, remaining: Optional[float], deadline: Optional[float]) -> Optional[float]:
+        """單個階段的時限：不超過本輪剩餘時間，也不超過期限的 stage_deadline_share，避免慢來源擠佔其他階段"""
+        if remaining is None:
+            return None
+        return min(remaining, deadline * self.stage_deadline_share)
+
+    async def _run_update_stage(self, stage: str):
+        """執行一個更新階段"""
+        if stage == 'new_arrivals':
+            await self.crawl_new_arrivals()
+        elif stage == 'limited':
+            limited_products = await self.api_client.get_limited_products(limit=50)
+            if limited_products:
+                await self._process_products(limited_products, "限量商品")
+        elif stage == 'catalog':
+            # 按較慢的節奏爬取全目錄
+            if self.work_queue is not None:
+                await self.plan_catalog_shards()
+            else:
+                await self.crawl_catalog()
+        elif stage == 'specific':
+            # 特定監控產品 (通過 scraper)
+            if not self.plan_detail_shards():
+                specific_products = await self.scraper.get_all_products()
+                if specific_products:
+                    await self._process_products(specific_products, "特定監控產品")
+        elif stage == 'keywords':
+            # 每完成一個關鍵字即從待搜索列表移除，取消時剩餘的關鍵字結轉到下一輪
+            while self._pending_keywords:
+                if self.request_budget.allowance('search') < 1:
+                    logger.warning(f"搜索請求預算已用完，跳過剩餘 {len(self._pending_keywords)} 個關鍵字")
+                    self._pending_keywords = []
+                    break
+                keyword = self._pending_keywords[0]
+                search_results = await self.api_client.search_products(keyword, limit=20)
+                if search_results:
+                    await self._process_products(search_results, f"搜索結果: {keyword}")
+                self._pending_keywords.pop(0)
+
+    def _start_metrics(self, kind: str) -> CycleMetrics:
+        """開始記錄本輪指標"""
+        self.current_metrics = metrics_registry.start_cycle(kind)
+        self._parse_seconds_at_start = self.api_client.product_parser.parse_seconds
+        self._query_collector = query_stats.start_collecting()
+        return self.current_metrics
+
+    def _finish_metrics(self, status: str):
+        """結束本輪指標記錄，解析耗時取本輪的解析器累計增量"""
+        metrics = self.current_metrics
+        if metrics is None:
+            return
+        metrics.add_time('parse_seconds',
+                         self.api_client.product_parser.parse_seconds - self._parse_seconds_at_start)
+        collector = query_stats.stop_collecting(self._query_collector)
+        metrics.incr('db_queries', collector.count)
+        metrics.incr('slow_queries', collector.slow)
+        metrics.add_time('db_query_seconds', collector.seconds)
+        metrics.top_queries = collector.top_statements()
+        metrics_registry.finish_cycle(metrics, status)
+        self.current_metrics = None
+
+    def _observe_request(self, method: str, url: str, status: Optional[int], size: int, elapsed: float):
+        """請求觀察者：記錄端點延遲直方圖，並累計本輪請求數、下載字節與上游耗時"""
+        self.auto_repair_service.record_endpoint_latency(url, elapsed, status)
+        metrics = self.current_metrics
+        if metrics is None:
+            return
+        metrics.incr('requests')
+        metrics.incr('bytes_downloaded', size)
+        metrics.add_time('request_seconds', elapsed)
+        if status is None or status >= 400:
+            metrics.incr('request_errors')
+
+    def _observe_delivery(self, channel: str, success: bool, elapsed: float):
+        """通知投遞觀察者：記錄渠道延遲直方圖，並累計本輪發送數與耗時"""
+        self.auto_repair_service.record_channel_latency(channel, elapsed, success)
+        metrics = self.current_metrics
+        if metrics is None:
+            return
+        metrics.incr('notifications_sent' if success else 'notification_failures')
+        metrics.add_time('notification_seconds', elapsed)
+
+    def _commit(self, rows: int = 0):
+        """提交數據庫事務並記錄提交耗時與寫入行數"""
+        started_at = time.perf_counter()
+        db.session.commit()
+        metrics = self.current_metrics
+        if metrics is not None:
+            metrics.add_time('db_seconds', time.perf_counter() - started_at)
+            metrics.incr('db_commits')
+            metrics.incr('rows_written', rows)
+
+    def _is_catalog_crawl_due(self) -> bool:
+        """檢查是否到了全目錄爬取的時間"""
+        if self._last_catalog_crawl is None:
+            return True
+        elapsed = (datetime.now() - self._last_catalog_crawl).total_seconds()
+        return elapsed >= self.catalog_crawl_interval
+
+    async def crawl_catalog(self):
+        """爬取全目錄，每頁到達後立即處理
+
+        處理每頁前保存頁碼游標（之前的頁都已成功獲取並處理完），中途取消、重啟或有頁面獲取失敗時，
+        下一次從游標頁繼續；只有從第一頁開始的新一輪爬取才重新計算爬取間隔。
+        初始入庫時開始的爬取在續爬時仍視為初始入庫，不發送新品與限量商品通知。
+        """
+        state = MonitorState.get_value(CATALOG_CRAWL_KEY, {})
+        in_progress = bool(state.get('in_progress'))
+        start_page = state.get('next_page', 1) if in_progress else 1
+        seeding = bool(state.get('seeding')) if in_progress else self._seeding
+        if start_page > 1:
+            logger.info(f"上一輪全目錄爬取未完成，從第 {start_page} 頁繼續")
+        else:
+            self._last_catalog_crawl = datetime.now()
+
+        saved_page = start_page
+        async for page_products in self.catalog_crawler.crawl(start_page=start_page):
+            if self.catalog_crawler.cursor != saved_page:
+                saved_page = self.catalog_crawler.cursor
+                MonitorState.set_value(CATALOG_CRAWL_KEY, {'in_progress': True, 'next_page': saved_page,
+                                                           'seeding': seeding})
+            await self._process_products(page_products, "全目錄", seeding=seeding)
+
+        stats = self.catalog_crawler.get_stats()
+        if stats.get('failed_pages'):
+            next_page = self.catalog_crawler.cursor
+            logger.warning(f"全目錄爬取有 {stats['failed_pages']} 頁獲取失敗，下一次從第 {next_page} 頁繼續")
+            MonitorState.set_value(CATALOG_CRAWL_KEY, {'in_progress': True, 'next_page': next_page,
+                                                       'seeding': seeding, 'last_stats': stats})
+        else:
+            MonitorState.set_value(CATALOG_CRAWL_KEY, {
+                'in_progress': False,
+                'last_completed': datetime.now().isoformat(),
+                'last_stats': stats
+            })
+        return stats
+
+    async def plan_catalog_shards(self, pages_per_task: int = 5) -> int:
+        """將全目錄爬取切分為頁碼範圍任務寫入隊列，返回寫入的任務數"""
+        self._last_catalog_crawl = datetime.now()
+        if not self.work_queue.has_capacity('pages'):
+            logger.warning("目錄分片任務積壓過多，本輪不再寫入")
+            return 0
+        page_size = self.catalog_crawler.page_size
+        # 第一頁用於得知總頁數，並直接處理
+        products, meta = await self.api_client.get_products_page(page=1, limit=page_size,
+                                                                 sort=self.catalog_crawler.sort)
+        if products:
+            await self._process_products(products, "全目錄")
+        if not meta.get('ok') or meta.get('is_last_page'):
+            return 0
+        last_page = meta.get('total_pages')
+        if last_page is None:
+            # 總頁數未知時按已知產品數估計，超出最後一頁的任務會提前結束
+            last_page = len(self._get_known_product_ids()) // page_size + 2
+        last_page = min(last_page, self.catalog_crawler.max_pages)
+        if last_page < 2:
+            return 0
+        created = self.work_queue.plan_pages(last_page, first_page=2, pages_per_task=pages_per_task,
+                                             page_size=page_size, sort=self.catalog_crawler.sort,
+                                             seeding=self._seeding)
+        logger.info(f"全目錄已切分為 {created} 個分片任務 (第 2-{last_page} 頁)")
+        return created
+
+    def plan_detail_shards(self) -> bool:
+        """監控產品ID均已知時，將詳情查詢分組寫入隊列；返回 False 表示需由 scraper 直接獲取"""
+        if self.work_queue is None:
+            return False
+        product_ids = self.get_watched_product_ids()
+        if not product_ids or len(product_ids) < len(self.scraper.get_monitored_products()):
+            return False
+        if self.work_queue.has_capacity('details'):
+            batches = [product_ids[i:i + self.detail_batch_size]
+                       for i in range(0, len(product_ids), self.detail_batch_size)]
+            created = self.work_queue.plan_batches('details', batches, priority=5)
+            logger.info(f"監控產品詳情已切分為 {created} 個分片任務")
+        else:
+            logger.warning("詳情分片任務積壓過多，本輪不再寫入")
+        return True
+
+    def _get_known_product_ids(self) -> Set[str]:
+        """獲取已入庫產品ID集合，首次調用時從數據庫載入"""
+        if self._known_product_ids is None:
+            self._known_product_ids = {row[0] for row in db.session.query(Product.id).all()}
+            logger.info(f"已載入 {len(self._known_product_ids)} 個已知產品ID")
+        return self._known_product_ids
+
+    async def crawl_new_arrivals(self):
+        """增量爬取新品，遇到全部已知的頁面即停止
+
+        爬取進度保存在 monitor_state 中：本輪發現的產品ID在整輪完成前不視為已知，
+        只有遇到全部已知的頁面或到達最後一頁才算完成；請求失敗（含超出請求預算）、
+        到達頁數上限或中途重啟時，下一輪從未爬取的頁碼繼續，爬完剩餘的新品。
+        進度只保存頁碼和開始時間，續爬時本輪已發現的產品按入庫時間從數據庫取回。
+        """
+        known_ids = self._get_known_product_ids()
+        state = MonitorState.get_value('new_arrival_crawl', {})
+        in_progress = bool(state.get('in_progress')) and bool(state.get('started_at'))
+        started_at = state['started_at'] if in_progress else datetime.now().isoformat()
+        pending_ids: Set[str] = set()
+        if in_progress:
+            pending_ids = {row[0] for row in db.session.query(Product.id).filter(
+                Product.created_at >= started_at).all()}
+        next_page = state.get('next_page', 1) if in_progress else 1
+        # 初始入庫時開始的爬取在續爬時仍不發送新品與限量商品通知
+        seeding = bool(state.get('seeding')) if in_progress else self._seeding
+        if in_progress:
+            logger.info(f"上一輪新品爬取未完成，已處理 {len(pending_ids)} 個產品，從第 {next_page} 頁繼續")
+
+        def is_known(product_id: str) -> bool:
+            return product_id in known_ids and product_id not in pending_ids
+
+        async for page_products in self.new_arrival_crawler.crawl(is_known, start_page=next_page):
+            page_new_ids = [p.id for p in page_products if not is_known(p.id)]
+            await self._process_products(page_products, "新品", seeding=seeding)
+            next_page += 1
+            pending_ids.update(page_new_ids)
+            MonitorState.set_value('new_arrival_crawl', {
+                'in_progress': True,
+                'started_at': started_at,
+                'next_page': next_page,
+                'seeding': seeding
+            })
+
+        stats = self.new_arrival_crawler.get_stats()
+        if stats.get('stop_reason') in ('all_known', 'last_page'):
+            MonitorState.set_value('new_arrival_crawl', {
+                'in_progress': False,
+                'last_completed': datetime.now().isoformat(),
+                'last_stats': stats
+            })
+        elif stats:
+            logger.warning(f"新品爬取未完成（{stats.get('stop_reason')}），下一輪從第 {next_page} 頁繼續")
+            MonitorState.set_value('new_arrival_crawl', {
+                'in_progress': True,
+                'started_at': started_at,
+                'next_page': next_page,
+                'seeding': seeding,
+                'last_stats': stats
+            })
+        return stats
+
+    async def _process_products(self, products: List[PopmartProduct], source: str,
+                                seeding: Optional[bool] = None):
+        """處理獲取的產品列表，包括保存和變化檢測；seeding 未指定時取本輪是否為初始入庫"""
         if not products:
             logger.warning(f"沒有產品需要處理: {source}")
             return
             
         logger.info(f"開始處理 {len(products)} 個產品 (來源: {source})")
-        
+        metrics = self.current_metrics
+        with metrics.source(source, len(products)) if metrics is not None else nullcontext():
+            await self._process_product_list(products, self._seeding if seeding is None else seeding)
+        if metrics is not None:
+            metrics.incr('products_processed', len(products))
+
+    async def _process_product_list(self, products: List[PopmartProduct], seeding: bool = False):
+        """逐個保存產品並檢測變化；初始入庫（seeding）時新增的產品不發送新品與限量商品通知"""
         for product in products:
             try:
                 # 獲取資料庫中現有的產品數據，用於變化檢測
                 existing_product = Product.query.get(product.id)
+                # 更新前保存舊值，否則下面的比較永遠相等
+                previous = None
                 
                 # 保存或更新產品基本信息
                 if existing_product:
+                    previous = {
+                        'price': existing_product.price,
+                        'in_stock': existing_product.in_stock,
+                        'stock_quantity': existing_product.stock_quantity,
+                        'is_new': existing_product.is_new,
+                        'is_limited': existing_product.is_limited
+                    }
                     # 更新現有產品
                     self._update_product_from_api(existing_product, product)
-                    db.session.commit()
+                    self._commit(rows=1)
                     logger.debug(f"更新產品: {product.name}")
                 else:
                     # 創建新產品
                     new_product = self._create_product_from_api(product)
                     db.session.add(new_product)
-                    db.session.commit()
+                    self._commit(rows=1)
                     logger.info(f"新增產品: {product.name}")
-                    existing_product = new_product
+                    if self._known_product_ids is not None:
+                        self._known_product_ids.add(product.id)
                 
                 # 檢測並保存價格歷史，並發送通知
-                if existing_product and (
-                    not existing_product.price or 
-                    abs(existing_product.price - product.price) > 0.01
+                if previous and (
+                    not previous['price'] or 
+                    abs(previous['price'] - product.price) > 0.01
                 ):
-                    old_price = existing_product.price or 0
+                    old_price = previous['price'] or 0
                     price_history = PriceHistory(
                         product_id=product.id,
                         price=product.price,
                         discount_price=product.discount_price
                     )
                     db.session.add(price_history)
-                    db.session.commit()
+                    self._commit(rows=1)
                     logger.info(f"價格變化: {product.name} 從 {old_price} 變為 {product.price}")
                     
                     # 發送價格變動通知
@@ -126,34 +485,27 @@ class MonitorService:
                         logger.error(f"發送價格變動通知失敗: {e}")
 
                 # 檢測並保存庫存歷史，並發送通知
-                if existing_product and (
-                    existing_product.in_stock != product.in_stock or 
-                    existing_product.stock_quantity != product.stock_quantity
+                if previous and (
+                    previous['in_stock'] != product.in_stock or 
+                    previous['stock_quantity'] != product.stock_quantity
                 ):
-                    old_in_stock = existing_product.in_stock
+                    old_in_stock = previous['in_stock']
                     stock_history = StockHistory(
                         product_id=product.id,
                         in_stock=product.in_stock,
                         stock_quantity=product.stock_quantity
                     )
                     db.session.add(stock_history)
-                    db.session.commit()
-                    logger.info(f"庫存變化: {product.name} 從 {old_in_stock}/{existing_product.stock_quantity} 變為 {product.in_stock}/{product.stock_quantity}")
+                    self._commit(rows=1)
+                    logger.info(f"庫存變化: {product.name} 從 {old_in_stock}/{previous['stock_quantity']} 變為 {product.in_stock}/{product.stock_quantity}")
                     
                     # 發送庫存變動通知
-                    try:
-                        product_data = self._prepare_notification_data(product)
-                        if not old_in_stock and product.in_stock:
-                            # 從無貨變為有貨
-                            await self.notification_service.send_stock_available_notification(product_data)
-                        elif old_in_stock and not product.in_stock:
-                            # 從有貨變為無貨
-                            await self.notification_service.send_stock_out_notification(product_data)
-                    except Exception as e:
-                        logger.error(f"發送庫存變動通知失敗: {e}")
+                    await self._send_stock_change_notification(product, old_in_stock)
 
                 # 針對新品和限量商品進行特殊處理並發送通知
-                if product.is_new and (not existing_product or not existing_product.is_new):
+                if seeding and not previous:
+                    continue
+                if product.is_new and (not previous or not previous['is_new']):
                     logger.info(f"發現新上架商品: {product.name}")
                     try:
                         product_data = self._prepare_notification_data(product)
@@ -161,7 +513,7 @@ class MonitorService:
                     except Exception as e:
                         logger.error(f"發送新品通知失敗: {e}")
                         
-                if product.is_limited and (not existing_product or not existing_product.is_limited):
+                if product.is_limited and (not previous or not previous['is_limited']):
                     logger.info(f"發現限量商品: {product.name}")
                     try:
                         product_data = self._prepare_notification_data(product)
@@ -174,6 +526,107 @@ class MonitorService:
                 # 繼續處理下一個產品，不中斷整個流程
                 continue
 
+    async def _send_stock_change_notification(self, product, old_in_stock: bool):
+        """根據庫存狀態變化發送補貨或缺貨通知"""
+        try:
+            product_data = self._prepare_notification_data(product)
+            if not old_in_stock and product.in_stock:
+                # 從無貨變為有貨
+                await self.notification_service.send_stock_available_notification(product_data)
+            elif old_in_stock and not product.in_stock:
+                # 從有貨變為無貨
+                await self.notification_service.send_stock_out_notification(product_data)
+        except Exception as e:
+            logger.error(f"發送庫存變動通知失敗: {e}")
+
+    async def refresh_inventory(self, product_ids: List[str] = None) -> int:
+        """僅刷新庫存：將監控產品分批調用 check_inventory 並行查詢，只更新庫存字段"""
+        if self._running:
+            logger.warning("更新任務已在進行中，跳過本次庫存刷新")
+            return 0
+        
+        self._running = True
+        changed_count = 0
+        status = 'failed'
+        try:
+            if product_ids is None:
+                product_ids = self.get_watched_product_ids()
+            if not product_ids:
+                logger.info("沒有需要刷新庫存的產品")
+                return 0
+            
+            metrics = self._start_metrics('inventory')
+            batches = self.api_client.chunk_inventory_ids(product_ids, self.inventory_batch_size)
+            logger.info(f"開始庫存刷新: {len(product_ids)} 個產品，分為 {len(batches)} 批")
+            
+            with metrics.stage('fetch'):
+                results = await asyncio.gather(
+                    *(self.api_client.check_inventory(batch) for batch in batches),
+                    return_exceptions=True
+                )
+            with metrics.stage('apply'):
+                for batch, inventory in zip(batches, results):
+                    if isinstance(inventory, Exception):
+                        logger.error(f"庫存批量查詢失敗 ({len(batch)} 個產品): {inventory}")
+                        continue
+                    changed_count += await self._apply_inventory(inventory)
+            
+            logger.info(f"庫存刷新完成，{changed_count} 個產品庫存變化")
+            status = 'completed'
+        except Exception as e:
+            logger.error(f"庫存刷新失敗: {e}", exc_info=True)
+        finally:
+            self._finish_metrics(status)
+            self._running = False
+        return changed_count
+
+    async def _apply_inventory(self, inventory: Dict[str, Dict[str, Any]]) -> int:
+        """將一批庫存查詢結果寫入數據庫，返回庫存變化的產品數"""
+        if not inventory:
+            return 0
+        
+        now = datetime.now().isoformat()
+        changed_products = []
+        db_products = Product.query.filter(Product.id.in_(list(inventory.keys()))).all()
+        for db_product in db_products:
+            stock = inventory[db_product.id]
+            in_stock = bool(stock.get('in_stock', False))
+            stock_quantity = stock.get('quantity')
+            db_product.last_checked = now
+            
+            if db_product.in_stock == in_stock and db_product.stock_quantity == stock_quantity:
+                continue
+            
+            old_in_stock = db_product.in_stock
+            logger.info(f"庫存變化: {db_product.name} 從 {old_in_stock}/{db_product.stock_quantity} 變為 {in_stock}/{stock_quantity}")
+            db_product.in_stock = in_stock
+            db_product.stock_quantity = stock_quantity
+            db_product.updated_at = now
+            db.session.add(StockHistory(
+                product_id=db_product.id,
+                in_stock=in_stock,
+                stock_quantity=stock_quantity
+            ))
+            changed_products.append((db_product, old_in_stock))
+        
+        # 每批只提交一次
+        self._commit(rows=len(db_products) + len(changed_products))
+        if self.current_metrics is not None:
+            self.current_metrics.incr('products_processed', len(db_products))
+        
+        for db_product, old_in_stock in changed_products:
+            await self._send_stock_change_notification(db_product, old_in_stock)
+        return len(changed_products)
+
+    def get_watched_product_ids(self) -> List[str]:
+        """獲取監控列表中已知ID的產品"""
+        product_ids = []
+        for name in self.scraper.get_monitored_products():
+            product_id = self.scraper.product_name_to_id_map.get(name)
+            if product_id and product_id not in product_ids:
+                product_ids.append(product_id)
+        return product_ids
+
     def _create_product_from_api(self, api_product: PopmartProduct) -> Product:
         """從API產品創建數據庫產品對象"""
         now = datetime.now().isoformat()
@@ -289,7 +742,7 @@ class MonitorService:
 
 
     def _prepare_notification_data(self, product: PopmartProduct) -> Dict[str, Any]:
-        """準備通知數據"""
+        """準備通知數據（也接受數據庫 Product 對象）"""
         return {
             'product_name': product.name,
             'price': product.price,
@@ -1,7 +1,8 @@
 import logging
 import aiohttp
 import asyncio
-from typing import Dict, List, Optional, Any
+import time
+from typing import Callable, Dict, List, Optional, Any
 from datetime import datetime
 import json
 
@@ -16,6 +17,9 @@ class NotificationService:
         self.discord_config = self.config.get('discord', {})
         self.session: Optional[aiohttp.ClientSession] = None
         
+        # 投遞觀察者：observer(渠道, 是否成功, 耗時秒)，用於指標統計
+        self.delivery_observers: List[Callable[[str, bool, float], None]] = []
+        
         # 通知模板
         self.templates = {
             'stock_available': {
@@ -77,11 +81,11 @@ class NotificationService:
             results = []
             
             if self.telegram_config.get('enabled', False):
-                result = await self._send_telegram_message(title, message)
+                result = await self._deliver('telegram', self._send_telegram_message, title, message)
                 results.append(('telegram', result))
             
             if self.discord_config.get('enabled', False):
-                result = await self._send_discord_message(title, message)
+                result = await self._deliver('discord', self._send_discord_message, title, message)
                 results.append(('discord', result))
             
             # 記錄結果
@@ -99,6 +103,19 @@ class NotificationService:
             logger.error(f"發送通知時發生錯誤: {e}", exc_info=True)
             return False
     
+    async def _deliver(self, channel: str, send, title: str, message: str) -> bool:
+        """發送到單個渠道並通知投遞觀察者"""
+        started_at = time.monotonic()
+        result = await send(title, message)
+        if self.delivery_observers:
+            elapsed = time.monotonic() - started_at
+            for observer in self.delivery_observers:
+                try:
+                    observer(channel, result, elapsed)
+                except Exception as e:
+                    logger.debug(f"投遞觀察者出錯: {e}")
+        return result
+    
     async def _send_telegram_message(self, title: str, message: str) -> bool:
         """發送Telegram消息"""
         try:
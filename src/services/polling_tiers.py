@@ -0,0 +1,427 @@
+import heapq
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 輪詢層級，按優先級從高到低排列
+POLLING_TIERS = ('hot', 'watched', 'warm', 'normal', 'cold')
+
+# 發售窗口內的產品脫離所在層級，按各自的加速間隔輪詢
+BURST_TIER = 'burst'
+
+# 各層級的默認輪詢間隔（秒）
+DEFAULT_TIER_INTERVALS = {
+    'hot': 15,        # 近期有變化，或限量/預售且庫存緊張
+    'watched': 60,    # 監控列表中的產品
+    'warm': 300,      # 限量、預售或庫存偏低
+    'normal': 1800,   # 其他有貨產品
+    'cold': 1800,     # 無貨的普通產品，補貨是最重要的變化，不慢於完整更新的節奏
+}
+
+# 默認請求預算：分層輪詢的庫存請求數不超過每 300 秒輪詢全部產品一次
+DEFAULT_BUDGET_INTERVAL = 300
+
+# 固定頻率輪詢（默認策略）的間隔（秒）：監控列表以外的產品統一按此間隔輪詢
+DEFAULT_FIXED_INTERVAL = 300
+
+# 按預算調整間隔時只用其中的比例，其餘留給升級後立即到期的產品
+BUDGET_HEADROOM = 0.8
+
+
+class TierPolicy:
+    """根據產品屬性決定輪詢層級"""
+
+    def __init__(self, low_stock_threshold: int = 10, recent_change_window: int = 3600):
+        self.low_stock_threshold = low_stock_threshold
+        self.recent_change_window = recent_change_window  # 視為「近期有變化」的時間窗口（秒）
+
+    def classify(self, is_limited: bool = False, is_pre_order: bool = False, in_stock: bool = False,
+                 stock_quantity: Optional[int] = None, watched: bool = False,
+                 recently_changed: bool = False) -> str:
+        low_stock = bool(in_stock) and stock_quantity is not None and stock_quantity <= self.low_stock_threshold
+        scarce = bool(is_limited) or bool(is_pre_order)
+        if recently_changed or (scarce and low_stock):
+            return 'hot'
+        if watched:
+            return 'watched'
+        if scarce or low_stock:
+            return 'warm'
+        if in_stock:
+            return 'normal'
+        return 'cold'
+
+
+class TieredPollingPlanner:
+    """多隊列輪詢計劃：每個層級一條按到期時間排序的隊列，每次只取出已到期的產品
+
+    同一層級的間隔相同，輪詢後的產品追加到隊尾即可保持隊列有序；
+    變更層級的產品按新層級的間隔從上次輪詢起計算到期時間：已到期的放到隊首，其餘追加到隊尾。
+    處於發售加速期的產品（數量很少）另存一個按產品間隔輪詢的集合，優先於所有層級。
+    """
+
+    def __init__(self, policy: Optional[TierPolicy] = None, intervals: Optional[Dict[str, float]] = None,
+                 sync_interval: float = 60, clock: Callable[[], float] = time.monotonic):
+        self.policy = policy or TierPolicy()
+        self.sync_interval = sync_interval  # 重新分層的間隔（秒）
+        self.clock = clock
+        self._queues: Dict[str, "OrderedDict[str, float]"] = {tier: OrderedDict() for tier in POLLING_TIERS}
+        self._tiers: Dict[str, str] = {}  # 產品ID -> 層級
+        self._last_polled: Dict[str, float] = {}
+        self._last_sync: Optional[float] = None
+        self._bursts: Dict[str, float] = {}  # 產品ID -> 加速期輪詢間隔
+        self._burst_due: Dict[str, float] = {}
+        self.polled_counts: Dict[str, int] = dict.fromkeys((BURST_TIER,) + POLLING_TIERS, 0)
+        self.batch_size = 50  # 每個庫存查詢請求的產品數
+        # 預算間隔：與每 budget_interval 秒輪詢全部產品一次的請求數相同；None 表示不限制
+        self.budget_interval: Optional[float] = DEFAULT_BUDGET_INTERVAL
+        self.budget_factor = 1.0  # 為滿足預算，層級與加速間隔統一放慢的比例
+        # 設置時按固定頻率輪詢：除監控列表外各層級都使用此間隔，不按預算調整；None 表示分層輪詢
+        self.fixed_interval: Optional[float] = DEFAULT_FIXED_INTERVAL
+        self.intervals: Dict[str, float] = dict(DEFAULT_TIER_INTERVALS)
+        self.effective_intervals: Dict[str, float] = dict(self.intervals)  # 按預算調整後實際使用的層級間隔
+        if intervals:
+            self.set_intervals(intervals)
+
+    def validate_intervals(self, intervals: Dict[str, float]):
+        """校驗層級間隔，不修改當前配置"""
+        for tier, interval in intervals.items():
+            if tier not in self.intervals:
+                raise ValueError(f"未知的輪詢層級: {tier}")
+            if isinstance(interval, bool) or not isinstance(interval, (int, float)):
+                raise ValueError(f"輪詢間隔必須是數值: {tier}")
+            if interval <= 0:
+                raise ValueError(f"輪詢間隔必須大於 0: {tier}")
+
+    def set_intervals(self, intervals: Dict[str, float]):
+        """更新層級間隔（全部校驗通過後才生效），已排隊產品的到期時間在下次輪詢後生效"""
+        self.validate_intervals(intervals)
+        self.intervals.update(intervals)
+        self.fit_to_budget()
+
+    def set_fixed_interval(self, interval: Optional[float]):
+        """切換固定頻率（interval）與分層輪詢（None），立即重新計算實際間隔"""
+        if interval is not None and interval <= 0:
+            raise ValueError("固定輪詢間隔必須大於 0")
+        self.fixed_interval = interval
+        self.fit_to_budget()
+
+    def _base_intervals(self) -> Dict[str, float]:
+        """未按預算調整的層級間隔；固定頻率時監控列表以外的層級均為 fixed_interval"""
+        if self.fixed_interval is None:
+            return self.intervals
+        return {tier: interval if tier == 'watched' else self.fixed_interval
+                for tier, interval in self.intervals.items()}
+
+    def _stretch(self, interval: float, factor: float) -> float:
+        """按比例放慢的間隔，不慢於最慢層級的配置間隔（本身更慢的保持不變）"""
+        return max(interval, min(interval * factor, max(self.intervals.values())))
+
+    def _requests_per_hour(self, factor: float, batch_size: Optional[int] = None) -> float:
+        """按放慢比例估算每小時的庫存查詢請求數（含加速集合）
+
+        批次由即將到期的產品補滿，請求數取每小時輪詢的產品數除以批次大小，
+        且不少於最快的產品每個間隔一次。
+        """
+        base = self._base_intervals()
+        rates = [(len(self._queues[tier]), 3600 / self._stretch(base[tier], factor))
+                 for tier in POLLING_TIERS if self._queues[tier]]
+        rates.extend((1, 3600 / self._stretch(interval, factor)) for interval in self._bursts.values())
+        if not rates:
+            return 0.0
+        polls = sum(count * rate for count, rate in rates)
+        return max(polls / (batch_size or self.batch_size), max(rate for _, rate in rates))
+
+    def fit_to_budget(self) -> Dict[str, float]:
+        """按請求預算計算實際層級間隔
+
+        估算的請求數超過預算（每 budget_interval 秒輪詢全部產品一次）時，各層級與加速間隔按同一比例放慢，
+        保持快慢順序，但不慢於最慢層級的配置間隔；產品太少、批次無法再合併時以該上限為準。
+        固定頻率輪詢時不調整。
+        """
+        factor = 1.0
+        if self.budget_interval and self._tiers and self.fixed_interval is None:
+            budget = math.ceil(len(self._tiers) / self.batch_size) * 3600 / self.budget_interval * BUDGET_HEADROOM
+            if self._requests_per_hour(factor) > budget:
+                low, high = 1.0, max(self.intervals.values()) / min(self.intervals.values())
+                if self._bursts:
+                    high = max(high, max(self.intervals.values()) / min(self._bursts.values()))
+                if self._requests_per_hour(high) <= budget:
+                    for _ in range(30):
+                        middle = (low + high) / 2
+                        if self._requests_per_hour(middle) <= budget:
+                            high = middle
+                        else:
+                            low = middle
+                factor = high
+        intervals = {tier: round(self._stretch(interval, factor), 1)
+                     for tier, interval in self._base_intervals().items()}
+        if intervals != self.effective_intervals:
+            logger.info(f"按請求預算調整輪詢間隔: {intervals}")
+        self.budget_factor = factor
+        self.effective_intervals = intervals
+        return intervals
+
+    def burst_interval(self, product_id: str) -> float:
+        """加速期產品按預算調整後的輪詢間隔"""
+        return self._stretch(self._bursts[product_id], self.budget_factor)
+
+    def is_sync_due(self) -> bool:
+        return self._last_sync is None or self.clock() - self._last_sync >= self.sync_interval
+
+    def tier_for_interval(self, interval: float) -> str:
+        """間隔不超過 interval 的最慢層級"""
+        for tier in reversed(POLLING_TIERS):
+            if self.intervals[tier] <= interval:
+                return tier
+        return POLLING_TIERS[0]
+
+    def _combine(self, attribute_tier: str, rate_tier: str) -> str:
+        """屬性層級與變化率層級取較高者；普通有貨產品可按變化率降級"""
+        if attribute_tier == 'normal':
+            return rate_tier
+        return min(attribute_tier, rate_tier, key=POLLING_TIERS.index)
+
+    def sync(self, products: Iterable[Dict[str, Any]], watched_ids: Iterable[str] = (),
+             recently_changed_ids: Iterable[str] = (),
+             adaptive_intervals: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+        """按最新的產品屬性重新分層；products 為包含 id 及分層所需屬性的字典
+
+        adaptive_intervals 為變化率模型建議的各產品輪詢間隔，映射到不慢於該間隔的層級。
+        """
+        now = self.clock()
+        watched = set(watched_ids)
+        changed = set(recently_changed_ids)
+        adaptive_intervals = adaptive_intervals or {}
+        seen: Set[str] = set()
+        moved = 0
+
+        for product in products:
+            product_id = product['id']
+            seen.add(product_id)
+            tier = self.policy.classify(
+                is_limited=product.get('is_limited', False),
+                is_pre_order=product.get('is_pre_order', False),
+                in_stock=product.get('in_stock', False),
+                stock_quantity=product.get('stock_quantity'),
+                watched=product_id in watched,
+                recently_changed=product_id in changed
+            )
+            adaptive_interval = adaptive_intervals.get(product_id)
+            if adaptive_interval is not None:
+                tier = self._combine(tier, self.tier_for_interval(adaptive_interval))
+            if self._assign(product_id, tier, now):
+                moved += 1
+
+        # 監控列表中尚未入庫的產品同樣需要輪詢
+        for product_id in watched - seen:
+            seen.add(product_id)
+            tier = 'hot' if product_id in changed else 'watched'
+            if self._assign(product_id, tier, now):
+                moved += 1
+
+        for product_id in [product_id for product_id in self._tiers if product_id not in seen]:
+            self._remove(product_id)
+
+        self._last_sync = now
+        self.fit_to_budget()
+        counts = self.tier_counts()
+        logger.info(f"輪詢分層已更新: {counts}，{moved} 個產品變更層級")
+        return counts
+
+    def sync_from_db(self, watched_ids: Iterable[str] = (),
+                     adaptive_intervals: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+        """從數據庫讀取產品屬性與近期的價格/庫存變化後重新分層（需要應用上下文）"""
+        from src.models.product import Product, PriceHistory, StockHistory, db
+
+        rows = db.session.query(
+            Product.id, Product.is_limited, Product.is_pre_order, Product.in_stock, Product.stock_quantity
+        ).all()
+        cutoff = (datetime.now() - timedelta(seconds=self.policy.recent_change_window)).isoformat()
+        recently_changed: Set[str] = set()
+        for model in (StockHistory, PriceHistory):
+            recently_changed.update(
+                row[0] for row in db.session.query(model.product_id).filter(model.timestamp >= cutoff).distinct()
+            )
+        products = (
+            {'id': row[0], 'is_limited': row[1], 'is_pre_order': row[2], 'in_stock': row[3], 'stock_quantity': row[4]}
+            for row in rows
+        )
+        return self.sync(products, watched_ids, recently_changed, adaptive_intervals)
+
+    def _assign(self, product_id: str, tier: str, now: float) -> bool:
+        """放入指定層級，返回是否變更了層級"""
+        current = self._tiers.get(product_id)
+        if current == tier:
+            return False
+        self._tiers[product_id] = tier
+        if product_id in self._bursts:
+            # 加速期結束後才回到層級隊列
+            return current is not None
+        if current is not None:
+            self._queues[current].pop(product_id, None)
+
+        last_polled = self._last_polled.get(product_id)
+        if current is None or last_polled is None or last_polled + self.effective_intervals[tier] <= now:
+            # 新產品、未輪詢過或按新層級已到期：放到隊首並立即到期
+            queue = self._queues[tier]
+            queue[product_id] = now
+            queue.move_to_end(product_id, last=False)
+        else:
+            self._enqueue_tail(product_id, tier, now)
+        return current is not None
+
+    def _enqueue_tail(self, product_id: str, tier: str, now: float):
+        """按層級間隔計算到期時間並追加到隊尾，不早於隊尾以保持有序"""
+        queue = self._queues[tier]
+        last_polled = self._last_polled.get(product_id)
+        due = last_polled + self.effective_intervals[tier] if last_polled is not None else now
+        tail_due = next(reversed(queue.values())) if queue else due
+        queue[product_id] = max(due, tail_due)
+
+    def _remove(self, product_id: str):
+        tier = self._tiers.pop(product_id, None)
+        if tier is not None:
+            self._queues[tier].pop(product_id, None)
+        self._bursts.pop(product_id, None)
+        self._burst_due.pop(product_id, None)
+        self._last_polled.pop(product_id, None)
+
+    def set_bursts(self, intervals: Dict[str, float]):
+        """設置處於發售加速期的產品及其輪詢間隔；不在其中的產品回到原層級"""
+        now = self.clock()
+        changed = intervals != self._bursts
+        for product_id in [product_id for product_id in self._bursts if product_id not in intervals]:
+            del self._bursts[product_id]
+            del self._burst_due[product_id]
+            self._enqueue_tail(product_id, self._tiers[product_id], now)
+
+        for product_id, interval in intervals.items():
+            tier = self._tiers.get(product_id)
+            if tier is None:
+                continue
+            last_polled = self._last_polled.get(product_id)
+            due = last_polled + self._stretch(interval, self.budget_factor) if last_polled is not None else now
+            if product_id in self._bursts:
+                # 間隔縮短時提前到期，延長時在下次輪詢後生效
+                due = min(due, self._burst_due[product_id])
+            else:
+                self._queues[tier].pop(product_id, None)
+            self._bursts[product_id] = interval
+            self._burst_due[product_id] = due
+        if changed:
+            self.fit_to_budget()
+
+    def due(self, limit: Optional[int] = None, fill_to: Optional[int] = None) -> List[str]:
+        """已到期的產品ID，高層級在前；limit 限制本次最多取出的數量
+
+        提供 fill_to（每個請求的產品數）時，用最快到期的產品補滿最後一個批次：
+        請求數不變，順帶提前刷新這些產品，並讓到期時間對齊以減少零散的小批次。
+        """
+        now = self.clock()
+        due_ids: List[str] = sorted(
+            (product_id for product_id, due_at in self._burst_due.items() if due_at <= now),
+            key=self._burst_due.__getitem__
+        )[:limit]
+        for tier in POLLING_TIERS:
+            for product_id, due_at in self._queues[tier].items():
+                if due_at > now or (limit is not None and len(due_ids) >= limit):
+                    break
+                due_ids.append(product_id)
+        if fill_to and due_ids:
+            target = math.ceil(len(due_ids) / fill_to) * fill_to
+            if limit is not None:
+                target = min(target, limit)
+            chosen = set(due_ids)
+            upcoming = heapq.merge(sorted((due_at, product_id) for product_id, due_at in self._burst_due.items()),
+                                   *(((due_at, product_id) for product_id, due_at in queue.items())
+                                     for queue in self._queues.values()))
+            for _, product_id in upcoming:
+                if len(due_ids) >= target:
+                    break
+                if product_id not in chosen:
+                    chosen.add(product_id)
+                    due_ids.append(product_id)
+        return due_ids
+
+    def mark_polled(self, product_ids: Iterable[str]):
+        """記錄已輪詢的產品，並按所在層級的間隔移到隊尾"""
+        now = self.clock()
+        for product_id in product_ids:
+            tier = self._tiers.get(product_id)
+            if tier is None:
+                continue
+            self._last_polled[product_id] = now
+            if product_id in self._bursts:
+                self._burst_due[product_id] = now + self.burst_interval(product_id)
+                self.polled_counts[BURST_TIER] += 1
+                continue
+            self._queues[tier].pop(product_id, None)
+            self._enqueue_tail(product_id, tier, now)
+            self.polled_counts[tier] += 1
+
+    def tracked_ids(self) -> List[str]:
+        return list(self._tiers)
+
+    def tier_members(self) -> Dict[str, List[Tuple[str, float]]]:
+        """各層級（含加速集合）的 (產品ID, 輪詢間隔) 列表"""
+        members: Dict[str, List[Tuple[str, float]]] = {
+            tier: [(product_id, self.effective_intervals[tier]) for product_id in self._queues[tier]]
+            for tier in POLLING_TIERS
+        }
+        members[BURST_TIER] = [(product_id, self.burst_interval(product_id)) for product_id in self._bursts]
+        return members
+
+    def tier_of(self, product_id: str) -> Optional[str]:
+        if product_id in self._bursts:
+            return BURST_TIER
+        return self._tiers.get(product_id)
+
+    def tier_counts(self) -> Dict[str, int]:
+        return {tier: len(self._queues[tier]) for tier in POLLING_TIERS}
+
+    def next_due_in(self) -> Optional[float]:
+        """距離最近一個產品到期的秒數（無產品時返回 None）"""
+        heads = [next(iter(queue.values())) for queue in self._queues.values() if queue]
+        if self._burst_due:
+            heads.append(min(self._burst_due.values()))
+        if not heads:
+            return None
+        return max(0.0, min(heads) - self.clock())
+
+    def estimated_requests_per_hour(self, batch_size: int = 50) -> float:
+        """穩態下每小時的庫存查詢請求數估算"""
+        return round(self._requests_per_hour(self.budget_factor, batch_size), 1)
+
+    def get_stats(self, batch_size: int = 50) -> Dict[str, Any]:
+        now = self.clock()
+        tiers: Dict[str, Any] = {}
+        for tier in POLLING_TIERS:
+            queue = self._queues[tier]
+            tiers[tier] = {
+                'interval': self.effective_intervals[tier],
+                'configured_interval': self.intervals[tier],
+                'products': len(queue),
+                'due': sum(1 for due_at in queue.values() if due_at <= now),
+                'polled': self.polled_counts[tier]
+            }
+        next_due_in = self.next_due_in()
+        return {
+            'tiers': tiers,
+            'bursts': {
+                'products': len(self._bursts),
+                'due': sum(1 for due_at in self._burst_due.values() if due_at <= now),
+                'min_interval': min(map(self.burst_interval, self._bursts)) if self._bursts else None,
+                'polled': self.polled_counts[BURST_TIER]
+            },
+            'products': len(self._tiers),
+            'next_due_in': round(next_due_in, 3) if next_due_in is not None else None,
+            'last_sync_age': round(now - self._last_sync, 3) if self._last_sync is not None else None,
+            'fixed_interval': self.fixed_interval,
+            'budget_interval': self.budget_interval,
+            'estimated_requests_per_hour': self.estimated_requests_per_hour(batch_size)
+        }
@@ -3,17 +3,36 @@ import asyncio
 import random
 import logging
 import json
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass, asdict
+import math
+import sys
+import time
+from operator import attrgetter
+from collections import OrderedDict
+from urllib.parse import quote
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Dict, Optional, Any, Tuple
+from dataclasses import dataclass, fields
 from datetime import datetime
 
+from src.services.product_parser import ProductParser
+
 # 設置日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _intern(value):
+    """駐留分類字符串，使大量商品共享同一字符串對象"""
+    return sys.intern(value) if value.__class__ is str else value
+
+
+@dataclass(slots=True)
 class PopmartProduct:
-    """Popmart商品數據結構"""
+    """Popmart商品數據結構
+    
+    使用 __slots__ 減少每個實例的內存；品牌、系列、分類、貨幣、材質等重複值會被駐留。
+    created_at / updated_at / last_checked 應由調用方傳入同一輪次的時間戳，
+    缺省時只調用一次 datetime.now()。
+    """
     id: str
     name: str
     price: float
@@ -61,26 +80,68 @@ class PopmartProduct:
             self.image_urls = []
         if self.dimensions is None:
             self.dimensions = {}
-        if not self.last_checked:
-            self.last_checked = datetime.now().isoformat()
-        if not self.created_at:
-            self.created_at = datetime.now().isoformat()
-        self.updated_at = datetime.now().isoformat()
+        
+        self.currency = _intern(self.currency)
+        self.category_id = _intern(self.category_id)
+        self.category_name = _intern(self.category_name)
+        self.brand_id = _intern(self.brand_id)
+        self.brand_name = _intern(self.brand_name)
+        self.series = _intern(self.series)
+        self.material = _intern(self.material)
+        
+        if not (self.last_checked and self.created_at and self.updated_at):
+            now = datetime.now().isoformat()
+            if not self.last_checked:
+                self.last_checked = now
+            if not self.created_at:
+                self.created_at = now
+            if not self.updated_at:
+                self.updated_at = now
 
     def to_dict(self):
-        """將dataclass轉換為字典"""
-        return asdict(self)
+        """將商品轉換為字典（淺拷貝，列表與字典字段與實例共享）"""
+        return dict(zip(_PRODUCT_FIELD_NAMES, _get_product_fields(self)))
+
+
+_PRODUCT_FIELD_NAMES = tuple(field.name for field in fields(PopmartProduct))
+_get_product_fields = attrgetter(*_PRODUCT_FIELD_NAMES)
 
 
 class PopmartAPIClient:
     """Popmart API客戶端"""
     
-    def __init__(self, region: str = "hk"):
+    def __init__(self, region: str = "hk", mock_catalog_size: int = 20, mock_seed: Optional[int] = None,
+                 mock_cycle_seconds: Optional[float] = None, base_url: Optional[str] = None,
+                 mock_data: Optional[bool] = None):
         self.region = region
-        self.base_url = "https://prod-intl-api.popmart.com"
+        self.base_url = (base_url or "https://prod-intl-api.popmart.com").rstrip('/')
         self.web_base_url = f"https://www.popmart.com/{region}"
         self.session: Optional[aiohttp.ClientSession] = None
         self.rate_limiter = asyncio.Semaphore(3)  # 限制並發請求
+        self.request_delay = (1.5, 4.0)  # 每個請求前的隨機延遲範圍（秒）
+        self.max_retries = 3  # 429 響應的最大重試次數
+        self.max_retry_after = 60.0  # 願意等待的最長 Retry-After（秒），超過則放棄請求
+        
+        # 夾具錄製與重放（見 fixture_recorder）
+        self.recorder = None
+        self.transport = None
+        
+        # 請求觀察者：observer(method, url, status, 響應字節數, 耗時秒)，用於指標統計
+        self.request_observers: List[Callable[[str, str, Optional[int], int, float], None]] = []
+        # 請求守衛：guard(url) 在每次請求（含重試）前調用，返回 False 時放棄請求（如超出請求預算）
+        self.request_guard: Optional[Callable[[str], bool]] = None
+        
+        # 條件請求快取：快取鍵 -> ETag / Last-Modified 驗證器與已解析結果
+        self.conditional_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_conditional_entries = 10000
+        self.conditional_stats = {'conditional_requests': 0, 'not_modified': 0}
+        
+        # 按字段規則校驗的商品解析器
+        self.product_parser = ProductParser(PopmartProduct)
+        self.cycle_timestamp: Optional[str] = None  # 當前更新輪次的時間戳
+        
+        # URL 長度上限，用於庫存批量查詢分批
+        self.max_url_length = 2000
         
         # 用戶代理池
         self.user_agents = [
@@ -92,68 +153,52 @@ class PopmartAPIClient:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Edge/120.0.0.0'
         ]
         
-        # 模擬數據
-        self.mock_data = True
-        self.mock_products = self._generate_mock_products()
+        # 模擬數據：可重現的合成目錄（延遲導入，避免循環依賴）
+        from src.services.synthetic_catalog import SyntheticCatalog
+        # 指定 base_url（如本地替身服務器）時默認走真實 HTTP 路徑
+        self.mock_data = mock_data if mock_data is not None else base_url is None
+        self.mock_latency = (0.5, 1.5)  # 模擬請求延遲範圍（秒）
+        self.mock_catalog = SyntheticCatalog(
+            size=mock_catalog_size,
+            seed=mock_seed,
+            cycle_seconds=mock_cycle_seconds,
+            region=region
+        )
+        self.mock_products = self.mock_catalog.products
     
-    def _generate_mock_products(self) -> List[PopmartProduct]:
-        """生成模擬產品數據"""
-        products = []
-        series_list = [
-            "溫度系列", "幻想大亨系列", "迷失在太空系列", "太空旅行系列", 
-            "森林精靈系列", "夢幻星球系列", "太空系列", "海洋系列"
-        ]
-        brands = ["SKULLPANDA", "MOLLY", "DIMOO", "LABUBU", "PUCKY", "HIRONO"]
-        
-        for i in range(1, 21):
-            brand = random.choice(brands)
-            series = random.choice(series_list)
-            product_id = f"prod_{i:03d}"
-            price = random.uniform(100, 500)
-            discount = random.random() < 0.3  # 30% 的產品有折扣
-            discount_price = price * 0.8 if discount else None
-            in_stock = random.random() < 0.7  # 70% 的產品有庫存
-            stock_quantity = random.randint(1, 100) if in_stock else 0
-            is_new = random.random() < 0.2  # 20% 的產品是新品
-            is_limited = random.random() < 0.15  # 15% 的產品是限量版
-            
-            product = PopmartProduct(
-                id=product_id,
-                name=f"{brand} {series} #{i:02d}",
-                description=f"{brand} {series} 系列第 {i} 款，限量發售。",
-                price=price,
-                original_price=price if discount else None,
-                discount_price=discount_price,
-                image_url=f"https://example.com/images/{product_id}.jpg",
-                image_urls=[f"https://example.com/images/{product_id}_{j}.jpg" for j in range(1, 4)],
-                product_url=f"https://www.popmart.com/hk/products/{product_id}",
-                category_id=f"cat_{random.randint(1, 5):02d}",
-                category_name="玩具公仔",
-                brand_id=f"brand_{brands.index(brand) + 1:02d}",
-                brand_name=brand,
-                series=series,
-                in_stock=in_stock,
-                stock_quantity=stock_quantity,
-                max_purchase_quantity=5,
-                is_new=is_new,
-                is_limited=is_limited,
-                is_pre_order=random.random() < 0.1,
-                is_blind_box=random.random() < 0.25,
-                release_date="2025-06-01",
-                dimensions={"height": 10.0, "width": 5.0, "depth": 5.0},
-                weight=0.2,
-                material="PVC",
-                tags=["公仔", brand, series, "收藏品"],
-                sku=f"SKU{product_id}",
-                barcode=f"BAR{product_id}",
-                view_count=random.randint(100, 10000),
-                like_count=random.randint(10, 1000),
-                review_count=random.randint(0, 100),
-                average_rating=random.uniform(3.5, 5.0)
-            )
-            products.append(product)
-        
-        return products
+    async def _mock_delay(self, path: str = "/mock") -> bool:
+        """模擬請求延遲，並按時鐘推進合成目錄；請求守衛拒絕時返回 False"""
+        if not self._allow_request(f"{self.base_url}{path}"):
+            return False
+        started_at = time.monotonic()
+        low, high = self.mock_latency
+        if high > 0:
+            await asyncio.sleep(random.uniform(low, high))
+        self.mock_catalog.sync()
+        if self.request_observers:
+            self._notify_request_observers('GET', f"{self.base_url}{path}", 200, 0, time.monotonic() - started_at)
+        return True
+
+    def _allow_request(self, url: str) -> bool:
+        """詢問請求守衛是否允許發送請求"""
+        return self.request_guard is None or self.request_guard(url)
+    
+    def _notify_request_observers(self, method: str, url: str, status: Optional[int], size: int, elapsed: float):
+        """通知請求觀察者（status 為 None 表示請求異常）"""
+        for observer in self.request_observers:
+            try:
+                observer(method, url, status, size, elapsed)
+            except Exception as e:
+                logger.debug(f"請求觀察者出錯: {e}")
+    
+    def set_cycle_timestamp(self, timestamp: Optional[str] = None):
+        """設置當前更新輪次的時間戳，本輪解析的商品共用此時間戳"""
+        self.cycle_timestamp = timestamp or datetime.now().isoformat()
+    
+    def _timestamp_fields(self) -> Dict[str, str]:
+        """解析商品時傳入的時間戳字段"""
+        timestamp = self.cycle_timestamp or datetime.now().isoformat()
+        return {'created_at': timestamp, 'updated_at': timestamp, 'last_checked': timestamp}
     
     async def __aenter__(self):
         """異步上下文管理器入口"""
@@ -202,73 +247,240 @@ class PopmartAPIClient:
             'X-Currency': 'HKD'
         }
     
-    async def _make_request(self, method: str, url: str, **kwargs) -> Optional[Dict[str, Any]]:
-        """發送HTTP請求"""
+    def _conditional_key(self, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """生成條件請求快取鍵（URL + 排序後的查詢參數）"""
+        if not params:
+            return url
+        query = '&'.join(f"{key}={params[key]}" for key in sorted(params))
+        return f"{url}?{query}"
+    
+    def _conditional_headers(self, cache_key: str) -> Dict[str, str]:
+        """根據已記錄的驗證器生成條件請求頭"""
+        entry = self.conditional_cache.get(cache_key)
+        # 只有在已有解析結果可重用時才發送條件請求
+        if not entry or entry.get('result') is None:
+            return {}
+        
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def _remember_validators(self, cache_key: str, response_headers) -> None:
+        """記錄響應中的 ETag / Last-Modified 驗證器"""
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if not etag and not last_modified:
+            self.conditional_cache.pop(cache_key, None)
+            return
+        
+        # 解析結果由調用方在成功解析後寫入
+        self.conditional_cache[cache_key] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'result': None
+        }
+        self.conditional_cache.move_to_end(cache_key)
+        while len(self.conditional_cache) > self.max_conditional_entries:
+            self.conditional_cache.popitem(last=False)
+    
+    def _store_conditional_result(self, cache_key: str, result: Any) -> None:
+        """保存已解析結果，供 304 響應時重用"""
+        entry = self.conditional_cache.get(cache_key)
+        if entry is not None:
+            entry['result'] = result
+    
+    def _get_conditional_result(self, cache_key: str) -> Any:
+        """獲取 304 響應對應的已解析結果"""
+        entry = self.conditional_cache.get(cache_key)
+        if entry is None:
+            return None
+        self.conditional_cache.move_to_end(cache_key)
+        return entry.get('result')
+    
+    async def _make_request(self, method: str, url: str, cache_key: Optional[str] = None,
+                            conditional: bool = True, **kwargs) -> Optional[Dict[str, Any]]:
+        """發送HTTP請求
+        
+        提供 cache_key 時會記錄響應的驗證器；conditional 為真時附帶條件請求頭，
+        服務器返回 304 時返回 {"code": 304}。
+        """
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay(url.replace(self.base_url, '', 1)):
+                return None
             return {"code": 200, "data": {}}
             
-        if self.session is None:
+        if self.session is None and self.transport is None:
             await self.start_session()
+        
+        if cache_key and conditional:
+            conditional_headers = self._conditional_headers(cache_key)
+            if conditional_headers:
+                kwargs['headers'] = {**(kwargs.get('headers') or {}), **conditional_headers}
+                self.conditional_stats['conditional_requests'] += 1
             
-        async with self.rate_limiter:
-            try:
-                # 隨機延遲避免檢測
-                await asyncio.sleep(random.uniform(1.5, 4.0))
-                
-                async with self.session.request(method, url, **kwargs) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    elif response.status == 429:
-                        logger.warning("請求頻率過高，等待後重試")
-                        await asyncio.sleep(random.uniform(10, 20))
-                        return await self._make_request(method, url, **kwargs)
-                    elif response.status == 403:
+        for attempt in range(self.max_retries + 1):
+            if not self._allow_request(url):
+                return None
+            retry_after = None
+            async with self.rate_limiter:
+                try:
+                    # 隨機延遲避免檢測
+                    low, high = self.request_delay
+                    if high > 0:
+                        await asyncio.sleep(random.uniform(low, high))
+                    
+                    status, response_headers, body = await self._fetch(method, url, **kwargs)
+                    if status == 200:
+                        data = json.loads(body)
+                        if cache_key:
+                            self._remember_validators(cache_key, response_headers)
+                        return data
+                    elif status == 304:
+                        self.conditional_stats['not_modified'] += 1
+                        logger.debug(f"資源未修改，重用快取結果: {url}")
+                        return {"code": 304}
+                    elif status == 429:
+                        retry_after = self._retry_after_seconds(response_headers)
+                        if retry_after > self.max_retry_after:
+                            logger.error(f"請求頻率過高，服務器要求 {retry_after:.0f} 秒後重試，"
+                                         f"超過上限 {self.max_retry_after:.0f} 秒，放棄請求: {url}")
+                            return None
+                    elif status == 403:
                         logger.error("請求被禁止，可能觸發了反爬蟲機制")
                         return None
-                    elif response.status == 404:
+                    elif status == 404:
                         logger.error(f"資源不存在: {url}")
                         return None
                     else:
-                        logger.error(f"請求失敗，狀態碼: {response.status}, URL: {url}")
-                        try:
-                            error_text = await response.text()
-                            logger.error(f"錯誤響應: {error_text[:200]}...")
-                        except:
-                            pass
+                        logger.error(f"請求失敗，狀態碼: {status}, URL: {url}")
+                        if body:
+                            logger.error(f"錯誤響應: {body[:200].decode('utf-8', errors='replace')}...")
                         return None
                         
-            except asyncio.TimeoutError:
-                logger.error(f"請求超時: {url}")
-                return None
-            except Exception as e:
-                logger.error(f"請求異常: {e}, URL: {url}")
-                return None
+                except asyncio.TimeoutError:
+                    logger.error(f"請求超時: {url}")
+                    return None
+                except Exception as e:
+                    logger.error(f"請求異常: {e}, URL: {url}")
+                    return None
+            
+            # 在釋放並發名額後再等待重試，避免佔用信號量導致死鎖
+            if attempt < self.max_retries:
+                logger.warning(f"請求頻率過高，{retry_after:.1f} 秒後重試 ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(retry_after)
+        
+        logger.error(f"請求頻率過高，已重試 {self.max_retries} 次仍失敗: {url}")
+        return None
+    
+    async def _conditional_get(self, url: str, cache_key: str, **kwargs) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """發送條件 GET 請求，返回 (響應, 304 時重用的已解析結果)
+        
+        快取項在請求期間被淘汰時 304 沒有可重用的結果，此時不帶條件請求頭重新請求一次。
+        """
+        response = await self._make_request('GET', url, cache_key=cache_key, **kwargs)
+        if response and response.get('code') == 304:
+            cached = self._get_conditional_result(cache_key)
+            if cached is not None:
+                return response, cached
+            logger.info(f"快取結果已被淘汰，不帶條件請求頭重新請求: {url}")
+            response = await self._make_request('GET', url, cache_key=cache_key, conditional=False, **kwargs)
+        return response, None
+    
+    async def _fetch(self, method: str, url: str, **kwargs) -> Tuple[int, Any, bytes]:
+        """執行單次HTTP交換，返回 (狀態碼, 響應頭, 響應體)；重放模式下從夾具讀取，錄製模式下寫入夾具"""
+        sent_at = time.monotonic()
+        try:
+            if self.transport is not None:
+                status, response_headers, body = await self.transport.request(method, url, **kwargs)
+            else:
+                async with self.session.request(method, url, **kwargs) as response:
+                    status, response_headers, body = response.status, response.headers, await response.read()
+        except BaseException:
+            if self.request_observers:
+                self._notify_request_observers(method, url, None, 0, time.monotonic() - sent_at)
+            raise
+        
+        if self.request_observers:
+            self._notify_request_observers(method, url, status, len(body), time.monotonic() - sent_at)
+        if self.recorder is not None:
+            self.recorder.record(method, url, kwargs.get('params'), kwargs.get('headers'),
+                                 status, response_headers, body, sent_at, time.monotonic() - sent_at)
+        return status, response_headers, body
+    
+    def start_recording(self, path: str):
+        """開始將請求/響應錄製到 gzip NDJSON 夾具文件"""
+        from src.services.fixture_recorder import FixtureRecorder
+        self.stop_recording()
+        self.recorder = FixtureRecorder(path, base_url=self.base_url, region=self.region)
+    
+    def stop_recording(self) -> int:
+        """停止錄製，返回已錄製的請求數"""
+        if self.recorder is None:
+            return 0
+        count = self.recorder.count
+        self.recorder.close()
+        self.recorder = None
+        return count
+    
+    def use_replay(self, path: str, speed: Optional[float] = 1.0):
+        """改用夾具重放代替網絡請求（speed 為重放速度倍數，0 表示不等待）"""
+        from src.services.fixture_recorder import ReplayTransport
+        self.transport = ReplayTransport(path, speed=speed)
+        self.mock_data = False
+        return self.transport
+    
+    def _retry_after_seconds(self, response_headers) -> float:
+        """解析 Retry-After 響應頭（秒數或 HTTP 日期），缺省時隨機等待"""
+        retry_after = response_headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(10, 20)
     
     async def get_products(self, page: int = 1, limit: int = 20, 
                           category: str = None, sort: str = "newest") -> List[PopmartProduct]:
         """獲取商品列表"""
+        products, _ = await self.get_products_page(page=page, limit=limit, category=category, sort=sort)
+        return products
+    
+    async def get_products_page(self, page: int = 1, limit: int = 20, category: str = None,
+                                sort: str = "newest") -> Tuple[List[PopmartProduct], Dict[str, Any]]:
+        """獲取一頁商品列表及分頁元數據
+        
+        元數據包含 ok、page、limit、total、total_pages 與 is_last_page。
+        """
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay("/shop/v1/products"):
+                return [], {'ok': False, 'page': page, 'limit': limit, 'total': None,
+                            'total_pages': None, 'is_last_page': False}
             
-            # 根據排序方式處理
-            sorted_products = self.mock_products.copy()
-            if sort == "newest":
-                # 隨機排序模擬最新
-                random.shuffle(sorted_products)
-            elif sort == "popular":
-                # 按照點讚數排序
-                sorted_products.sort(key=lambda p: p.like_count, reverse=True)
-                
-            # 分頁處理
             start_idx = (page - 1) * limit
             end_idx = start_idx + limit
-            result = sorted_products[start_idx:end_idx]
+            if category:
+                candidates = [p for p in self.mock_catalog.newest() if p.category_id == category]
+                total = len(candidates)
+                result = candidates[start_idx:end_idx]
+            elif sort == "popular":
+                # 按照點讚數排序
+                total = len(self.mock_catalog)
+                result = self.mock_catalog.popular()[start_idx:end_idx]
+            else:
+                # 按上架時間倒序
+                total = len(self.mock_catalog)
+                result = self.mock_catalog.newest(start_idx, end_idx)
             
             logger.info(f"成功獲取 {len(result)} 個商品")
-            return result
+            meta = self._parse_page_meta({'total': total}, page, limit, len(result))
+            return result, meta
         
         params = {
             'page': page,
@@ -281,75 +493,68 @@ class PopmartAPIClient:
             params['category'] = category
         
         url = f"{self.base_url}/shop/v1/products"
-        response = await self._make_request('GET', url, params=params)
+        cache_key = self._conditional_key(url, params)
+        response, cached_page = await self._conditional_get(url, cache_key, params=params)
+        
+        if cached_page is not None:
+            cached_products, cached_meta = cached_page
+            logger.info(f"商品列表未變化，重用 {len(cached_products)} 個已解析商品")
+            return list(cached_products), dict(cached_meta)
         
         if not response or response.get('code') != 200:
             logger.error("獲取商品列表失敗")
-            return []
+            return [], {'ok': False, 'page': page, 'limit': limit, 'total': None,
+                        'total_pages': None, 'is_last_page': False}
         
-        products = []
-        for item in response.get('data', {}).get('products', []):
-            try:
-                product = self._parse_product_data(item)
-                products.append(product)
-            except Exception as e:
-                logger.warning(f"解析商品數據失敗: {e}")
-                continue
+        data = response.get('data', {})
+        products = self.product_parser.parse_page(data.get('products', []), **self._timestamp_fields())
         
+        meta = self._parse_page_meta(data, page, limit, len(data.get('products', [])))
+        self._store_conditional_result(cache_key, (list(products), meta))
         logger.info(f"成功獲取 {len(products)} 個商品")
-        return products
+        return products, meta
+    
+    def _parse_page_meta(self, data: Dict[str, Any], page: int, limit: int, item_count: int) -> Dict[str, Any]:
+        """從響應數據中解析分頁元數據，判斷是否為最後一頁"""
+        pagination = data.get('pagination') or {}
+        total = data.get('total', pagination.get('total'))
+        total_pages = data.get('total_pages', pagination.get('total_pages'))
+        has_more = data.get('has_more', pagination.get('has_more'))
+        
+        if total_pages is None and total is not None and limit > 0:
+            total_pages = max(math.ceil(int(total) / limit), 1)
+        
+        if total_pages is not None:
+            is_last_page = page >= int(total_pages)
+        elif has_more is not None:
+            is_last_page = not has_more
+        else:
+            # 沒有分頁信息時，以不足一頁判斷為最後一頁
+            is_last_page = item_count < limit
+        
+        return {
+            'ok': True,
+            'page': page,
+            'limit': limit,
+            'total': int(total) if total is not None else None,
+            'total_pages': int(total_pages) if total_pages is not None else None,
+            'is_last_page': is_last_page or item_count == 0
+        }
     
     def _parse_product_data(self, item: Dict[str, Any]) -> PopmartProduct:
         """解析商品數據"""
-        return PopmartProduct(
-            id=item.get('id', ''),
-            name=item.get('name', ''),
-            description=item.get('description', ''),
-            price=float(item.get('price', 0)),
-            currency=item.get('currency', 'HKD'),
-            original_price=float(item.get('original_price')) if item.get('original_price') else None,
-            discount_price=float(item.get('discount_price')) if item.get('discount_price') else None,
-            image_url=item.get('image_url', ''),
-            image_urls=item.get('image_urls', []),
-            video_url=item.get('video_url'),
-            product_url=item.get('product_url', ''),
-            category_id=item.get('category_id'),
-            category_name=item.get('category', ''),
-            brand_id=item.get('brand_id'),
-            brand_name=item.get('brand', ''),
-            series=item.get('series'),
-            in_stock=item.get('in_stock', True),
-            stock_quantity=item.get('stock_quantity'),
-            max_purchase_quantity=item.get('max_purchase_quantity'),
-            is_new=item.get('is_new', False),
-            is_limited=item.get('is_limited', False),
-            is_pre_order=item.get('is_pre_order', False),
-            is_blind_box=item.get('is_blind_box', False),
-            release_date=item.get('release_date'),
-            pre_order_start=item.get('pre_order_start'),
-            pre_order_end=item.get('pre_order_end'),
-            dimensions=item.get('dimensions'),
-            weight=item.get('weight'),
-            material=item.get('material'),
-            tags=item.get('tags', []),
-            sku=item.get('sku'),
-            barcode=item.get('barcode'),
-            view_count=item.get('view_count', 0),
-            like_count=item.get('like_count', 0),
-            review_count=item.get('review_count', 0),
-            average_rating=item.get('average_rating', 0.0)
-        )
+        return self.product_parser.parse_item(item, **self._timestamp_fields())
     
     async def get_product_details(self, product_id: str) -> Optional[PopmartProduct]:
         """獲取商品詳情"""
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay("/shop/v1/products/{id}"):
+                return None
             
             # 查找對應ID的產品
-            for product in self.mock_products:
-                if product.id == product_id:
-                    return product
+            product = self.mock_catalog.get(product_id)
+            if product is not None:
+                return product
                     
             # 如果找不到，返回一個新的模擬產品
             brand = random.choice(["SKULLPANDA", "MOLLY", "DIMOO", "LABUBU", "PUCKY", "HIRONO"])
@@ -369,7 +574,12 @@ class PopmartAPIClient:
             )
         
         url = f"{self.base_url}/shop/v1/products/{product_id}"
-        response = await self._make_request('GET', url)
+        cache_key = self._conditional_key(url)
+        response, cached_product = await self._conditional_get(url, cache_key)
+        
+        if cached_product is not None:
+            logger.debug(f"商品詳情未變化，重用已解析結果: {product_id}")
+            return cached_product
         
         if not response or response.get('code') != 200:
             logger.error(f"獲取商品詳情失敗: {product_id}")
@@ -377,24 +587,23 @@ class PopmartAPIClient:
         
         item = response.get('data', {})
         try:
-            return self._parse_product_data(item)
+            product = self._parse_product_data(item)
         except Exception as e:
             logger.error(f"解析商品詳情失敗: {e}")
+            self.conditional_cache.pop(cache_key, None)
             return None
+        
+        self._store_conditional_result(cache_key, product)
+        return product
     
     async def search_products(self, keyword: str, page: int = 1, limit: int = 20) -> List[PopmartProduct]:
         """搜索商品"""
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay("/search/v1/products"):
+                return []
             
-            # 根據關鍵字過濾產品
-            filtered_products = [
-                p for p in self.mock_products 
-                if keyword.lower() in p.name.lower() or 
-                   (p.brand_name and keyword.lower() in p.brand_name.lower()) or
-                   (p.series and keyword.lower() in p.series.lower())
-            ]
+            # 根據關鍵字索引過濾產品
+            filtered_products = self.mock_catalog.search(keyword)
             
             # 分頁處理
             start_idx = (page - 1) * limit
@@ -418,28 +627,46 @@ class PopmartAPIClient:
             logger.error(f"搜索商品失敗: {keyword}")
             return []
         
-        products = []
-        for item in response.get('data', {}).get('products', []):
-            try:
-                product = self._parse_product_data(item)
-                products.append(product)
-            except Exception as e:
-                logger.warning(f"解析搜索結果失敗: {e}")
-                continue
+        products = self.product_parser.parse_page(response.get('data', {}).get('products', []),
+                                                   **self._timestamp_fields())
         
         logger.info(f"搜索 '{keyword}' 找到 {len(products)} 個商品")
         return products
     
+    def chunk_inventory_ids(self, product_ids: List[str], max_batch_size: int = 50) -> List[List[str]]:
+        """按 URL 長度限制將產品ID分批，供 check_inventory 使用"""
+        base_url = f"{self.base_url}/inventory/v1/check?product_ids=&region={quote(self.region)}"
+        budget = max(self.max_url_length - len(base_url), 1)
+        separator_length = len(quote(',', safe=''))
+        
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_length = 0
+        for product_id in product_ids:
+            id_length = len(quote(product_id, safe=''))
+            added_length = id_length + (separator_length if current else 0)
+            if current and (len(current) >= max_batch_size or current_length + added_length > budget):
+                batches.append(current)
+                current = []
+                current_length = 0
+                added_length = id_length
+            current.append(product_id)
+            current_length += added_length
+        
+        if current:
+            batches.append(current)
+        return batches
+    
     async def check_inventory(self, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
         """檢查商品庫存"""
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay("/inventory/v1/check"):
+                return {}
             
             inventory_data = {}
             for product_id in product_ids:
                 # 查找對應ID的產品
-                product = next((p for p in self.mock_products if p.id == product_id), None)
+                product = self.mock_catalog.get(product_id)
                 
                 if product:
                     inventory_data[product_id] = {
@@ -491,21 +718,11 @@ class PopmartAPIClient:
     async def get_new_arrivals(self, limit: int = 50) -> List[PopmartProduct]:
         """獲取新品"""
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay("/shop/v1/products"):
+                return []
             
-            # 篩選新品
-            new_products = [p for p in self.mock_products if p.is_new]
-            # 如果新品不足，隨機添加一些
-            if len(new_products) < limit:
-                additional_products = random.sample([p for p in self.mock_products if not p.is_new], min(limit - len(new_products), len(self.mock_products) - len(new_products)))
-                for p in additional_products:
-                    p.is_new = True
-                new_products.extend(additional_products)
-                
-            # 隨機排序並限制數量
-            random.shuffle(new_products)
-            result = new_products[:limit]
+            # 最新上架的商品
+            result = self.mock_catalog.newest(0, limit)
             
             logger.info(f"成功獲取 {len(result)} 個新品")
             return result
@@ -515,21 +732,11 @@ class PopmartAPIClient:
     async def get_limited_products(self, limit: int = 50) -> List[PopmartProduct]:
         """獲取限量商品"""
         if self.mock_data:
-            # 模擬延遲
-            await asyncio.sleep(random.uniform(0.5, 1.5))
+            if not await self._mock_delay("/shop/v1/products"):
+                return []
             
-            # 篩選限量商品
-            limited_products = [p for p in self.mock_products if p.is_limited]
-            # 如果限量商品不足，隨機添加一些
-            if len(limited_products) < limit:
-                additional_products = random.sample([p for p in self.mock_products if not p.is_limited], min(limit - len(limited_products), len(self.mock_products) - len(limited_products)))
-                for p in additional_products:
-                    p.is_limited = True
-                limited_products.extend(additional_products)
-                
-            # 隨機排序並限制數量
-            random.shuffle(limited_products)
-            result = limited_products[:limit]
+            # 篩選限量商品（按最新排序）
+            result = [p for p in self.mock_catalog.newest() if p.is_limited][:limit]
             
             logger.info(f"成功獲取 {len(result)} 個限量商品")
             return result
@@ -541,22 +748,23 @@ class PopmartAPIClient:
         }
         
         url = f"{self.base_url}/shop/v1/products"
-        response = await self._make_request('GET', url, params=params)
+        cache_key = self._conditional_key(url, params)
+        response, cached_products = await self._conditional_get(url, cache_key, params=params)
+        
+        if cached_products is not None:
+            logger.info(f"限量商品未變化，重用 {len(cached_products)} 個已解析商品")
+            return list(cached_products)
         
         if not response or response.get('code') != 200:
             logger.error("獲取限量商品失敗")
             return []
         
-        products = []
-        for item in response.get('data', {}).get('products', []):
-            try:
-                product = self._parse_product_data(item)
-                product.is_limited = True  # 確保標記為限量商品
-                products.append(product)
-            except Exception as e:
-                logger.warning(f"解析限量商品數據失敗: {e}")
-                continue
+        products = self.product_parser.parse_page(response.get('data', {}).get('products', []),
+                                                   **self._timestamp_fields())
+        for product in products:
+            product.is_limited = True  # 確保標記為限量商品
         
+        self._store_conditional_result(cache_key, list(products))
         logger.info(f"成功獲取 {len(products)} 個限量商品")
         return products
 
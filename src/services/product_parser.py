@@ -0,0 +1,246 @@
+import logging
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ProductParseError(ValueError):
+    """商品數據解析失敗（必填字段缺失或無法轉換）"""
+
+    def __init__(self, errors: Dict[str, str]):
+        self.errors = errors
+        super().__init__(f"商品數據解析失敗: {errors}")
+
+
+def _to_str(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_float(value: Any) -> float:
+    return value if isinstance(value, float) else float(value)
+
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return int(float(value))
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('true', '1', 'yes', 'y'):
+            return True
+        if lowered in ('false', '0', 'no', 'n', ''):
+            return False
+        raise ValueError(f"無法轉換為布爾值: {value!r}")
+    if isinstance(value, (int, float)):
+        return bool(value)
+    raise ValueError(f"無法轉換為布爾值: {value!r}")
+
+
+def _to_str_list(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    raise ValueError(f"不是列表: {type(value).__name__}")
+
+
+def _to_dimensions(value: Any) -> Dict[str, float]:
+    if isinstance(value, dict):
+        return value
+    raise ValueError(f"不是字典: {type(value).__name__}")
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """單個字段的解析規則"""
+    name: str                                   # PopmartProduct 屬性名
+    keys: Tuple[str, ...]                       # 原始數據中的鍵（按優先順序的別名）
+    coerce: Optional[Callable[[Any], Any]] = None
+    default: Any = None
+    default_factory: Optional[Callable[[], Any]] = None
+    required: bool = False
+    falsy_as_missing: bool = False              # 0 / "" 等假值視為缺失
+    fast_type: Optional[type] = None            # 值已是此類型時跳過轉換
+
+
+# 與上游 API 字段對應的默認規則
+PRODUCT_FIELD_SPECS: Tuple[FieldSpec, ...] = (
+    FieldSpec('id', ('id', 'product_id'), _to_str, default='', fast_type=str),
+    FieldSpec('name', ('name',), _to_str, default='', fast_type=str),
+    FieldSpec('description', ('description',), _to_str, default='', fast_type=str),
+    FieldSpec('price', ('price',), _to_float, default=0.0, fast_type=float),
+    FieldSpec('currency', ('currency',), _to_str, default='HKD', fast_type=str),
+    FieldSpec('original_price', ('original_price',), _to_float, falsy_as_missing=True, fast_type=float),
+    FieldSpec('discount_price', ('discount_price',), _to_float, falsy_as_missing=True, fast_type=float),
+    FieldSpec('image_url', ('image_url',), _to_str, default='', fast_type=str),
+    FieldSpec('image_urls', ('image_urls',), _to_str_list, default_factory=list, fast_type=list),
+    FieldSpec('video_url', ('video_url',), _to_str, fast_type=str),
+    FieldSpec('product_url', ('product_url',), _to_str, default='', fast_type=str),
+    FieldSpec('category_id', ('category_id',), _to_str, fast_type=str),
+    FieldSpec('category_name', ('category', 'category_name'), _to_str, default='', fast_type=str),
+    FieldSpec('brand_id', ('brand_id',), _to_str, fast_type=str),
+    FieldSpec('brand_name', ('brand', 'brand_name'), _to_str, default='', fast_type=str),
+    FieldSpec('series', ('series',), _to_str, fast_type=str),
+    FieldSpec('in_stock', ('in_stock',), _to_bool, default=True, fast_type=bool),
+    FieldSpec('stock_quantity', ('stock_quantity',), _to_int, fast_type=int),
+    FieldSpec('max_purchase_quantity', ('max_purchase_quantity',), _to_int, fast_type=int),
+    FieldSpec('is_new', ('is_new',), _to_bool, default=False, fast_type=bool),
+    FieldSpec('is_limited', ('is_limited',), _to_bool, default=False, fast_type=bool),
+    FieldSpec('is_pre_order', ('is_pre_order',), _to_bool, default=False, fast_type=bool),
+    FieldSpec('is_blind_box', ('is_blind_box',), _to_bool, default=False, fast_type=bool),
+    FieldSpec('release_date', ('release_date',), _to_str, fast_type=str),
+    FieldSpec('pre_order_start', ('pre_order_start',), _to_str, fast_type=str),
+    FieldSpec('pre_order_end', ('pre_order_end',), _to_str, fast_type=str),
+    FieldSpec('dimensions', ('dimensions',), _to_dimensions, fast_type=dict),
+    FieldSpec('weight', ('weight',), _to_float, fast_type=float),
+    FieldSpec('material', ('material',), _to_str, fast_type=str),
+    FieldSpec('tags', ('tags',), _to_str_list, default_factory=list, fast_type=list),
+    FieldSpec('sku', ('sku',), _to_str, fast_type=str),
+    FieldSpec('barcode', ('barcode',), _to_str, fast_type=str),
+    FieldSpec('view_count', ('view_count',), _to_int, default=0, fast_type=int),
+    FieldSpec('like_count', ('like_count',), _to_int, default=0, fast_type=int),
+    FieldSpec('review_count', ('review_count',), _to_int, default=0, fast_type=int),
+    FieldSpec('average_rating', ('average_rating',), _to_float, default=0.0, fast_type=float),
+)
+
+
+class ProductParser:
+    """根據字段規則解析商品，逐頁解析並按字段統計錯誤
+
+    按 FieldSpec 表逐字段讀取，值已是目標類型時跳過轉換，整頁在同一個循環中完成。
+    """
+
+    def __init__(self, product_cls: type, specs: Tuple[FieldSpec, ...] = PRODUCT_FIELD_SPECS,
+                 keep_rejected: int = 0):
+        self.product_cls = product_cls
+        self.specs = specs
+        self.field_errors: Counter = Counter()
+        self.items_parsed = 0
+        self.items_rejected = 0
+        self.parse_seconds = 0.0
+        self.keep_rejected = keep_rejected
+        self.rejected_items: deque = deque(maxlen=keep_rejected or None)
+        self._last_errors: Dict[str, str] = {}
+        # 解析循環中用到的規則屬性，預先展開為元組
+        self._fields = tuple((spec, spec.name, spec.keys[0], spec.keys[1:], spec.fast_type, spec.falsy_as_missing)
+                             for spec in specs)
+
+    def _parse_items(self, items, extra: Dict[str, Any]) -> list:
+        """按字段規則解析一組商品，無效項交給 _reject 記錄"""
+        product_cls = self.product_cls
+        fields = self._fields
+        convert = self._convert
+        products = []
+        append = products.append
+        for item in items:
+            if item.__class__ is not dict:
+                self._reject(item, {'<item>': '不是字典: ' + type(item).__name__})
+                continue
+            get = item.get
+            values = {}
+            errors = None
+            reject = False
+            for spec, name, key, aliases, fast_type, falsy_as_missing in fields:
+                # 缺失與 None 等同處理：主鍵為 None 時依次嘗試別名
+                value = get(key)
+                if value is None and aliases:
+                    for alias in aliases:
+                        value = get(alias)
+                        if value is not None:
+                            break
+                # 常見情況（已是目標類型）只需一次類型比較
+                if value.__class__ is fast_type and (value or not falsy_as_missing):
+                    values[name] = value
+                    continue
+                value, errors, missing_required = convert(spec, value, errors)
+                if missing_required:
+                    reject = True
+                else:
+                    values[name] = value
+            if reject:
+                self._reject(item, errors)
+                continue
+            if extra:
+                values.update(extra)
+            append(product_cls(**values))
+        return products
+
+    def _convert(self, spec: FieldSpec, value: Any,
+                 errors: Optional[Dict[str, str]]) -> Tuple[Any, Optional[Dict[str, str]], bool]:
+        """轉換非目標類型或缺失的字段值，返回 (值, 錯誤, 是否因必填字段無效而拒絕)"""
+        if value is None or (spec.falsy_as_missing and not value):
+            if spec.required:
+                return None, self._add_error(errors, spec.name, '缺少必填字段'), True
+        elif spec.coerce is None:
+            return value, errors, False
+        else:
+            try:
+                return spec.coerce(value), errors, False
+            except (TypeError, ValueError) as e:
+                errors = self._add_error(errors, spec.name, str(e))
+                if spec.required:
+                    return None, errors, True
+        return (spec.default_factory() if spec.default_factory else spec.default), errors, False
+
+    def _add_error(self, errors: Optional[Dict[str, str]], field: str, message: str) -> Dict[str, str]:
+        """記錄字段錯誤"""
+        self.field_errors[field] += 1
+        if errors is None:
+            errors = {}
+        errors[field] = message
+        return errors
+
+    def _reject(self, item: Any, errors: Dict[str, str]):
+        """記錄被拒絕的商品"""
+        self.items_rejected += 1
+        self._last_errors = errors
+        if '<item>' in errors:
+            self.field_errors['<item>'] += 1
+        if self.keep_rejected:
+            self.rejected_items.append({'item': item, 'errors': errors})
+
+    def parse_item(self, item: Dict[str, Any], **extra: Any):
+        """解析單個商品，失敗時拋出 ProductParseError"""
+        started_at = time.perf_counter()
+        products = self._parse_items((item,), extra)
+        self.parse_seconds += time.perf_counter() - started_at
+        if not products:
+            raise ProductParseError(self._last_errors)
+        self.items_parsed += 1
+        return products[0]
+
+    def parse_page(self, items: List[Dict[str, Any]], **extra: Any) -> list:
+        """解析一整頁商品，跳過無效項並記錄錯誤統計"""
+        started_at = time.perf_counter()
+        products = self._parse_items(items, extra)
+        self.parse_seconds += time.perf_counter() - started_at
+        self.items_parsed += len(products)
+        rejected = len(items) - len(products)
+        if rejected:
+            logger.warning(f"本頁 {rejected}/{len(items)} 個商品解析失敗")
+        return products
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取解析統計"""
+        return {
+            'items_parsed': self.items_parsed,
+            'items_rejected': self.items_rejected,
+            'parse_seconds': round(self.parse_seconds, 6),
+            'field_errors': dict(self.field_errors),
+            'rejected_items_kept': len(self.rejected_items)
+        }
+
+    def reset_stats(self):
+        """重置解析統計"""
+        self.field_errors.clear()
+        self.items_parsed = 0
+        self.items_rejected = 0
+        self.parse_seconds = 0.0
+        self.rejected_items.clear()
@@ -0,0 +1,289 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# 分析預約保存在 monitor_state 中的鍵
+STATE_KEY = 'profiling_reservation'
+
+# 每種模式保存的文件格式
+PROFILE_FORMATS = {
+    'cprofile': ('prof', 'txt'),
+    'sampling': ('folded',),
+}
+
+
+class StackSampler:
+    """低開銷採樣分析器：後台線程按固定間隔讀取目標線程的調用棧，累計為折疊棧"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 128):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == own_id:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            names.reverse()
+            self.stacks[';'.join(names)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """折疊棧文本（每行 "棧 次數"），可直接輸入 flamegraph.pl / speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """一次進行中的分析"""
+
+    def __init__(self, profile_id: str, label: str, mode: str, interval: float):
+        self.profile_id = profile_id
+        self.label = label
+        self.mode = mode
+        self.interval = interval
+        self.started_at = datetime.now().isoformat()
+        self._started = time.perf_counter()
+        self.profiler: Optional[cProfile.Profile] = None
+        self.sampler: Optional[StackSampler] = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+
+    def stop(self) -> float:
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        return time.perf_counter() - self._started
+
+
+class ProfilingController:
+    """按需分析控制器：預約接下來 N 輪更新進行分析，結果連同該輪指標保存到磁盤
+
+    預約保存在 monitor_state 中，由實際執行更新的領導者進程讀取，
+    因此預約請求由哪個進程處理都有效。未預約時 start() 只讀取一次預約狀態並返回 None。
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None, max_profiles: int = 50):
+        self.profile_dir = profile_dir or os.environ.get(
+            'POPMART_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'popmart_profiles')
+        )
+        self.max_profiles = max_profiles
+        self.remaining_runs = 0
+        self.mode = 'cprofile'
+        self.interval = 0.005
+        self._active: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+
+    def arm(self, runs: int = 1, mode: str = 'cprofile', interval: float = 0.005) -> Dict[str, Any]:
+        """預約分析接下來的 runs 輪"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的分析模式: {mode}")
+        if runs < 1:
+            raise ValueError("runs 必須大於 0")
+        if interval <= 0:
+            raise ValueError("interval 必須大於 0")
+        with self._lock:
+            self.remaining_runs = runs
+            self.mode = mode
+            self.interval = interval
+        self._save()
+        logger.info(f"已預約分析接下來 {runs} 輪更新 (模式: {mode})")
+        return self.get_status()
+
+    def disarm(self) -> Dict[str, Any]:
+        """取消預約（進行中的分析仍會完成並保存）"""
+        with self._lock:
+            self.remaining_runs = 0
+        self._save()
+        logger.info("已取消分析預約")
+        return self.get_status()
+
+    def start(self, label: str) -> Optional[ProfileSession]:
+        """若已預約則開始分析並返回會話，否則返回 None（需要應用上下文）"""
+        self._load()
+        if not self.remaining_runs:
+            return None
+        with self._lock:
+            if not self.remaining_runs or self._active is not None:
+                return None
+            self.remaining_runs -= 1
+            profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{label}"
+            session = ProfileSession(profile_id, label, self.mode, self.interval)
+            self._active = session
+        self._save()
+        try:
+            session.start()
+        except Exception as e:
+            # 例如已有其他分析器在運行
+            logger.error(f"啟動分析失敗: {e}")
+            with self._lock:
+                self._active = None
+            return None
+        return session
+
+    def _load(self):
+        """從 monitor_state 載入其他進程寫入的預約"""
+        from src.models.product import MonitorState
+
+        try:
+            state = MonitorState.get_value(STATE_KEY)
+        except Exception as e:
+            logger.error(f"載入分析預約失敗: {e}")
+            return
+        if not state:
+            return
+        with self._lock:
+            self.remaining_runs = state.get('remaining_runs', 0)
+            self.mode = state.get('mode', self.mode)
+            self.interval = state.get('interval', self.interval)
+
+    def _save(self):
+        """保存預約，供執行更新的進程讀取"""
+        from src.models.product import MonitorState, db
+
+        try:
+            MonitorState.set_value(STATE_KEY, {
+                'remaining_runs': self.remaining_runs,
+                'mode': self.mode,
+                'interval': self.interval
+            })
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"保存分析預約失敗: {e}")
+
+    def finish(self, session: ProfileSession, metrics: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """停止分析並保存結果與該輪指標"""
+        elapsed = session.stop()
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            base_path = os.path.join(self.profile_dir, session.profile_id)
+            meta: Dict[str, Any] = {
+                'id': session.profile_id,
+                'label': session.label,
+                'mode': session.mode,
+                'started_at': session.started_at,
+                'elapsed': round(elapsed, 6),
+                'formats': list(PROFILE_FORMATS[session.mode]),
+                'metrics': metrics
+            }
+            if session.profiler is not None:
+                session.profiler.dump_stats(f"{base_path}.prof")
+                summary = io.StringIO()
+                pstats.Stats(session.profiler, stream=summary).sort_stats('cumulative').print_stats(60)
+                with open(f"{base_path}.txt", 'w', encoding='utf-8') as f:
+                    f.write(summary.getvalue())
+            else:
+                with open(f"{base_path}.folded", 'w', encoding='utf-8') as f:
+                    f.write(session.sampler.collapsed())
+                meta['samples'] = session.sampler.samples
+                meta['interval'] = session.interval
+            with open(f"{base_path}.json", 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            logger.info(f"分析結果已保存: {base_path} (耗時 {elapsed:.2f} 秒)")
+            self._prune()
+            return meta
+        except Exception as e:
+            logger.error(f"保存分析結果失敗: {e}", exc_info=True)
+            return None
+        finally:
+            with self._lock:
+                self._active = None
+
+    def _prune(self):
+        """只保留最近的 max_profiles 份分析結果"""
+        profiles = self.list_profiles()
+        for meta in profiles[self.max_profiles:]:
+            for extension in ('json',) + PROFILE_FORMATS.get(meta.get('mode'), ()):
+                path = os.path.join(self.profile_dir, f"{meta['id']}.{extension}")
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """已保存的分析結果（最新在前，不含指標詳情）"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        profiles = []
+        for name in os.listdir(self.profile_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.profile_dir, name), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta.pop('metrics', None)
+            profiles.append(meta)
+        profiles.sort(key=lambda meta: meta.get('started_at', ''), reverse=True)
+        return profiles
+
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """讀取單份分析結果的元數據與指標"""
+        path = self.profile_path(profile_id, 'json')
+        if path is None:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def profile_path(self, profile_id: str, file_format: str) -> Optional[str]:
+        """分析文件路徑；ID 或格式不合法、文件不存在時返回 None"""
+        if os.path.basename(profile_id) != profile_id or file_format not in ('json', 'prof', 'txt', 'folded'):
+            return None
+        path = os.path.join(self.profile_dir, f"{profile_id}.{file_format}")
+        return path if os.path.isfile(path) else None
+
+    def get_status(self) -> Dict[str, Any]:
+        """預約狀態（來自 monitor_state）；active 為本進程進行中的分析"""
+        self._load()
+        active = self._active
+        return {
+            'armed': self.remaining_runs > 0,
+            'remaining_runs': self.remaining_runs,
+            'mode': self.mode,
+            'interval': self.interval,
+            'active': active.profile_id if active is not None else None,
+            'profile_dir': self.profile_dir
+        }
+
+
+# 進程內共享的分析控制器
+profiling_controller = ProfilingController()
@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 慢查詢閾值（毫秒），可通過環境變量覆蓋
+DEFAULT_SLOW_QUERY_MS = float(os.environ.get('POPMART_SLOW_QUERY_MS', 100))
+
+_local = threading.local()
+
+
+class QueryCollector:
+    """統計一個範圍（請求或更新輪次）內執行的 SQL 語句數與耗時"""
+
+    __slots__ = ('count', 'seconds', 'slow', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = 0
+        self.statements: Counter = Counter()
+
+    def add(self, statement: str, seconds: float, slow: bool):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+        if slow:
+            self.slow += 1
+
+    def top_statements(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """執行次數最多的語句，用於發現 N+1 查詢"""
+        return [
+            {'statement': statement[:300], 'count': count}
+            for statement, count in self.statements.most_common(limit)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'queries': self.count,
+            'seconds': round(self.seconds, 6),
+            'slow_queries': self.slow,
+            'top_statements': self.top_statements()
+        }
+
+
+def start_collecting() -> QueryCollector:
+    """在當前線程開始一個統計範圍（可嵌套，外層範圍同樣計入）"""
+    collector = QueryCollector()
+    stack = getattr(_local, 'collectors', None)
+    if stack is None:
+        stack = _local.collectors = []
+    stack.append(collector)
+    return collector
+
+
+def stop_collecting(collector: QueryCollector) -> QueryCollector:
+    """結束統計範圍"""
+    stack = getattr(_local, 'collectors', None)
+    if stack and collector in stack:
+        stack.remove(collector)
+    return collector
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """以類型名代替參數值，慢查詢日誌不洩露數據"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            # executemany：只記錄批量大小與首行結構
+            return {'rows': len(parameters), 'first': redact_parameters(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class QueryStats:
+    """SQLAlchemy 引擎事件鉤子：為當前線程的統計範圍計數並記錄慢查詢"""
+
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self.total_queries = 0
+        self.total_seconds = 0.0
+        self.slow_queries = 0
+        self._engines = set()
+
+    def install(self, engine):
+        """在引擎上註冊事件監聽（同一引擎只註冊一次）"""
+        if id(engine) in self._engines:
+            return
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        self._engines.add(id(engine))
+        logger.info(f"SQL 查詢統計已啟用，慢查詢閾值 {self.slow_query_seconds * 1000:g} ms")
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get('query_start_times')
+        if not start_times:
+            return
+        elapsed = time.perf_counter() - start_times.pop()
+        slow = elapsed >= self.slow_query_seconds
+
+        self.total_queries += 1
+        self.total_seconds += elapsed
+        if slow:
+            self.slow_queries += 1
+            logger.warning(f"慢查詢 ({elapsed * 1000:.1f} ms): {' '.join(statement.split())[:500]} "
+                           f"參數: {redact_parameters(parameters)}")
+
+        for collector in getattr(_local, 'collectors', None) or ():
+            collector.add(statement, elapsed, slow)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'total_queries': self.total_queries,
+            'total_seconds': round(self.total_seconds, 6),
+            'slow_queries': self.slow_queries,
+            'slow_query_ms': self.slow_query_seconds * 1000
+        }
+
+
+# 進程內共享的查詢統計
+query_stats = QueryStats()
+
+
+def init_app(app, db, stats: Optional[QueryStats] = None):
+    """為 Flask 應用安裝查詢統計：每個請求一個統計範圍，調試模式下寫入響應頭"""
+    from flask import g
+
+    stats = stats or query_stats
+    with app.app_context():
+        stats.install(db.engine)
+
+    @app.before_request
+    def start_request_query_stats():
+        g.query_collector = start_collecting()
+
+    @app.after_request
+    def attach_query_stats_headers(response):
+        collector = g.pop('query_collector', None)
+        if collector is not None:
+            stop_collecting(collector)
+            if app.debug:
+                response.headers['X-DB-Query-Count'] = str(collector.count)
+                response.headers['X-DB-Query-Time-Ms'] = f"{collector.seconds * 1000:.2f}"
+                response.headers['X-DB-Slow-Query-Count'] = str(collector.slow)
+        return response
+
+    @app.teardown_request
+    def stop_request_query_stats(exception=None):
+        # 請求異常時 after_request 不會執行，在此確保範圍被移除
+        collector = g.pop('query_collector', None)
+        if collector is not None:
+            stop_collecting(collector)
+
+    return stats
@@ -0,0 +1,262 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 參與建立時間線的產品字段及對應的窗口類型
+WINDOW_FIELDS = (
+    ('release_date', 'release'),
+    ('pre_order_start', 'pre_order_start'),
+    ('pre_order_end', 'pre_order_end'),
+)
+
+# 只有日期的發售字段按商店當天的開售時間建立窗口（本地時間）
+DEFAULT_LAUNCH_TIME = '10:00'
+
+# 可通過 update_config 修改的數值參數及其下限（是否允許等於下限）
+_NUMERIC_CONFIG = {
+    'ramp_up': (0, True),
+    'cool_down': (0, True),
+    'burst_duration': (0, False),
+    'burst_interval': (0, False),
+    'ramp_interval': (0, False),
+    'horizon_days': (0, False),
+}
+
+
+def parse_launch_time(value: Any) -> Optional[Tuple[datetime, bool]]:
+    """解析發售時間，返回 (本地時間, 是否只有日期)；無法解析時返回 None
+
+    支持 ISO 日期/時間（含 Z 或時區偏移）與秒/毫秒級時間戳。
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.strip().isdigit()):
+        timestamp = float(value)
+        if timestamp > 1e11:  # 毫秒
+            timestamp /= 1000
+        try:
+            return datetime.fromtimestamp(timestamp), False
+        except (OverflowError, OSError, ValueError):
+            return None
+    text = str(value).strip()
+    date_only = len(text) == 10
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        # 與數據庫中其他時間戳一致，轉換為本地無時區時間
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed, date_only
+
+
+@dataclass(slots=True)
+class ReleaseWindow:
+    """一個發售窗口：starts_at 起加速輪詢 burst_duration 秒，前後各有升速與降速期"""
+    product_id: str
+    series: Optional[str]
+    kind: str
+    starts_at: datetime
+    ends_at: datetime
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'product_id': self.product_id,
+            'series': self.series,
+            'kind': self.kind,
+            'starts_at': self.starts_at.isoformat(),
+            'ends_at': self.ends_at.isoformat()
+        }
+
+
+class ReleaseWindowPlanner:
+    """根據 release_date / pre_order_start / pre_order_end 建立發售時間線，
+    在窗口前後提高相關產品（及同系列產品）的輪詢頻率
+
+    升速期內間隔從 ramp_interval 線性降到 burst_interval，窗口內保持 burst_interval，
+    降速期內再線性回升到 ramp_interval，之後交還給分層輪詢。
+    只有日期的字段視為當天 launch_time（HH:MM）開始的窗口；include_series 時同系列產品一同加速。
+    """
+
+    def __init__(self, ramp_up: float = 1800, cool_down: float = 3600, burst_duration: float = 900,
+                 burst_interval: float = 10, ramp_interval: float = 120, horizon_days: int = 14,
+                 include_series: bool = False, launch_time: str = DEFAULT_LAUNCH_TIME):
+        self.ramp_up = ramp_up
+        self.cool_down = cool_down
+        self.burst_duration = burst_duration
+        self.burst_interval = burst_interval
+        self.ramp_interval = ramp_interval
+        self.horizon_days = horizon_days
+        self.include_series = include_series
+        self.launch_time = launch_time
+        self._launch_time = self._parse_clock(launch_time)
+        self.windows: List[ReleaseWindow] = []
+        self._series_members: Dict[str, List[str]] = {}
+        self.built_at: Optional[datetime] = None
+
+    @staticmethod
+    def _parse_clock(value: Any) -> time:
+        """解析 HH:MM 格式的開售時間"""
+        try:
+            return datetime.strptime(value, '%H:%M').time()
+        except (TypeError, ValueError):
+            raise ValueError(f"launch_time 必須是 HH:MM 格式: {value!r}")
+
+    def validate_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """校驗加速參數並返回合併當前值後的完整配置，不修改當前配置"""
+        candidate = self._config()
+        for key, value in config.items():
+            if key in _NUMERIC_CONFIG:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"{key} 必須是數值")
+                minimum, inclusive = _NUMERIC_CONFIG[key]
+                if value < minimum or (value == minimum and not inclusive):
+                    raise ValueError(f"{key} 必須{'不小於' if inclusive else '大於'} {minimum}")
+            elif key == 'include_series':
+                if not isinstance(value, bool):
+                    raise ValueError("include_series 必須是布爾值")
+            elif key == 'launch_time':
+                self._parse_clock(value)
+            else:
+                raise ValueError(f"未知的發售加速參數: {key}")
+            candidate[key] = value
+        if candidate['ramp_interval'] < candidate['burst_interval']:
+            raise ValueError("burst_interval 不能大於 ramp_interval")
+        return candidate
+
+    def update_config(self, config: Dict[str, Any]):
+        """更新加速參數；全部校驗通過後才生效，任一參數無效時不修改任何值"""
+        candidate = self.validate_config(config)
+        for key, value in candidate.items():
+            setattr(self, key, value)
+        self._launch_time = self._parse_clock(self.launch_time)
+
+    def _config(self) -> Dict[str, Any]:
+        return {
+            'ramp_up': self.ramp_up,
+            'cool_down': self.cool_down,
+            'burst_duration': self.burst_duration,
+            'burst_interval': self.burst_interval,
+            'ramp_interval': self.ramp_interval,
+            'horizon_days': self.horizon_days,
+            'include_series': self.include_series,
+            'launch_time': self.launch_time
+        }
+
+    def build(self, products: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> List[ReleaseWindow]:
+        """從產品字典建立時間線，只保留尚未結束且在展望期內的窗口"""
+        now = now or datetime.now()
+        earliest_end = now - timedelta(seconds=self.cool_down)
+        latest_start = now + timedelta(days=self.horizon_days)
+        windows: List[ReleaseWindow] = []
+        series_members: Dict[str, List[str]] = {}
+
+        for product in products:
+            series = product.get('series')
+            if series:
+                series_members.setdefault(series, []).append(product['id'])
+            for field, kind in WINDOW_FIELDS:
+                parsed = parse_launch_time(product.get(field))
+                if parsed is None:
+                    continue
+                starts_at, date_only = parsed
+                if date_only:
+                    starts_at = datetime.combine(starts_at.date(), self._launch_time)
+                ends_at = starts_at + timedelta(seconds=self.burst_duration)
+                if ends_at < earliest_end or starts_at > latest_start:
+                    continue
+                windows.append(ReleaseWindow(product['id'], series, kind, starts_at, ends_at))
+
+        windows.sort(key=lambda window: window.starts_at)
+        self.windows = windows
+        self._series_members = series_members
+        self.built_at = now
+        logger.info(f"發售時間線已更新: {len(windows)} 個窗口")
+        return windows
+
+    def build_from_db(self, now: Optional[datetime] = None) -> List[ReleaseWindow]:
+        """從數據庫讀取發售相關字段建立時間線（需要應用上下文）"""
+        from src.models.product import Product, db
+
+        rows = db.session.query(
+            Product.id, Product.series, Product.release_date, Product.pre_order_start, Product.pre_order_end
+        ).filter(
+            (Product.release_date.isnot(None)) | (Product.pre_order_start.isnot(None)) |
+            (Product.pre_order_end.isnot(None)) | (Product.series.isnot(None))
+        ).all()
+        return self.build(
+            ({'id': row[0], 'series': row[1], 'release_date': row[2],
+              'pre_order_start': row[3], 'pre_order_end': row[4]} for row in rows),
+            now
+        )
+
+    def interval_for(self, window: ReleaseWindow, now: datetime) -> Optional[float]:
+        """窗口在 now 時刻要求的輪詢間隔，不在加速範圍內時返回 None"""
+        until_start = (window.starts_at - now).total_seconds()
+        since_end = (now - window.ends_at).total_seconds()
+        span = self.ramp_interval - self.burst_interval
+        if 0 < until_start <= self.ramp_up:
+            return self.burst_interval + span * until_start / self.ramp_up
+        if until_start <= 0 and since_end <= 0:
+            return self.burst_interval
+        if 0 < since_end <= self.cool_down:
+            return self.burst_interval + span * since_end / self.cool_down
+        return None
+
+    def phase_of(self, window: ReleaseWindow, now: datetime) -> str:
+        if now < window.starts_at - timedelta(seconds=self.ramp_up):
+            return 'upcoming'
+        if now < window.starts_at:
+            return 'ramp_up'
+        if now <= window.ends_at:
+            return 'burst'
+        if now <= window.ends_at + timedelta(seconds=self.cool_down):
+            return 'cool_down'
+        return 'finished'
+
+    def active_intervals(self, now: Optional[datetime] = None) -> Dict[str, float]:
+        """當前處於加速範圍內的產品及其輪詢間隔（同一產品取最短間隔）"""
+        now = now or datetime.now()
+        intervals: Dict[str, float] = {}
+        latest_start = now + timedelta(seconds=self.ramp_up)
+        for window in self.windows:
+            if window.starts_at > latest_start:
+                break  # 時間線按開始時間排序
+            interval = self.interval_for(window, now)
+            if interval is None:
+                continue
+            members = [window.product_id]
+            if self.include_series and window.series:
+                members = self._series_members.get(window.series, members)
+            for product_id in members:
+                if interval < intervals.get(product_id, float('inf')):
+                    intervals[product_id] = interval
+        return intervals
+
+    def upcoming(self, limit: int = 20, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """即將到來或進行中的窗口"""
+        now = now or datetime.now()
+        result = []
+        for window in self.windows:
+            phase = self.phase_of(window, now)
+            if phase == 'finished':
+                continue
+            result.append({**window.to_dict(), 'phase': phase})
+            if len(result) >= limit:
+                break
+        return result
+
+    def get_stats(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        now = now or datetime.now()
+        return {
+            'windows': len(self.windows),
+            'active_products': len(self.active_intervals(now)),
+            'built_at': self.built_at.isoformat() if self.built_at else None,
+            'config': self._config(),
+            'upcoming': self.upcoming(10, now)
+        }
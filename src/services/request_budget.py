@@ -0,0 +1,189 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, List
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 請求類別：庫存批量查詢、列表/目錄頁、商品詳情、關鍵字搜索
+REQUEST_CATEGORIES = ('inventory', 'crawl', 'detail', 'search', 'other')
+
+# 每個窗口（默認一小時）的請求上限，可通過環境變量覆蓋
+DEFAULT_REQUEST_BUDGET = int(os.environ.get('POPMART_REQUEST_BUDGET', 3000))
+
+# 各輪詢層級產品的重要性權重
+TIER_IMPORTANCE = {'burst': 5.0, 'hot': 4.0, 'watched': 3.0, 'warm': 2.0, 'normal': 1.0, 'cold': 0.5}
+
+# 完整更新各階段每個請求的期望價值（無逐產品變化率可用時的經驗值）
+STAGE_VALUES = {'new_arrivals': 2.0, 'limited': 1.5, 'keywords': 0.5, 'catalog': 0.3}
+
+
+def request_category(url: str) -> str:
+    """根據請求路徑判斷類別"""
+    path = urlsplit(url).path.rstrip('/')
+    if path.startswith('/inventory/'):
+        return 'inventory'
+    if path.startswith('/search/'):
+        return 'search'
+    if path.startswith('/shop/v1/products/'):
+        return 'detail'
+    if path == '/shop/v1/products':
+        return 'crawl'
+    return 'other'
+
+
+@dataclass
+class BudgetDemand:
+    """一項請求需求：預計 requests 個請求，每個請求的期望價值為 value（變化概率 × 重要性）"""
+    category: str
+    name: str
+    requests: int
+    value: float
+
+
+class RequestBudget:
+    """全局請求預算：每個窗口按期望價值在各類請求間分配預算，並統計計劃與實際花費
+
+    acquire() 在每次真實請求（含重試）前調用：超出窗口總預算時一律拒絕；
+    某類別用完分配額度後，只能使用未分配給其他類別的剩餘預算。
+    """
+
+    def __init__(self, budget: int = DEFAULT_REQUEST_BUDGET, window_seconds: float = 3600,
+                 history_size: int = 24, clock: Callable[[], float] = time.monotonic):
+        self.budget = budget
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._demands: List[BudgetDemand] = []
+        self._lock = threading.Lock()
+        self._start_window(clock())
+
+    def _start_window(self, now: float):
+        self.window_start = now
+        self.window_started_at = datetime.now().isoformat()
+        self.planned: Dict[str, int] = dict.fromkeys(REQUEST_CATEGORIES, 0)
+        self.planned_value: Dict[str, float] = dict.fromkeys(REQUEST_CATEGORIES, 0.0)
+        self.spent: Dict[str, int] = dict.fromkeys(REQUEST_CATEGORIES, 0)
+        self.denied: Dict[str, int] = dict.fromkeys(REQUEST_CATEGORIES, 0)
+        self.unplanned: List[Dict[str, Any]] = []
+        self._allocate()
+
+    def _roll(self, now: float):
+        """窗口到期時歸檔並開始新窗口（沿用最近一次的需求重新分配）"""
+        if now - self.window_start < self.window_seconds:
+            return
+        self.history.append(self._window_summary(now))
+        # 對齊到窗口邊界，長時間空閒時跳過中間的空窗口
+        elapsed_windows = math.floor((now - self.window_start) / self.window_seconds)
+        self._start_window(self.window_start + elapsed_windows * self.window_seconds)
+
+    def plan(self, demands: Iterable[BudgetDemand]) -> Dict[str, int]:
+        """設置需求並重新分配當前窗口的預算，返回各類別的分配額度"""
+        with self._lock:
+            self._roll(self.clock())
+            self._demands = [demand for demand in demands if demand.requests > 0]
+            self._allocate()
+            return dict(self.planned)
+
+    def set_budget(self, budget: int):
+        """修改窗口上限並重新分配"""
+        if budget < 0:
+            raise ValueError("請求預算不能為負數")
+        with self._lock:
+            self.budget = budget
+            self._allocate()
+
+    def _allocate(self):
+        """按期望價值從高到低分配窗口剩餘預算（已花費的部分計入各類別額度）
+
+        需求按整個窗口估算，窗口中途重新分配時按剩餘時間比例縮減。
+        """
+        remaining = self.budget - sum(self.spent.values())
+        fraction = max(0.0, 1 - (self.clock() - self.window_start) / self.window_seconds)
+        planned = dict(self.spent)
+        planned_value = dict.fromkeys(REQUEST_CATEGORIES, 0.0)
+        unplanned = []
+        for demand in sorted(self._demands, key=lambda demand: demand.value, reverse=True):
+            requests = math.ceil(demand.requests * fraction)
+            granted = max(0, min(requests, remaining))
+            remaining -= granted
+            planned[demand.category] = planned.get(demand.category, 0) + granted
+            planned_value[demand.category] = planned_value.get(demand.category, 0.0) + granted * demand.value
+            if granted < requests:
+                unplanned.append({'category': demand.category, 'name': demand.name,
+                                  'requests': requests - granted, 'value': round(demand.value, 4)})
+        self.planned = planned
+        self.planned_value = planned_value
+        self.unplanned = unplanned
+
+    def _outstanding(self, exclude: str) -> int:
+        """其他類別尚未使用的分配額度"""
+        return sum(max(0, self.planned[category] - self.spent[category])
+                   for category in REQUEST_CATEGORIES if category != exclude)
+
+    def allowance(self, category: str) -> int:
+        """某類別在當前窗口內還可以發送的請求數"""
+        with self._lock:
+            self._roll(self.clock())
+            total_left = self.budget - sum(self.spent.values())
+            own_left = max(0, self.planned[category] - self.spent[category])
+            return max(0, min(total_left, max(own_left, total_left - self._outstanding(category))))
+
+    def acquire(self, category: str, requests: int = 1) -> bool:
+        """在發送請求前登記花費；超出預算時返回 False"""
+        with self._lock:
+            self._roll(self.clock())
+            total_spent = sum(self.spent.values())
+            if total_spent + requests > self.budget:
+                allowed = False
+            elif self.spent[category] + requests <= self.planned[category]:
+                allowed = True
+            else:
+                allowed = total_spent + requests + self._outstanding(category) <= self.budget
+            if allowed:
+                self.spent[category] += requests
+            else:
+                self.denied[category] += requests
+            return allowed
+
+    def guard(self, url: str) -> bool:
+        """供 PopmartAPIClient.request_guard 使用"""
+        category = request_category(url)
+        if self.acquire(category):
+            return True
+        logger.warning(f"請求預算不足，跳過 {category} 請求: {url}")
+        return False
+
+    def _window_summary(self, now: float) -> Dict[str, Any]:
+        spent_total = sum(self.spent.values())
+        return {
+            'started_at': self.window_started_at,
+            'elapsed': round(min(now - self.window_start, self.window_seconds), 3),
+            'budget': self.budget,
+            'planned': dict(self.planned),
+            'planned_total': sum(self.planned.values()),
+            'planned_value': {category: round(value, 4) for category, value in self.planned_value.items()},
+            'spent': dict(self.spent),
+            'spent_total': spent_total,
+            'denied': dict(self.denied),
+            'utilization': round(spent_total / self.budget, 4) if self.budget else None
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self.clock()
+            self._roll(now)
+            current = self._window_summary(now)
+            current['remaining'] = max(0, self.budget - current['spent_total'])
+            current['unplanned'] = list(self.unplanned)
+            return {
+                'window_seconds': self.window_seconds,
+                'current': current,
+                'history': list(self.history)
+            }
@@ -1,31 +1,185 @@
 import asyncio
+import contextlib
+import json
 import threading
 import logging
-from typing import List, Optional
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 from src.services.monitor import MonitorService
+from src.services.change_rate import ChangeRateEstimator
+from src.services.leader_election import LeaderElection
+from src.services.polling_tiers import DEFAULT_FIXED_INTERVAL, TieredPollingPlanner
+from src.services.release_windows import ReleaseWindowPlanner
+from src.services.request_budget import STAGE_VALUES, TIER_IMPORTANCE, BudgetDemand
 
 logger = logging.getLogger(__name__)
 
+# 固定頻率：按計劃時間點觸發，超時錯過的時間點直接跳過；固定延遲：上一次結束後再等一個間隔
+SCHEDULE_MODES = ('fixed_rate', 'fixed_delay')
+
+# 庫存輪詢策略：固定頻率（默認）；分層輪詢 + 按變化率調整 + 發售窗口加速（可選）
+POLLING_POLICIES = ('fixed', 'tiered')
+
+# 默認輪詢策略，可通過環境變量或 PATCH /api/scheduler 的 polling_policy 修改
+DEFAULT_POLLING_POLICY = os.environ.get('POPMART_POLLING_POLICY', 'fixed')
+
+# monitor_state 中保存排程器設置與啟停狀態的鍵
+SETTINGS_KEY = 'scheduler_settings'
+
+# 應用啟動時是否自動恢復排程器（設為 0 可關閉，例如基準測試）
+AUTOSTART = os.environ.get('POPMART_SCHEDULER_AUTOSTART', '1') != '0'
+
+# 完整更新的期限佔更新間隔的比例，超過期限未完成的階段結轉到下一輪
+UPDATE_DEADLINE_FRACTION = 0.9
+
+
+class RecurringSchedule:
+    """重複執行的計劃：計算下次觸發時間，並記錄遲到與因超時跳過的次數"""
+
+    def __init__(self, name: str, interval: float, mode: str = 'fixed_rate'):
+        self.name = name
+        self.interval = interval
+        self.mode = mode
+        self.next_at: Optional[float] = None  # None 表示立即到期
+        self.last_scheduled: Optional[float] = None
+        self.last_ended: Optional[float] = None
+        self.last_lag: Optional[float] = None
+        self.runs = 0
+        self.late_runs = 0
+        self.skipped_ticks = 0
+
+    @property
+    def late_tolerance(self) -> float:
+        """晚於計劃時間超過此值視為遲到"""
+        return max(1.0, self.interval * 0.1)
+
+    def due_in(self, now: float) -> float:
+        return 0.0 if self.next_at is None else max(0.0, self.next_at - now)
+
+    def begin(self, now: float) -> Tuple[float, float, bool]:
+        """開始一次執行，返回 (計劃時間, 延遲秒數, 是否遲到)"""
+        scheduled_at = self.next_at if self.next_at is not None else now
+        lag = max(0.0, now - scheduled_at)
+        late = lag > self.late_tolerance
+        self.runs += 1
+        self.last_lag = lag
+        if late:
+            self.late_runs += 1
+        return scheduled_at, lag, late
+
+    def finish(self, scheduled_at: float, ended: float) -> int:
+        """計算下次觸發時間，返回因本次執行超時而跳過的時間點數"""
+        self.last_scheduled = scheduled_at
+        self.last_ended = ended
+        skipped = 0
+        if self.mode == 'fixed_rate':
+            next_at = scheduled_at + self.interval
+            if next_at <= ended:
+                skipped = math.floor((ended - next_at) / self.interval) + 1
+                next_at += skipped * self.interval
+        else:
+            next_at = ended + self.interval
+        self.next_at = next_at
+        self.skipped_ticks += skipped
+        return skipped
+
+    def reschedule(self, interval: Optional[float] = None, mode: Optional[str] = None):
+        """修改間隔或模式後立即重新計算下次觸發時間"""
+        if interval is not None:
+            self.interval = interval
+        if mode is not None:
+            self.mode = mode
+        if self.last_scheduled is None:
+            return
+        base = self.last_scheduled if self.mode == 'fixed_rate' else self.last_ended
+        self.next_at = base + self.interval
+
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        return {
+            'interval': self.interval,
+            'mode': self.mode,
+            'next_in': round(self.due_in(now), 3),
+            'runs': self.runs,
+            'late_runs': self.late_runs,
+            'skipped_ticks': self.skipped_ticks,
+            'last_lag': round(self.last_lag, 3) if self.last_lag is not None else None
+        }
+
+
 class Scheduler:
     """排程器服務"""
     
-    def __init__(self, monitor_service: MonitorService):
+    def __init__(self, monitor_service: MonitorService, history_size: int = 100, app=None,
+                 leader: Optional[LeaderElection] = None):
         self.monitor_service = monitor_service
+        self.app = app  # 提供後在應用上下文中執行任務，並將設置與執行記錄保存到數據庫
+        # 多進程部署時只有領導者執行任務；未提供時本進程總是執行
+        self.leader = leader
+        self._last_coordinated: Optional[float] = None
+        self._settings_version: Optional[str] = None  # 已應用的設置記錄的 updated_at
         self._loop = None
         self._thread = None
         self._running = False
+        # 多進程部署時設置被停用：循環保持待命（不執行任務、不爭取領導權），重新啟用後恢復
+        self._paused = False
+        self._wakeup: Optional[asyncio.Event] = None  # 停止或設置變更時喚醒等待中的循環
         self._interval = 300  # 默認5分鐘
+        self._inventory_interval = 60  # 監控列表產品的庫存刷新間隔，默認1分鐘
+        self._tick_interval = 5  # 檢查到期產品的間隔（秒）
+        self._max_products_per_tick = 200  # 每次最多刷新的產品數
         self._keywords = []
+        self.mode = 'fixed_rate'
+        self.clock: Callable[[], float] = time.monotonic
+        self._update_schedule = RecurringSchedule('update', self._interval, self.mode)
+        self._inventory_schedule = RecurringSchedule('inventory', self._tick_interval, self.mode)
+        # 最近的執行記錄：計劃時間、開始/結束時間、延遲、耗時與結果
+        self.run_history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        # 分層輪詢：每個產品按屬性分配層級，每次只刷新已到期的產品
+        self.polling = TieredPollingPlanner()
+        # 發售窗口前後加速輪詢相關產品
+        self.release_windows = ReleaseWindowPlanner()
+        # 按產品變化率調整輪詢層級，模型狀態保存在 monitor_state 中
+        self.change_rate = ChangeRateEstimator()
+        self._change_rate_loaded = False
+        self.polling_policy = 'fixed'
+        self.set_polling_policy(DEFAULT_POLLING_POLICY)
+
+    def set_polling_policy(self, policy: str):
+        """切換庫存輪詢策略；固定頻率時不使用變化率間隔與發售窗口加速"""
+        if policy not in POLLING_POLICIES:
+            raise ValueError(f"不支持的輪詢策略: {policy}")
+        self.polling_policy = policy
+        self.polling.set_fixed_interval(DEFAULT_FIXED_INTERVAL if policy == 'fixed' else None)
+        if policy == 'fixed':
+            self.polling.set_bursts({})
 
-    def start(self, interval: int = 300, keywords: List[str] = None):
-        """啟動排程器，定期執行更新任務"""
+    def start(self, interval: int = 300, keywords: List[str] = None, inventory_interval: int = 60,
+              mode: Optional[str] = None):
+        """啟動排程器，定期執行更新任務；待命中的排程器直接恢復運行"""
+        if self._running and self._paused:
+            return self._resume(interval, keywords, inventory_interval, mode)
         if self._running:
             logger.warning("排程器已在運行中。")
             return False
+        if self._thread and self._thread.is_alive():
+            logger.warning("排程器仍在完成上一次任務，請稍後再啟動。")
+            return False
+        if mode is not None and mode not in SCHEDULE_MODES:
+            raise ValueError(f"不支持的排程模式: {mode}")
 
         self._running = True
         self._interval = interval
+        self._inventory_interval = inventory_interval
+        self.polling.set_intervals({'watched': inventory_interval})
         self._keywords = keywords or []
+        self.mode = mode or self.mode
+        # 啟動後立即執行一次完整更新
+        self._update_schedule = RecurringSchedule('update', interval, self.mode)
+        self._inventory_schedule = RecurringSchedule('inventory', self._tick_interval, self.mode)
         
         # 創建新的事件循環
         self._loop = asyncio.new_event_loop()
@@ -35,28 +189,72 @@ class Scheduler:
         self._thread.daemon = True  # 設置為守護線程，主程序退出時自動終止
         self._thread.start()
         
-        logger.info(f"排程器已啟動，每 {interval} 秒執行一次更新任務。")
+        self._last_coordinated = None
+        if self._paused:
+            logger.info("排程器設置已停用，本進程保持待命，重新啟用後接管。")
+        else:
+            logger.info(f"排程器已啟動 ({self.mode})，每 {interval} 秒執行一次完整更新，監控產品每 {inventory_interval} 秒刷新一次庫存。")
+        self.save_settings(enabled=not self._paused)
         return True
 
-    def stop(self):
-        """停止排程器"""
-        if not self._running:
+    def _resume(self, interval: int, keywords: Optional[List[str]], inventory_interval: int,
+                mode: Optional[str]) -> bool:
+        """待命中的排程器恢復運行：應用新設置並立即執行一次完整更新"""
+        self._paused = False
+        self.update_settings(interval=interval, keywords=keywords or [], inventory_interval=inventory_interval,
+                             mode=mode, persist=False)
+        self._update_schedule.next_at = None
+        self._inventory_schedule.next_at = None
+        self._last_coordinated = None
+        self.save_settings(enabled=True)
+        self._signal()
+        logger.info(f"排程器已恢復運行 ({self.mode})，每 {self._interval} 秒執行一次完整更新。")
+        return True
+
+    def stop(self, persist: bool = True):
+        """停止排程器；persist 為 False 時（如進程退出）不記錄停止狀態，下次啟動時仍會自動恢復
+
+        多進程部署時記錄停止狀態只讓本進程待命：循環保持運行並放棄領導權，
+        任一進程重新啟動排程器後所有進程都恢復，領導者退出時仍可由其他進程接管。
+        """
+        if not self._running or (persist and self._paused):
             logger.warning("排程器未在運行中。")
             return False
 
+        if persist and self.leader is not None:
+            self._paused = True
+            self._last_coordinated = None
+            self.save_settings(enabled=False)
+            self._signal()
+            logger.info("排程器已停止，本進程保持待命。")
+            return True
+
         self._running = False
+        self._paused = False
+        if persist:
+            self.save_settings(enabled=False)
         
-        # 安全地停止事件循環
-        if self._loop and not self._loop.is_closed():
-            self._loop.call_soon_threadsafe(self._loop.stop)
+        # 喚醒等待中的循環，讓其在當前任務完成後自行退出
+        self._signal()
             
         # 等待線程結束
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=5)  # 最多等待5秒
+            if self._thread.is_alive():
+                logger.warning("排程器正在完成當前任務，將在任務結束後退出。")
             
         logger.info("排程器已停止。")
         return True
 
+    def _signal(self):
+        """從任意線程喚醒排程循環"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # 循環已關閉
+
     def _run_loop(self):
         """在獨立線程中運行異步事件循環"""
         asyncio.set_event_loop(self._loop)
@@ -71,43 +269,448 @@ class Scheduler:
                 self._loop.close()
 
     async def _schedule_updates(self):
-        """異步調度更新任務"""
-        while self._running:
-            try:
-                if not self.monitor_service.is_updating():
-                    logger.info("排程器觸發產品數據更新...")
-                    await self.monitor_service.update_products(self._keywords)
+        """事件驅動的調度循環：睡眠到下一個計劃時間點，停止或設置變更時提前喚醒
+
+        多進程部署時非領導者只定期嘗試接管，不執行任務；設置被停用時所有進程待命。
+        """
+        self._wakeup = asyncio.Event()
+        try:
+            while self._running:
+                if self._coordinate():
+                    delay = await self.run_pending()
                 else:
-                    logger.info("上一次更新任務尚未完成，跳過本次更新。")
+                    delay = self.leader.heartbeat_interval
+                if not self._running:
+                    break
+                if self.leader is not None:
+                    # 按時續約心跳並同步其他進程保存的設置
+                    delay = min(delay, self.leader.heartbeat_interval)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self._wakeup = None
+            if self.leader is not None:
+                with self._app_context():
+                    self.leader.release()
+
+    def _coordinate(self) -> bool:
+        """每個心跳間隔同步一次設置並續約或爭取領導權，返回本進程是否應執行任務"""
+        if self.leader is None:
+            return True
+        now = time.monotonic()  # 使用真實時間，不受 self.clock 影響
+        if self._last_coordinated is not None and now - self._last_coordinated < self.leader.heartbeat_interval:
+            return self.leader.is_leader
+        self._last_coordinated = now
+        try:
+            with self._app_context():
+                self._sync_settings()
+                if self._paused:
+                    if self.leader.is_leader:
+                        self.leader.release()
+                    return False
+                was_leader = self.leader.is_leader
+                if self.leader.acquire():
+                    if not was_leader:
+                        # 接管後立即執行一次完整更新
+                        self._update_schedule.next_at = None
+                        self._inventory_schedule.next_at = None
+                    self.leader.heartbeat()
+        except Exception as e:
+            logger.error(f"排程器領導者協調失敗: {e}", exc_info=True)
+        return self.leader.is_leader
+
+    def _app_context(self):
+        """排程線程中訪問數據庫所需的應用上下文"""
+        return self.app.app_context() if self.app is not None else contextlib.nullcontext()
+
+    async def run_pending(self) -> float:
+        """執行已到期的任務（完整更新優先），返回距下一個計劃時間點的秒數"""
+        try:
+            with self._app_context():
+                if self._update_schedule.due_in(self.clock()) <= 0:
+                    await self._run_scheduled('update', self._update_schedule, self._run_full_update)
+                elif self._inventory_schedule.due_in(self.clock()) <= 0:
+                    await self._run_scheduled('inventory', self._inventory_schedule, self._refresh_due_products)
+        except Exception as e:
+            logger.error(f"排程器執行更新任務時發生錯誤: {e}", exc_info=True)
+        now = self.clock()
+        return min(self._update_schedule.due_in(now), self._inventory_schedule.due_in(now))
+
+    async def _run_scheduled(self, kind: str, schedule: RecurringSchedule, job: Callable[[], Awaitable[int]]):
+        """執行一次計劃任務，記錄延遲、耗時、結果與超時跳過的時間點"""
+        started = self.clock()
+        started_at = datetime.now()
+        mode = schedule.mode
+        scheduled_at, lag, late = schedule.begin(started)
+        if late:
+            logger.warning(f"排程任務 {kind} 遲到 {lag:.1f} 秒")
+
+        products = 0
+        error = None
+        if self.monitor_service.is_updating():
+            # 其他來源（如手動觸發）的更新仍在進行
+            status = 'skipped'
+            logger.info("上一次更新任務尚未完成，跳過本次更新。")
+        else:
+            status = 'completed'
+            try:
+                products = await job()
+                if kind == 'update' and self.monitor_service.update_progress.get('status') == 'partial':
+                    status = 'partial'
             except Exception as e:
-                logger.error(f"排程器執行更新任務時發生錯誤: {e}", exc_info=True)
-            finally:
-                # 等待指定的間隔時間
-                for _ in range(self._interval):
-                    if not self._running:
-                        break
-                    await asyncio.sleep(1)  # 每秒檢查一次是否應該停止
+                status = 'failed'
+                error = str(e)
+                logger.error(f"排程任務 {kind} 執行失敗: {e}", exc_info=True)
+
+        ended = self.clock()
+        skipped = schedule.finish(scheduled_at, ended)
+        if skipped:
+            logger.warning(f"排程任務 {kind} 耗時 {ended - started:.1f} 秒，超過間隔 {schedule.interval} 秒，"
+                           f"跳過 {skipped} 個時間點")
+        # 沒有到期產品的庫存檢查不記錄，避免淹沒歷史
+        if kind == 'inventory' and status == 'completed' and not products and not late and not skipped:
+            return
+        self._record_run({
+            'kind': kind,
+            'mode': mode,
+            'scheduled_at': (started_at - timedelta(seconds=lag)).isoformat(),
+            'started_at': started_at.isoformat(),
+            'ended_at': (started_at + timedelta(seconds=ended - started)).isoformat(),
+            'lag': round(lag, 3),
+            'duration': round(ended - started, 3),
+            'status': status,
+            'late': late,
+            'skipped_ticks': skipped,
+            'products': products,
+            'error': error
+        })
+
+    def _record_run(self, run: Dict[str, Any]):
+        """保存執行記錄到內存歷史與 schedule_runs 表"""
+        self.run_history.append(run)
+        if self.app is None:
+            return
+        from src.models.product import ScheduleRun, db
+
+        try:
+            db.session.add(ScheduleRun(**run))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"保存排程執行記錄失敗: {e}", exc_info=True)
+
+    async def _run_full_update(self) -> int:
+        """完整更新（限時在間隔之內，避免跳過後續時間點），完成後重新分層"""
+        logger.info("排程器觸發產品數據更新...")
+        await self.monitor_service.update_products(self._keywords,
+                                                   deadline=self._interval * UPDATE_DEADLINE_FRACTION)
+        self._sync_polling_tiers()
+        return len(self.polling.tracked_ids())
+
+    def _sync_polling_tiers(self):
+        """更新變化率模型，按最新的產品數據重新分層並重建發售時間線"""
+        if not self._change_rate_loaded:
+            self.change_rate.load()
+            self._change_rate_loaded = True
+        self.change_rate.ingest_from_db()
+        self.polling.batch_size = self.monitor_service.inventory_batch_size
+        adaptive_intervals = self.change_rate.intervals() if self.polling_policy == 'tiered' else {}
+        self.polling.sync_from_db(self.monitor_service.get_watched_product_ids(), adaptive_intervals)
+        self.change_rate.track(self.polling.tracked_ids())
+        self.change_rate.save()
+        self.release_windows.build_from_db()
+        self._plan_request_budget()
+
+    def _plan_request_budget(self):
+        """按期望價值（變化概率 × 重要性）估算本窗口各類請求的需求並分配請求預算"""
+        budget = self.monitor_service.request_budget
+        window = budget.window_seconds
+        batch_size = self.monitor_service.inventory_batch_size
+        updates = window / self._interval
+        demands = []
+
+        def change_probability(product_id: str, interval: float) -> float:
+            return 1 - math.exp(-self.change_rate.rate(product_id) * interval)
+
+        for tier, members in self.polling.tier_members().items():
+            if not members:
+                continue
+            interval = min(member_interval for _, member_interval in members)
+            polls = window / interval
+            batches = math.ceil(len(members) / batch_size)
+            value = sum(change_probability(product_id, member_interval)
+                        for product_id, member_interval in members) * TIER_IMPORTANCE[tier]
+            demands.append(BudgetDemand('inventory', f'tier:{tier}', math.ceil(batches * polls), value / batches))
+
+        # 完整更新：新品首頁、限量商品、監控產品詳情、關鍵字搜索，以及按目錄間隔的全目錄爬取
+        demands.append(BudgetDemand('crawl', 'new_arrivals', math.ceil(updates), STAGE_VALUES['new_arrivals']))
+        demands.append(BudgetDemand('crawl', 'limited', math.ceil(updates), STAGE_VALUES['limited']))
+        watched_ids = self.monitor_service.get_watched_product_ids()
+        if watched_ids:
+            value = sum(change_probability(product_id, self._interval) for product_id in watched_ids)
+            demands.append(BudgetDemand('detail', 'specific', math.ceil(updates * len(watched_ids)),
+                                        value * TIER_IMPORTANCE['watched'] / len(watched_ids)))
+        if self._keywords:
+            demands.append(BudgetDemand('search', 'keywords', math.ceil(updates * len(self._keywords)),
+                                        STAGE_VALUES['keywords']))
+        crawler = self.monitor_service.catalog_crawler
+        catalog_pages = math.ceil(len(self.polling.tracked_ids()) / crawler.page_size) or 1
+        crawls = max(1.0, window / self.monitor_service.catalog_crawl_interval)
+        demands.append(BudgetDemand('crawl', 'catalog', math.ceil(catalog_pages * crawls), STAGE_VALUES['catalog']))
+
+        planned = budget.plan(demands)
+        logger.info(f"請求預算已分配: {planned} (每 {window:.0f} 秒上限 {budget.budget})")
+
+    async def _refresh_due_products(self) -> int:
+        """只刷新已到期產品的庫存，高層級優先，返回刷新的產品數"""
+        if self.polling.is_sync_due():
+            self._sync_polling_tiers()
+        if self.polling_policy == 'tiered':
+            self.polling.set_bursts(self.release_windows.active_intervals())
+        # 不超過庫存請求的剩餘預算
+        allowance = self.monitor_service.request_budget.allowance('inventory')
+        limit = min(self._max_products_per_tick, allowance * self.monitor_service.inventory_batch_size)
+        # 直接查詢時用即將到期的產品補滿批次；任務隊列按層級分批，不補齊
+        fill_to = self.monitor_service.inventory_batch_size if self.monitor_service.work_queue is None else None
+        due_ids = self.polling.due(limit=limit, fill_to=fill_to) if limit > 0 else []
+        if not due_ids:
+            return 0
+        tiers: Dict[str, List[str]] = {}
+        for product_id in due_ids:
+            tiers.setdefault(self.polling.tier_of(product_id), []).append(product_id)
+        counts = {tier: len(ids) for tier, ids in tiers.items()}
+        logger.info(f"排程器觸發庫存快速刷新: {len(due_ids)} 個到期產品 {counts}")
+        if self.monitor_service.work_queue is not None:
+            return self._enqueue_inventory(tiers)
+        await self.monitor_service.refresh_inventory(due_ids)
+        self.polling.mark_polled(due_ids)
+        return len(due_ids)
+
+    def _enqueue_inventory(self, tiers: Dict[str, List[str]]) -> int:
+        """按層級將到期產品分批寫入任務隊列（高層級優先級高），由 worker 進程執行"""
+        queue = self.monitor_service.work_queue
+        if not queue.has_capacity('inventory'):
+            logger.warning("庫存分片任務積壓過多，暫不寫入新任務")
+            return 0
+        enqueued = []
+        for tier, product_ids in tiers.items():
+            batches = self.monitor_service.api_client.chunk_inventory_ids(
+                product_ids, self.monitor_service.inventory_batch_size)
+            created = queue.plan_batches('inventory', batches, priority=int(TIER_IMPORTANCE.get(tier, 1.0) * 10))
+            # 只有已寫入（已預留請求預算）的產品才算已輪詢
+            for batch in batches[:created]:
+                enqueued.extend(batch)
+            if created < len(batches):
+                break
+        self.polling.mark_polled(enqueued)
+        return len(enqueued)
 
     def is_running(self) -> bool:
-        """檢查排程器是否正在運行"""
-        return self._running
+        """檢查排程器是否正在運行（待命不算運行）"""
+        return self._running and not self._paused
         
+    def get_run_history(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """最近的執行記錄（最新在前）"""
+        runs = list(self.run_history)
+        runs.reverse()
+        return runs[:limit] if limit is not None else runs
+
     def get_status(self) -> dict:
         """獲取排程器狀態"""
+        now = self.clock()
         return {
-            "running": self._running,
+            "running": self.is_running(),
+            "mode": self.mode,
+            "polling_policy": self.polling_policy,
             "interval": self._interval,
-            "keywords": self._keywords
+            "inventory_interval": self._inventory_interval,
+            "keywords": self._keywords,
+            "schedules": {
+                "update": self._update_schedule.get_stats(now),
+                "inventory": self._inventory_schedule.get_stats(now)
+            },
+            "recent_runs": self.get_run_history(10),
+            "polling": self.polling.get_stats(self.monitor_service.inventory_batch_size),
+            "release_windows": self.release_windows.get_stats(),
+            "change_rate": self.change_rate.get_stats(),
+            "request_budget": self.monitor_service.request_budget.get_stats(),
+            "leadership": self.leader.get_status() if self.leader is not None else None,
+            "work_queue": (self.monitor_service.work_queue.get_stats()
+                           if self.monitor_service.work_queue is not None else None)
         }
         
-    def update_settings(self, interval: Optional[int] = None, keywords: Optional[List[str]] = None) -> bool:
-        """更新排程器設置"""
-        if interval is not None:
-            self._interval = interval
+    def update_settings(self, interval: Optional[int] = None, keywords: Optional[List[str]] = None,
+                        inventory_interval: Optional[int] = None,
+                        tier_intervals: Optional[Dict[str, float]] = None,
+                        release_burst: Optional[Dict[str, Any]] = None,
+                        target_staleness: Optional[float] = None,
+                        request_budget: Optional[int] = None,
+                        polling_policy: Optional[str] = None,
+                        mode: Optional[str] = None, persist: bool = True) -> bool:
+        """更新排程器設置（間隔與模式立即生效）
+
+        先校驗全部設置，任一無效時拋出 ValueError/TypeError 且不修改任何值；全部生效後一次保存。
+        """
+        if mode is not None and mode not in SCHEDULE_MODES:
+            raise ValueError(f"不支持的排程模式: {mode}")
+        for name, value in (('interval', interval), ('inventory_interval', inventory_interval)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} 必須大於 0")
+        if keywords is not None and not isinstance(keywords, list):
+            raise ValueError("keywords 必須是列表")
+        if tier_intervals is not None:
+            self.polling.validate_intervals(tier_intervals)
+        if release_burst is not None:
+            self.release_windows.validate_config(release_burst)
+        if target_staleness is not None and not 0 < target_staleness < 1:
+            raise ValueError("target_staleness 必須介於 0 與 1 之間")
+        if request_budget is not None and request_budget < 0:
+            raise ValueError("請求預算不能為負數")
+        if polling_policy is not None and polling_policy not in POLLING_POLICIES:
+            raise ValueError(f"不支持的輪詢策略: {polling_policy}")
+
+        if mode is not None:
+            self.mode = mode
+            self._inventory_schedule.reschedule(mode=mode)
+
+        if interval is not None or mode is not None:
+            if interval is not None:
+                self._interval = interval
+            self._update_schedule.reschedule(interval=interval, mode=mode)
+        
+        if inventory_interval is not None:
+            self._inventory_interval = inventory_interval
+            self.polling.set_intervals({'watched': inventory_interval})
+
+        if tier_intervals is not None:
+            self.polling.set_intervals(tier_intervals)
+
+        if polling_policy is not None:
+            self.set_polling_policy(polling_policy)
+
+        if release_burst is not None:
+            self.release_windows.update_config(release_burst)
+
+        if target_staleness is not None:
+            self.change_rate.target_staleness = target_staleness
+
+        if request_budget is not None:
+            self.monitor_service.request_budget.set_budget(request_budget)
         
         if keywords is not None:
             self._keywords = keywords
             
-        logger.info(f"排程器設置已更新: 間隔={self._interval}秒, 關鍵字={self._keywords}")
+        # 喚醒循環按新的計劃重新計算等待時間
+        self._signal()
+        if persist:
+            self.save_settings()
+        logger.info(f"排程器設置已更新: 模式={self.mode}, 輪詢策略={self.polling_policy}, 間隔={self._interval}秒, 庫存間隔={self._inventory_interval}秒, "
+                    f"層級間隔={self.polling.intervals}, 關鍵字={self._keywords}")
         return True
 
+
+    def get_settings(self) -> Dict[str, Any]:
+        """可持久化的排程器設置（enabled 表示是否應在啟動時恢復運行）"""
+        return {
+            'enabled': self.is_running(),
+            'mode': self.mode,
+            'polling_policy': self.polling_policy,
+            'interval': self._interval,
+            'inventory_interval': self._inventory_interval,
+            'keywords': self._keywords,
+            'tier_intervals': dict(self.polling.intervals),
+            'release_burst': self.release_windows.get_stats()['config'],
+            'target_staleness': self.change_rate.target_staleness,
+            'request_budget': self.monitor_service.request_budget.budget
+        }
+
+    def save_settings(self, enabled: Optional[bool] = None) -> bool:
+        """保存設置到 monitor_state；enabled 為 None 時保留已保存的啟停狀態"""
+        if self.app is None:
+            return False
+        from src.models.product import MonitorState, db
+
+        with self.app.app_context():
+            try:
+                settings = self.get_settings()
+                if enabled is None:
+                    saved = MonitorState.get_value(SETTINGS_KEY) or {}
+                    enabled = saved.get('enabled', self.is_running())
+                settings['enabled'] = enabled
+                MonitorState.set_value(SETTINGS_KEY, settings)
+                self._settings_version = db.session.get(MonitorState, SETTINGS_KEY).updated_at
+                return True
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"保存排程器設置失敗: {e}", exc_info=True)
+                return False
+
+    def _load_settings(self, changed_only: bool = False) -> Optional[Dict[str, Any]]:
+        """讀取已保存的設置；changed_only 時只在記錄變更後返回（需要應用上下文）"""
+        from src.models.product import MonitorState, db
+
+        state = db.session.get(MonitorState, SETTINGS_KEY)
+        if state is None or not state.value:
+            return None
+        if changed_only and state.updated_at == self._settings_version:
+            return None
+        self._settings_version = state.updated_at
+        return json.loads(state.value)
+
+    def _apply_settings(self, settings: Dict[str, Any]):
+        """應用已保存的設置，無效的項目保留當前值"""
+        try:
+            self.update_settings(
+                interval=settings.get('interval'),
+                keywords=settings.get('keywords'),
+                inventory_interval=settings.get('inventory_interval'),
+                tier_intervals=settings.get('tier_intervals'),
+                release_burst=settings.get('release_burst'),
+                target_staleness=settings.get('target_staleness'),
+                request_budget=settings.get('request_budget'),
+                polling_policy=settings.get('polling_policy'),
+                mode=settings.get('mode'),
+                persist=False
+            )
+        except (TypeError, ValueError) as e:
+            logger.warning(f"已保存的排程器設置無效，部分設置將使用當前值: {e}")
+
+    def _sync_settings(self):
+        """應用其他進程（如處理 API 請求的 worker）保存的設置，設置被停用時本進程待命，重新啟用時恢復"""
+        settings = self._load_settings(changed_only=True)
+        if settings is None:
+            return
+        logger.info("檢測到排程器設置已變更，正在同步")
+        self._apply_settings(settings)
+        enabled = settings.get('enabled', True)
+        if not enabled and not self._paused:
+            self._paused = True
+            logger.info("排程器已在其他進程中停止，本進程保持待命。")
+        elif enabled and self._paused:
+            self._paused = False
+            logger.info("排程器已在其他進程中啟動，本進程恢復運行。")
+
+    def restore(self, autostart: bool = AUTOSTART) -> bool:
+        """載入上次保存的設置；autostart 時除非上次被手動停止，否則啟動排程器，返回是否已啟動
+
+        多進程部署時上次被手動停止的排程器也啟動循環但保持待命，其他進程重新啟用後一同恢復。
+        """
+        if self.app is None:
+            return False
+
+        with self.app.app_context():
+            settings = self._load_settings() or {}
+        if settings:
+            self._apply_settings(settings)
+            logger.info("已載入保存的排程器設置")
+        if not autostart:
+            return False
+        if not settings.get('enabled', True):
+            if self.leader is None:
+                return False
+            self._paused = True
+        return self.start(interval=self._interval, keywords=self._keywords,
+                          inventory_interval=self._inventory_interval, mode=self.mode)
@@ -0,0 +1,275 @@
+import logging
+import math
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.services.monitor import MonitorService
+from src.services.polling_tiers import DEFAULT_FIXED_INTERVAL
+from src.services.popmart_api_client import PopmartAPIClient
+from src.services.request_budget import request_category
+from src.services.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+# 讀取牆上時間、需要在模擬期間替換為虛擬時鐘的模組
+TIME_WARPED_MODULES = (
+    'src.models.product',
+    'src.services.change_rate',
+    'src.services.metrics',
+    'src.services.monitor',
+    'src.services.polling_tiers',
+    'src.services.popmart_api_client',
+    'src.services.release_windows',
+    'src.services.request_budget',
+    'src.services.scheduler',
+)
+
+# 模擬默認從 2025-01-01 開始，與合成目錄的上架/發售日期對齊
+DEFAULT_START = datetime(2025, 1, 1)
+
+
+class VirtualClock:
+    """虛擬時鐘：epoch 秒，只在模擬器推進時前進"""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+
+
+class _TimeShim:
+    """替代模組中的 time：time()/monotonic() 返回虛擬時間，其餘函數不變"""
+
+    def __init__(self, clock: VirtualClock):
+        self._clock = clock
+
+    def time(self) -> float:
+        return self._clock.now
+
+    def monotonic(self) -> float:
+        return self._clock.now
+
+    def __getattr__(self, name: str):
+        return getattr(time, name)
+
+
+@contextmanager
+def warp_time(clock: VirtualClock) -> Iterator[None]:
+    """模擬期間將各模組的 time 與 datetime.now() 指向虛擬時鐘，結束後恢復"""
+
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.now, tz)
+
+    shim = _TimeShim(clock)
+    patched: List[Tuple[Any, str, Any]] = []
+    try:
+        for name in TIME_WARPED_MODULES:
+            module = sys.modules.get(name)
+            if module is None:
+                continue
+            if getattr(module, 'time', None) is time:
+                patched.append((module, 'time', time))
+                module.time = shim
+            if getattr(module, 'datetime', None) is datetime:
+                patched.append((module, 'datetime', datetime))
+                module.datetime = VirtualDatetime
+        yield
+    finally:
+        for module, attribute, original in reversed(patched):
+            setattr(module, attribute, original)
+
+
+def _fixed_policy(scheduler: Scheduler):
+    """默認策略：所有產品（監控列表也一樣）按同一間隔輪詢，不按變化率、發售窗口或請求預算調整"""
+    scheduler.update_settings(polling_policy='fixed', inventory_interval=DEFAULT_FIXED_INTERVAL)
+
+
+def _tiered_policy(scheduler: Scheduler):
+    """按產品屬性分層輪詢，不按變化率調整"""
+    scheduler.update_settings(polling_policy='tiered')
+    scheduler.change_rate.intervals = lambda now=None: {}
+
+
+def _adaptive_policy(scheduler: Scheduler):
+    """可選的分層策略（polling_policy=tiered）：分層輪詢 + 按變化率調整 + 發售窗口加速"""
+    scheduler.update_settings(polling_policy='tiered')
+
+
+# 內置策略：名稱 -> 配置排程器的函數
+POLICIES: Dict[str, Callable[[Scheduler], None]] = {
+    'fixed': _fixed_policy,
+    'tiered': _tiered_policy,
+    'adaptive': _adaptive_policy,
+}
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """最近秩百分位數"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class PolicySimulation:
+    """以虛擬時鐘驅動 Scheduler、MonitorService 與合成目錄，重放一段時間內的庫存/價格變化
+
+    每個上游請求按 request_latency 推進虛擬時鐘，任務之間直接跳到下一個計劃時間點，
+    不需要真實等待，耗時只取決於模擬期間的請求數（每個請求約數毫秒的數據庫寫入）。目錄的每次變化記錄為事件，產品首次在變化之後被輪詢到
+    （庫存變化：庫存查詢或完整數據；價格變化與新品：完整數據）即視為檢測到，
+    在檢測前被同類後續變化覆蓋的事件計為漏檢。相同 seed 與策略的結果完全可重現。
+    需要應用上下文（建議使用內存數據庫）。
+    """
+
+    def __init__(self, policy: Callable[[Scheduler], None], duration: float = 7 * 86400,
+                 catalog_size: int = 200, seed: int = 42, cycle_seconds: float = 300,
+                 stock_change_rate: float = 0.02, price_change_rate: float = 0.002,
+                 new_product_rate: float = 0.0005, request_latency: float = 0.5,
+                 update_interval: float = 1800, sync_interval: float = 600,
+                 start: datetime = DEFAULT_START):
+        self.policy = policy
+        self.duration = duration
+        self.seed = seed
+        self.request_latency = request_latency
+        self.clock = VirtualClock(start.timestamp())
+        self.started_at = self.clock.now
+
+        self.api_client = PopmartAPIClient(mock_catalog_size=catalog_size, mock_seed=seed,
+                                           mock_cycle_seconds=cycle_seconds)
+        self.api_client.mock_latency = (0, 0)
+        self.catalog = self.api_client.mock_catalog
+        self.catalog.stock_change_rate = stock_change_rate
+        self.catalog.price_change_rate = price_change_rate
+        self.catalog.new_product_rate = new_product_rate
+        self.catalog.clock = self.clock.time
+        self.catalog.started_at = self.clock.now
+        self.catalog.change_listeners.append(self._on_change)
+
+        self.monitor_service = MonitorService(self.api_client)
+        self.monitor_service.request_budget.clock = self.clock.time
+        self.monitor_service.request_budget._start_window(self.clock.now)
+        self.api_client.request_observers.append(self._on_request)
+
+        self.scheduler = Scheduler(self.monitor_service)
+        self.scheduler.clock = self.clock.time
+        self.scheduler.polling.clock = self.clock.time
+        self.scheduler.polling.sync_interval = sync_interval
+        self.scheduler.update_settings(interval=update_interval)
+        policy(self.scheduler)
+
+        # 未檢測的變化：(產品ID, 類型) -> 變化時間
+        self._pending: Dict[Tuple[str, str], float] = {}
+        self.latencies: Dict[str, List[float]] = {'stock': [], 'price': [], 'new': []}
+        self.changes: Dict[str, int] = {'stock': 0, 'price': 0, 'new': 0}
+        self.missed: Dict[str, int] = {'stock': 0, 'price': 0, 'new': 0}
+        self.requests: Dict[str, int] = {}
+        self._wrap_sinks()
+
+    def _change_time(self) -> float:
+        """目錄變化發生在所屬輪次的開始時間"""
+        return self.catalog.started_at + self.catalog.cycle * self.catalog.cycle_seconds
+
+    def _on_change(self, kind: str, product_id: str, product):
+        self.changes[kind] += 1
+        key = (product_id, kind)
+        if key in self._pending:
+            # 上一次變化在被觀察到之前已被覆蓋
+            self.missed[kind] += 1
+        self._pending[key] = self._change_time()
+
+    def _on_request(self, method: str, url: str, status: Optional[int], size: int, elapsed: float):
+        category = request_category(url)
+        self.requests[category] = self.requests.get(category, 0) + 1
+        self.clock.advance(self.request_latency)
+
+    def _observe(self, product_ids, kinds: Tuple[str, ...]):
+        now = self.clock.now
+        for product_id in product_ids:
+            for kind in kinds:
+                changed_at = self._pending.get((product_id, kind))
+                if changed_at is not None and changed_at <= now:
+                    del self._pending[(product_id, kind)]
+                    self.latencies[kind].append(now - changed_at)
+
+    def _wrap_sinks(self):
+        """攔截寫入數據庫的兩個入口，記錄每個產品被觀察到的虛擬時間"""
+        monitor_service = self.monitor_service
+        process_product_list = monitor_service._process_product_list
+        apply_inventory = monitor_service._apply_inventory
+
+        async def observed_process_product_list(products, seeding=False):
+            self._observe([product.id for product in products], ('stock', 'price', 'new'))
+            await process_product_list(products, seeding)
+
+        async def observed_apply_inventory(inventory):
+            self._observe(list(inventory.keys()), ('stock',))
+            return await apply_inventory(inventory)
+
+        monitor_service._process_product_list = observed_process_product_list
+        monitor_service._apply_inventory = observed_apply_inventory
+
+    async def run(self) -> Dict[str, Any]:
+        """運行模擬並返回報告"""
+        random.seed(self.seed)  # 模擬 API 對未知產品使用全局隨機數
+        end = self.started_at + self.duration
+        wall_started = time.perf_counter()
+        ticks = 0
+        with warp_time(self.clock):
+            while self.clock.now < end:
+                self.catalog.sync()
+                delay = await self.scheduler.run_pending()
+                self.clock.advance(min(delay, end - self.clock.now))
+                ticks += 1
+            self.catalog.sync()
+        return self.report(ticks, time.perf_counter() - wall_started)
+
+    def report(self, ticks: int, wall_seconds: float) -> Dict[str, Any]:
+        pending: Dict[str, int] = {'stock': 0, 'price': 0, 'new': 0}
+        for _, kind in self._pending:
+            pending[kind] += 1
+        detection = {}
+        for kind, latencies in self.latencies.items():
+            detection[kind] = {
+                'changes': self.changes[kind],
+                'detected': len(latencies),
+                'missed': self.missed[kind],
+                'undetected_at_end': pending[kind],
+                'p50': _round(percentile(latencies, 0.5)),
+                'p90': _round(percentile(latencies, 0.9)),
+                'p99': _round(percentile(latencies, 0.99)),
+                'max': _round(max(latencies) if latencies else None),
+                'mean': _round(sum(latencies) / len(latencies) if latencies else None)
+            }
+        runs: Dict[str, int] = {}
+        for schedule in (self.scheduler._update_schedule, self.scheduler._inventory_schedule):
+            runs[schedule.name] = schedule.runs
+        total_requests = sum(self.requests.values())
+        days = self.duration / 86400
+        return {
+            'simulated_seconds': self.duration,
+            'wall_seconds': round(wall_seconds, 3),
+            'ticks': ticks,
+            'catalog': {'seed': self.seed, 'size': len(self.catalog), 'cycles': self.catalog.cycle},
+            'detection': detection,
+            'requests': {
+                'total': total_requests,
+                'per_day': round(total_requests / days, 1) if days else None,
+                'by_category': dict(sorted(self.requests.items()))
+            },
+            'runs': runs
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
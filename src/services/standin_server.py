@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from src.services.popmart_api_client import PopmartProduct
+from src.services.synthetic_catalog import SyntheticCatalog
+
+logger = logging.getLogger(__name__)
+
+LATENCY_MODES = ('none', 'fixed', 'uniform', 'lognormal')
+
+
+class LatencyModel:
+    """響應延遲分佈（秒）"""
+
+    def __init__(self, mode: str = 'lognormal', mean: float = 0.08, spread: float = 0.5,
+                 rng: Optional[random.Random] = None):
+        if mode not in LATENCY_MODES:
+            raise ValueError(f"不支持的延遲分佈: {mode}")
+        self.mode = mode
+        self.mean = mean
+        self.spread = spread
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        """抽取一次延遲"""
+        if self.mode == 'none' or self.mean <= 0:
+            return 0.0
+        if self.mode == 'fixed':
+            return self.mean
+        if self.mode == 'uniform':
+            # spread 為相對 mean 的半寬
+            half_width = self.mean * min(self.spread, 1.0)
+            return self.rng.uniform(self.mean - half_width, self.mean + half_width)
+        # 對數正態：長尾延遲，mean 為分佈均值，spread 為 sigma
+        mu = math.log(self.mean) - self.spread ** 2 / 2
+        return self.rng.lognormvariate(mu, self.spread)
+
+
+class StandinPopmartServer:
+    """本地 PopMart API 替身服務器 - 以合成目錄實現商品、搜索與庫存接口
+
+    供 PopmartAPIClient 將 base_url 指向本地，在無網絡的機器上運行完整的
+    HTTP 路徑（連接池、限流、429 重試、ETag 條件請求與 JSON 解析）。
+    """
+
+    def __init__(self, catalog: Optional[SyntheticCatalog] = None, latency: Optional[LatencyModel] = None,
+                 rate_limit_probability: float = 0.0, server_error_probability: float = 0.0,
+                 retry_after: Optional[float] = 1.0, etags: bool = True, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.catalog = catalog if catalog is not None else SyntheticCatalog(size=1000, seed=seed)
+        self.latency = latency or LatencyModel(rng=self.rng)
+        self.rate_limit_probability = rate_limit_probability
+        self.server_error_probability = server_error_probability
+        self.retry_after = retry_after
+        self.etags = etags
+        self.stats = {
+            'requests': 0, 'ok': 0, 'not_modified': 0, 'rate_limited': 0,
+            'server_errors': 0, 'not_found': 0, 'bad_requests': 0
+        }
+        self.endpoint_counts: Dict[str, int] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+
+    def create_app(self) -> web.Application:
+        """創建 aiohttp 應用"""
+        app = web.Application(middlewares=[self._fault_middleware])
+        app.router.add_get('/shop/v1/products', self.handle_products)
+        app.router.add_get('/shop/v1/products/{product_id}', self.handle_product_detail)
+        app.router.add_get('/search/v1/products', self.handle_search)
+        app.router.add_get('/inventory/v1/check', self.handle_inventory)
+        app.router.add_get('/_standin/stats', self.handle_stats)
+        app.router.add_post('/_standin/advance', self.handle_advance)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """在當前事件循環中啟動服務器，返回 base_url（port=0 時自動分配端口）"""
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        logger.info(f"替身服務器已啟動: {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        """停止服務器"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("替身服務器已停止")
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    # ---- 延遲與故障注入 ----
+
+    @web.middleware
+    async def _fault_middleware(self, request: web.Request, handler):
+        """為每個請求注入延遲、429 與 5xx"""
+        path = request.path
+        self.stats['requests'] += 1
+        if not path.startswith('/_standin/'):
+            endpoint = request.match_info.route.resource.canonical if request.match_info.route.resource else path
+            self.endpoint_counts[endpoint] = self.endpoint_counts.get(endpoint, 0) + 1
+
+            delay = self.latency.sample()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if self.rate_limit_probability and self.rng.random() < self.rate_limit_probability:
+                self.stats['rate_limited'] += 1
+                headers = {}
+                if self.retry_after is not None:
+                    headers['Retry-After'] = f"{self.retry_after:g}"
+                return web.json_response({'code': 429, 'message': 'Too Many Requests'},
+                                         status=429, headers=headers)
+            if self.server_error_probability and self.rng.random() < self.server_error_probability:
+                self.stats['server_errors'] += 1
+                status = self.rng.choice((500, 502, 503))
+                return web.json_response({'code': status, 'message': 'Server Error'}, status=status)
+
+            # 按時鐘推進目錄，使商品隨時間變化
+            self.catalog.sync()
+        return await handler(request)
+
+    def _respond(self, request: web.Request, data: Dict[str, Any]) -> web.Response:
+        """序列化響應並處理 ETag / If-None-Match"""
+        body = json.dumps({'code': 200, 'message': 'success', 'data': data},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        headers = {}
+        if self.etags:
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            headers['ETag'] = etag
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match and etag in (tag.strip() for tag in if_none_match.split(',')):
+                self.stats['not_modified'] += 1
+                return web.Response(status=304, headers=headers)
+        self.stats['ok'] += 1
+        return web.Response(body=body, headers=headers, content_type='application/json', charset='utf-8')
+
+    def _error(self, status: int, message: str) -> web.Response:
+        self.stats['not_found' if status == 404 else 'bad_requests'] += 1
+        return web.json_response({'code': status, 'message': message}, status=status)
+
+    # ---- 接口 ----
+
+    @staticmethod
+    def _raw_item(product: PopmartProduct) -> Dict[str, Any]:
+        """轉換為上游 API 的原始商品格式（分類與品牌使用 category / brand 鍵）"""
+        item = product.to_dict()
+        item['category'] = item.pop('category_name')
+        item['brand'] = item.pop('brand_name')
+        for key in ('created_at', 'updated_at', 'last_checked'):
+            item.pop(key, None)
+        return item
+
+    @staticmethod
+    def _int_param(request: web.Request, name: str, default: int, maximum: int = None) -> int:
+        value = int(request.query.get(name, default))
+        if value < 1:
+            raise ValueError(f"{name} 必須大於 0")
+        return min(value, maximum) if maximum else value
+
+    def _page(self, page_items: List[PopmartProduct], total: int, page: int, limit: int) -> Dict[str, Any]:
+        """生成一頁響應及分頁元數據"""
+        return {
+            'products': [self._raw_item(p) for p in page_items],
+            'page': page,
+            'limit': limit,
+            'total': total,
+            'total_pages': max(math.ceil(total / limit), 1)
+        }
+
+    async def handle_products(self, request: web.Request) -> web.Response:
+        """商品列表：支持 page、limit、sort、category 與 is_limited"""
+        try:
+            page = self._int_param(request, 'page', 1)
+            limit = self._int_param(request, 'limit', 20, maximum=200)
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        query = request.query
+        catalog = self.catalog
+        start = (page - 1) * limit
+        if query.get('is_limited', '').lower() == 'true':
+            products = [p for p in catalog.newest() if p.is_limited]
+        elif query.get('category'):
+            products = [p for p in catalog.newest() if p.category_id == query['category']]
+        elif query.get('sort') == 'popular':
+            products = catalog.popular()
+        else:
+            # 按最新排序時只切取所需區間
+            page_items = catalog.newest(start, start + limit)
+            return self._respond(request, self._page(page_items, len(catalog), page, limit))
+        return self._respond(request, self._page(products[start:start + limit], len(products), page, limit))
+
+    async def handle_product_detail(self, request: web.Request) -> web.Response:
+        """商品詳情"""
+        product = self.catalog.get(request.match_info['product_id'])
+        if product is None:
+            return self._error(404, '商品不存在')
+        return self._respond(request, self._raw_item(product))
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        """關鍵字搜索"""
+        keyword = request.query.get('q', '').strip()
+        if not keyword:
+            return self._error(400, '缺少搜索關鍵字')
+        try:
+            page = self._int_param(request, 'page', 1)
+            limit = self._int_param(request, 'limit', 20, maximum=200)
+        except ValueError as e:
+            return self._error(400, str(e))
+        products = self.catalog.search(keyword)
+        start = (page - 1) * limit
+        return self._respond(request, self._page(products[start:start + limit], len(products), page, limit))
+
+    async def handle_inventory(self, request: web.Request) -> web.Response:
+        """批量庫存查詢（不存在的商品不返回）"""
+        product_ids = [i for i in request.query.get('product_ids', '').split(',') if i]
+        if not product_ids:
+            return self._error(400, '缺少 product_ids')
+        timestamp = datetime.now().isoformat()
+        inventory = []
+        for product_id in product_ids:
+            product = self.catalog.get(product_id)
+            if product is not None:
+                inventory.append({
+                    'product_id': product_id,
+                    'in_stock': product.in_stock,
+                    'quantity': product.stock_quantity or 0,
+                    'last_updated': product.updated_at or timestamp
+                })
+        return self._respond(request, {'inventory': inventory})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """替身服務器統計"""
+        return web.json_response(self.get_stats())
+
+    async def handle_advance(self, request: web.Request) -> web.Response:
+        """手動推進目錄若干輪"""
+        try:
+            cycles = int(request.query.get('cycles', 1))
+        except ValueError:
+            return self._error(400, 'cycles 必須是整數')
+        self.catalog.advance(cycles)
+        return web.json_response({'cycle': self.catalog.cycle})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取請求統計"""
+        return {
+            **self.stats,
+            'endpoints': dict(self.endpoint_counts),
+            'catalog': self.catalog.get_stats(),
+            'latency': {'mode': self.latency.mode, 'mean': self.latency.mean, 'spread': self.latency.spread},
+            'rate_limit_probability': self.rate_limit_probability,
+            'server_error_probability': self.server_error_probability
+        }
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='本地 PopMart API 替身服務器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--catalog-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--cycle-seconds', type=float, default=None, help='目錄每輪變化的秒數')
+    parser.add_argument('--latency', choices=LATENCY_MODES, default='lognormal')
+    parser.add_argument('--latency-mean', type=float, default=0.08)
+    parser.add_argument('--latency-spread', type=float, default=0.5)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='429 注入概率')
+    parser.add_argument('--server-error', type=float, default=0.0, help='5xx 注入概率')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--no-etag', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = StandinPopmartServer(
+        catalog=SyntheticCatalog(size=args.catalog_size, seed=args.seed, cycle_seconds=args.cycle_seconds),
+        latency=LatencyModel(args.latency, args.latency_mean, args.latency_spread, rng=random.Random(args.seed)),
+        rate_limit_probability=args.rate_limit,
+        server_error_probability=args.server_error,
+        retry_after=args.retry_after,
+        etags=not args.no_etag,
+        seed=args.seed
+    )
+    web.run_app(server.create_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
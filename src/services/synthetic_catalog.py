@@ -0,0 +1,269 @@
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from src.services.popmart_api_client import PopmartProduct
+
+logger = logging.getLogger(__name__)
+
+# 品牌及其權重（頭部品牌佔大部分商品）與系列主題
+BRAND_PROFILES: Tuple[Tuple[str, float, Tuple[str, ...]], ...] = (
+    ("LABUBU", 0.26, ("太空旅行系列", "心動馬卡龍系列", "坐坐派對系列", "森林音樂會系列", "怪味便利店系列")),
+    ("SKULLPANDA", 0.17, ("溫度系列", "密林古堡系列", "夜之城系列", "日常系列")),
+    ("MOLLY", 0.15, ("幻想大亨系列", "職業系列", "童話系列", "一日店長系列")),
+    ("DIMOO", 0.12, ("迷失在太空系列", "水族館系列", "約會系列")),
+    ("HIRONO", 0.10, ("夢幻星球系列", "小野系列", "城市詩系列")),
+    ("CRYBABY", 0.08, ("海洋系列", "悲傷俱樂部系列", "晚安系列")),
+    ("PUCKY", 0.07, ("森林精靈系列", "寶寶系列", "泡泡系列")),
+    ("HACIPUPU", 0.05, ("蝸牛系列", "生日系列")),
+)
+
+CATEGORIES: Tuple[Tuple[str, str], ...] = (
+    ("cat_01", "盲盒"), ("cat_02", "手辦"), ("cat_03", "MEGA"),
+    ("cat_04", "毛絨"), ("cat_05", "周邊"),
+)
+
+_TOKEN_PATTERN = re.compile(r"[\w一-鿿]+")
+
+
+class SyntheticCatalog:
+    """可重現的合成商品目錄 - 供模擬模式、基準測試與模擬器使用
+
+    相同 seed 生成相同的目錄與變化序列。商品按 ID、品牌與關鍵字建立索引，
+    advance() 按每輪的變化率模擬庫存、價格漂移與新品上架。
+    """
+
+    def __init__(self, size: int = 20, seed: Optional[int] = None,
+                 stock_change_rate: float = 0.05, price_change_rate: float = 0.01,
+                 new_product_rate: float = 0.0, cycle_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.time, region: str = "hk"):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.region = region
+        self.stock_change_rate = stock_change_rate
+        self.price_change_rate = price_change_rate
+        self.new_product_rate = new_product_rate
+        self.cycle_seconds = cycle_seconds
+        self.clock = clock
+        self.started_at = clock()
+        self.cycle = 0
+
+        # 按上架順序排列（最舊在前）
+        self.products: List[PopmartProduct] = []
+        self.by_id: Dict[str, PopmartProduct] = {}
+        self.by_brand: Dict[str, List[PopmartProduct]] = defaultdict(list)
+        self._keyword_index: Dict[str, Set[str]] = defaultdict(set)
+        self._position: Dict[str, int] = {}
+        self._popular_cache: Optional[List[PopmartProduct]] = None
+        self._new_product_carry = 0.0
+        self.change_listeners: List[Callable[[str, str, PopmartProduct], None]] = []
+
+        self._brand_names = [brand for brand, _, _ in BRAND_PROFILES]
+        self._brand_weights = [weight for _, weight, _ in BRAND_PROFILES]
+        self._brand_series = {brand: series for brand, _, series in BRAND_PROFILES}
+        self._brand_ids = {brand: f"brand_{i + 1:02d}" for i, brand in enumerate(self._brand_names)}
+        self._series_tokens: Dict[Tuple[str, str], Set[str]] = {}
+        self._base_time = datetime(2025, 1, 1)
+
+        for _ in range(size):
+            self._add_product(is_new=False)
+        # 最新的一小部分商品標記為新品
+        for product in self.products[-max(size // 20, 1):] if size else []:
+            product.is_new = True
+        logger.info(f"已生成合成目錄: {size} 個商品 (seed={self.seed})")
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def _timestamp(self) -> str:
+        """當前模擬輪次的時間戳"""
+        return (self._base_time + timedelta(hours=self.cycle)).isoformat()
+
+    def _add_product(self, is_new: bool) -> PopmartProduct:
+        """生成一個新商品並加入索引"""
+        rng = self.rng
+        index = len(self.products) + 1
+        brand = rng.choices(self._brand_names, self._brand_weights)[0]
+        series_options = self._brand_series[brand]
+        # 系列按 Zipf 分佈，頭部系列商品更多
+        series = series_options[min(int(rng.paretovariate(1.2)) - 1, len(series_options) - 1)]
+        category_id, category_name = CATEGORIES[min(int(rng.expovariate(0.8)), len(CATEGORIES) - 1)]
+        product_id = f"prod_{index:06d}"
+        price = round(rng.choice((59, 69, 79, 89, 99, 129, 159, 199, 299, 499, 899, 1599)) * 1.0, 2)
+        discounted = rng.random() < 0.1
+        in_stock = rng.random() < 0.7
+        is_limited = rng.random() < 0.08
+        release_date = (self._base_time + timedelta(days=index % 365)).strftime('%Y-%m-%d')
+        timestamp = self._timestamp()
+
+        product = PopmartProduct(
+            id=product_id,
+            name=f"{brand} {series} #{index:05d}",
+            description=f"{brand} {series} 第 {index} 款",
+            price=price,
+            original_price=price if discounted else None,
+            discount_price=round(price * 0.8, 2) if discounted else None,
+            image_url=f"https://example.com/images/{product_id}.jpg",
+            image_urls=[f"https://example.com/images/{product_id}_{j}.jpg" for j in range(1, 4)],
+            product_url=f"https://www.popmart.com/{self.region}/products/{product_id}",
+            category_id=category_id,
+            category_name=category_name,
+            brand_id=self._brand_ids[brand],
+            brand_name=brand,
+            series=series,
+            in_stock=in_stock,
+            stock_quantity=rng.randint(1, 200) if in_stock else 0,
+            max_purchase_quantity=rng.choice((1, 2, 5, 10)),
+            is_new=is_new,
+            is_limited=is_limited,
+            is_pre_order=rng.random() < 0.05,
+            is_blind_box=category_name == "盲盒",
+            release_date=release_date,
+            dimensions={"height": 10.0, "width": 5.0, "depth": 5.0},
+            weight=0.2,
+            material="PVC",
+            tags=["公仔", brand, series],
+            sku=f"SKU{product_id}",
+            barcode=f"BAR{product_id}",
+            view_count=int(rng.paretovariate(1.1) * 100),
+            like_count=int(rng.paretovariate(1.1) * 10),
+            review_count=rng.randint(0, 100),
+            average_rating=round(rng.uniform(3.5, 5.0), 2),
+            created_at=timestamp,
+            updated_at=timestamp,
+            last_checked=timestamp
+        )
+
+        self._position[product_id] = len(self.products)
+        self.products.append(product)
+        self.by_id[product_id] = product
+        self.by_brand[brand].append(product)
+        tokens = self._series_tokens.get((brand, series))
+        if tokens is None:
+            tokens = self._series_tokens[(brand, series)] = self._tokens(f"{brand} {series}")
+        for token in tokens:
+            self._keyword_index[token].add(product_id)
+        self._popular_cache = None
+        return product
+
+    @staticmethod
+    def _tokens(text: str) -> Set[str]:
+        return {token.lower() for token in _TOKEN_PATTERN.findall(text)}
+
+    # ---- 查詢 ----
+
+    def get(self, product_id: str) -> Optional[PopmartProduct]:
+        """按ID查找商品"""
+        return self.by_id.get(product_id)
+
+    def get_by_brand(self, brand: str) -> List[PopmartProduct]:
+        """按品牌查找商品"""
+        return self.by_brand.get(brand.upper(), [])
+
+    def newest(self, start: int = 0, end: Optional[int] = None) -> List[PopmartProduct]:
+        """按上架時間倒序排列的商品（可只取 [start, end) 區間）"""
+        size = len(self.products)
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return []
+        return self.products[size - end:size - start][::-1]
+
+    def popular(self) -> List[PopmartProduct]:
+        """按點讚數排序的商品"""
+        if self._popular_cache is None:
+            self._popular_cache = sorted(self.products, key=lambda p: p.like_count, reverse=True)
+        return self._popular_cache
+
+    def search(self, keyword: str) -> List[PopmartProduct]:
+        """關鍵字搜索（品牌與系列分詞索引，多個詞取交集），按最新排序"""
+        matched: Optional[Set[str]] = None
+        for word in self._tokens(keyword):
+            ids = self._keyword_index.get(word)
+            if ids is None:
+                # 詞不在索引中時，按子串匹配索引詞
+                ids = set()
+                for token, token_ids in self._keyword_index.items():
+                    if word in token:
+                        ids |= token_ids
+            matched = set(ids) if matched is None else matched & ids
+            if not matched:
+                return []
+        if not matched:
+            return []
+        return sorted((self.by_id[i] for i in matched), key=lambda p: self._position[p.id], reverse=True)
+
+    # ---- 隨時間變化 ----
+
+    def sync(self) -> int:
+        """按時鐘推進到當前輪次，返回推進的輪次數"""
+        if not self.cycle_seconds:
+            return 0
+        target_cycle = int((self.clock() - self.started_at) // self.cycle_seconds)
+        cycles = target_cycle - self.cycle
+        if cycles > 0:
+            self.advance(cycles)
+        return max(cycles, 0)
+
+    def advance(self, cycles: int = 1):
+        """推進若干輪，按變化率模擬庫存、價格變化與新品上架"""
+        for _ in range(cycles):
+            self.cycle += 1
+            timestamp = self._timestamp()
+            size = len(self.products)
+            if size:
+                for position in self._sample_positions(size, self.stock_change_rate):
+                    self._change_stock(self.products[position], timestamp)
+                for position in self._sample_positions(size, self.price_change_rate):
+                    self._change_price(self.products[position], timestamp)
+
+            self._new_product_carry += size * self.new_product_rate
+            new_count = int(self._new_product_carry)
+            self._new_product_carry -= new_count
+            for _ in range(new_count):
+                product = self._add_product(is_new=True)
+                self._notify('new', product)
+
+    def _sample_positions(self, size: int, rate: float) -> List[int]:
+        """按變化率抽取本輪變化的商品位置"""
+        expected = size * rate
+        count = int(expected)
+        if self.rng.random() < expected - count:
+            count += 1
+        count = min(count, size)
+        return self.rng.sample(range(size), count) if count else []
+
+    def _change_stock(self, product: PopmartProduct, timestamp: str):
+        rng = self.rng
+        if product.in_stock:
+            sold = rng.randint(1, max(product.stock_quantity or 1, 1))
+            product.stock_quantity = max((product.stock_quantity or 0) - sold, 0)
+            product.in_stock = product.stock_quantity > 0
+        else:
+            product.in_stock = True
+            product.stock_quantity = rng.randint(1, 200)
+        product.updated_at = timestamp
+        self._notify('stock', product)
+
+    def _change_price(self, product: PopmartProduct, timestamp: str):
+        factor = self.rng.choice((0.8, 0.9, 0.95, 1.05, 1.1))
+        product.price = round(product.price * factor, 2)
+        product.updated_at = timestamp
+        self._notify('price', product)
+
+    def _notify(self, kind: str, product: PopmartProduct):
+        for listener in self.change_listeners:
+            listener(kind, product.id, product)
+
+    def get_stats(self) -> Dict[str, object]:
+        """目錄統計"""
+        return {
+            'seed': self.seed,
+            'size': len(self.products),
+            'cycle': self.cycle,
+            'brands': {brand: len(items) for brand, items in self.by_brand.items()},
+            'in_stock': sum(1 for p in self.products if p.in_stock)
+        }
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_
+
+from src.models.product import WorkTask, db
+
+logger = logging.getLogger(__name__)
+
+# 分片任務類型：目錄分頁範圍、庫存批量查詢、商品詳情ID集合
+WORK_TASK_KINDS = ('pages', 'inventory', 'details')
+
+# 各類任務的上游請求在請求預算中的類別
+TASK_REQUEST_CATEGORIES = {'pages': 'crawl', 'inventory': 'inventory', 'details': 'detail'}
+
+
+def task_cost(kind: str, payload: Dict[str, Any]) -> int:
+    """執行一個任務需要的上游請求數（不含重試）"""
+    if kind == 'pages':
+        return payload['end'] - payload['start'] + 1
+    if kind == 'details':
+        return len(payload.get('product_ids', []))
+    return 1
+
+# 是否以分片任務隊列代替本進程直接輪詢（需另行運行 python -m src.worker）
+WORK_QUEUE_ENABLED = os.environ.get('POPMART_WORK_QUEUE', '0') == '1'
+
+
+class WorkQueue:
+    """數據庫中的分片任務隊列：規劃器寫入任務，任意數量的 worker 進程以租約方式領取
+
+    領取通過帶條件的 UPDATE 完成（只有狀態與租約仍符合條件時才會更新成功），
+    因此共享同一數據庫的多個進程/主機不會重複執行同一任務；租約過期的任務會被重新領取，
+    超過 max_attempts 次仍未完成的任務標記為失敗。需要應用上下文。
+
+    設置 budget（規劃器進程的 RequestBudget）後，寫入任務時按任務的上游請求數預留預算，
+    預留數記錄在 payload 的 cost 中；worker 執行任務時不再受本進程預算限制，
+    因此無論運行多少個 worker，上游請求總數都不超過規劃器的預算（失敗重試沿用原有預留）。
+    """
+
+    def __init__(self, lease_seconds: float = 120, max_attempts: int = 3, max_backlog: int = 1000,
+                 clock: Callable[[], float] = time.time):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_backlog = max_backlog  # 單類未完成任務上限，超出時規劃器暫停寫入
+        self.clock = clock
+        self.budget = None
+        self.budget_denied = 0  # 因請求預算不足未寫入的任務數
+
+    def _claimable(self, now: float):
+        return or_(WorkTask.status == 'pending',
+                   (WorkTask.status == 'running') & (WorkTask.lease_expires_at < now))
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = 0,
+                key: Optional[str] = None) -> Optional[WorkTask]:
+        """寫入一個任務；同鍵任務尚未完成或請求預算不足時不寫入並返回 None"""
+        if kind not in WORK_TASK_KINDS:
+            raise ValueError(f"未知的任務類型: {kind}")
+        if key is not None and WorkTask.query.filter(
+            WorkTask.key == key, WorkTask.status.in_(('pending', 'running'))
+        ).first() is not None:
+            return None
+        cost = task_cost(kind, payload)
+        if self.budget is not None and not self.budget.acquire(TASK_REQUEST_CATEGORIES[kind], cost):
+            self.budget_denied += 1
+            return None
+        payload = {**payload, 'cost': cost}
+        task = WorkTask(kind=kind, key=key, payload=json.dumps(payload, ensure_ascii=False),
+                        priority=priority, status='pending')
+        db.session.add(task)
+        db.session.commit()
+        return task
+
+    def backlog(self, kind: Optional[str] = None) -> int:
+        """未完成的任務數"""
+        query = WorkTask.query.filter(WorkTask.status.in_(('pending', 'running')))
+        if kind is not None:
+            query = query.filter(WorkTask.kind == kind)
+        return query.count()
+
+    def has_capacity(self, kind: str) -> bool:
+        return self.backlog(kind) < self.max_backlog
+
+    def _budget_exhausted(self, kind: str, cost: int) -> bool:
+        """請求預算已不足以寫入需要 cost 個請求的該類任務"""
+        return self.budget is not None and self.budget.allowance(TASK_REQUEST_CATEGORIES[kind]) < cost
+
+    def plan_pages(self, last_page: int, first_page: int = 1, pages_per_task: int = 5, page_size: int = 100,
+                   sort: str = 'newest', priority: int = 0, seeding: bool = False) -> int:
+        """將 first_page 至 last_page 的目錄分頁切成頁碼範圍任務，返回寫入的任務數
+
+        seeding 表示規劃時數據庫尚無產品（初始入庫），worker 處理時不發送新品與限量商品通知。
+        """
+        created = 0
+        for start in range(first_page, last_page + 1, pages_per_task):
+            end = min(start + pages_per_task - 1, last_page)
+            payload = {'start': start, 'end': end, 'page_size': page_size, 'sort': sort}
+            if seeding:
+                payload['seeding'] = True
+            if self.enqueue('pages', payload, priority, key=f'pages:{sort}:{page_size}:{start}-{end}'):
+                created += 1
+            elif self._budget_exhausted('pages', end - start + 1):
+                logger.warning(f"請求預算不足，第 {start}-{last_page} 頁暫不寫入任務")
+                break
+        return created
+
+    def plan_batches(self, kind: str, batches: Iterable[List[str]], priority: int = 0) -> int:
+        """將產品ID按順序分組寫入庫存或詳情任務，請求預算不足時停止，返回寫入的任務數"""
+        created = 0
+        for batch in batches:
+            if not batch:
+                continue
+            if not self.enqueue(kind, {'product_ids': list(batch)}, priority):
+                logger.warning(f"請求預算不足，剩餘的 {kind} 任務暫不寫入")
+                break
+            created += 1
+        return created
+
+    def reclaim_expired(self) -> int:
+        """租約過期且已達重試上限的任務標記為失敗，其餘等待重新領取"""
+        now = self.clock()
+        failed = WorkTask.query.filter(
+            WorkTask.status == 'running', WorkTask.lease_expires_at < now,
+            WorkTask.attempts >= self.max_attempts
+        ).update({'status': 'failed', 'error': '租約過期且已達重試上限',
+                  'finished_at': datetime.now().isoformat()}, synchronize_session=False)
+        db.session.commit()
+        if failed:
+            logger.warning(f"{failed} 個分片任務租約過期且已達重試上限，已標記為失敗")
+        return failed
+
+    def claim(self, owner: str, limit: int = 1, kinds: Optional[Iterable[str]] = None) -> List[WorkTask]:
+        """領取最多 limit 個任務（優先級高、寫入早的優先），包括租約已過期的任務"""
+        self.reclaim_expired()
+        now = self.clock()
+        query = db.session.query(WorkTask.id).filter(self._claimable(now))
+        if kinds:
+            query = query.filter(WorkTask.kind.in_(list(kinds)))
+        candidates = [row[0] for row in query.order_by(WorkTask.priority.desc(), WorkTask.id).limit(limit * 4)]
+
+        claimed: List[int] = []
+        for task_id in candidates:
+            # 其他進程可能已搶先領取，只有條件仍成立時才更新成功
+            updated = WorkTask.query.filter(WorkTask.id == task_id, self._claimable(now)).update({
+                'status': 'running',
+                'lease_owner': owner,
+                'lease_expires_at': now + self.lease_seconds,
+                'attempts': WorkTask.attempts + 1,
+                'started_at': datetime.now().isoformat()
+            }, synchronize_session=False)
+            db.session.commit()
+            if updated:
+                claimed.append(task_id)
+                if len(claimed) >= limit:
+                    break
+        if not claimed:
+            return []
+        db.session.expire_all()
+        return WorkTask.query.filter(WorkTask.id.in_(claimed)).order_by(WorkTask.id).all()
+
+    def _owned(self, task_id: int, owner: str):
+        return WorkTask.query.filter(WorkTask.id == task_id, WorkTask.status == 'running',
+                                     WorkTask.lease_owner == owner)
+
+    def renew(self, task_id: int, owner: str) -> bool:
+        """延長租約；任務已被其他進程接管時返回 False"""
+        updated = self._owned(task_id, owner).update(
+            {'lease_expires_at': self.clock() + self.lease_seconds}, synchronize_session=False)
+        db.session.commit()
+        return bool(updated)
+
+    def complete(self, task_id: int, owner: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """標記任務完成並保存結果摘要"""
+        updated = self._owned(task_id, owner).update({
+            'status': 'completed',
+            'lease_expires_at': None,
+            'finished_at': datetime.now().isoformat(),
+            'result': json.dumps(result or {}, ensure_ascii=False),
+            'error': None
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(updated)
+
+    def fail(self, task_id: int, owner: str, error: str) -> bool:
+        """任務執行失敗：未達重試上限時放回隊列，否則標記為失敗"""
+        task = db.session.get(WorkTask, task_id)
+        if task is None:
+            return False
+        exhausted = (task.attempts or 0) >= self.max_attempts
+        updated = self._owned(task_id, owner).update({
+            'status': 'failed' if exhausted else 'pending',
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'finished_at': datetime.now().isoformat() if exhausted else None,
+            'error': error
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(updated)
+
+    def purge(self, older_than: float = 86400) -> int:
+        """刪除已結束超過 older_than 秒的任務"""
+        cutoff = datetime.fromtimestamp(self.clock() - older_than).isoformat()
+        deleted = WorkTask.query.filter(
+            WorkTask.status.in_(('completed', 'failed')), WorkTask.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def get_stats(self) -> Dict[str, Any]:
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in db.session.query(
+            WorkTask.kind, WorkTask.status, func.count(WorkTask.id)
+        ).group_by(WorkTask.kind, WorkTask.status):
+            counts.setdefault(kind, {})[status] = count
+        oldest_pending = db.session.query(func.min(WorkTask.created_at)).filter(
+            WorkTask.status == 'pending').scalar()
+        owners = [row[0] for row in db.session.query(WorkTask.lease_owner).filter(
+            WorkTask.status == 'running', WorkTask.lease_expires_at >= self.clock()).distinct()]
+        return {
+            'budget_denied': self.budget_denied,
+            'lease_seconds': self.lease_seconds,
+            'max_attempts': self.max_attempts,
+            'max_backlog': self.max_backlog,
+            'counts': counts,
+            'oldest_pending': oldest_pending,
+            'active_workers': owners
+        }
+
+
+class ShardWorker:
+    """從任務隊列領取分片並通過 PopmartAPIClient 執行，結果經 MonitorService 寫入數據庫"""
+
+    def __init__(self, monitor_service, queue: WorkQueue, concurrency: int = 4,
+                 kinds: Optional[Iterable[str]] = None, owner: Optional[str] = None):
+        self.monitor_service = monitor_service
+        self.api_client = monitor_service.api_client
+        self.queue = queue
+        self.concurrency = max(concurrency, 1)
+        self.kinds = list(kinds) if kinds else None
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stats = {'completed': 0, 'failed': 0, 'lost': 0}
+
+    async def run_once(self) -> int:
+        """領取並並發執行一批任務，返回領取的任務數"""
+        tasks = self.queue.claim(self.owner, limit=self.concurrency, kinds=self.kinds)
+        if tasks:
+            await asyncio.gather(*(self._run_task(task.id, task.kind, json.loads(task.payload or '{}'))
+                                   for task in tasks))
+        return len(tasks)
+
+    async def run(self, poll_interval: float = 5, should_stop: Callable[[], bool] = lambda: False):
+        """持續領取任務，隊列為空時每 poll_interval 秒檢查一次"""
+        logger.info(f"分片 worker 已啟動: {self.owner} (並發 {self.concurrency})")
+        while not should_stop():
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"領取分片任務失敗: {e}", exc_info=True)
+                claimed = 0
+            if not claimed:
+                await asyncio.sleep(poll_interval)
+        logger.info(f"分片 worker 已停止: {self.owner} {self.stats}")
+
+    async def _run_task(self, task_id: int, kind: str, payload: Dict[str, Any]):
+        try:
+            handler = getattr(self, f'_run_{kind}')
+            result = await handler(task_id, payload)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"分片任務 {task_id} ({kind}) 執行失敗: {e}", exc_info=True)
+            self.queue.fail(task_id, self.owner, str(e))
+            self.stats['failed'] += 1
+            return
+        if self.queue.complete(task_id, self.owner, result):
+            self.stats['completed'] += 1
+        else:
+            # 租約已過期並被其他 worker 接管，結果已寫入但任務記錄歸接管者
+            self.stats['lost'] += 1
+            logger.warning(f"分片任務 {task_id} 的租約已失效")
+
+    async def _run_pages(self, task_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """抓取一段目錄分頁，到達最後一頁時提前結束"""
+        result = {'pages': 0, 'products': 0, 'failed_pages': 0, 'last_page': None}
+        for page in range(payload['start'], payload['end'] + 1):
+            products, meta = await self.api_client.get_products_page(
+                page=page, limit=payload.get('page_size', 100), sort=payload.get('sort', 'newest')
+            )
+            if not meta.get('ok'):
+                result['failed_pages'] += 1
+                continue
+            result['pages'] += 1
+            result['products'] += len(products)
+            if products:
+                await self.monitor_service._process_products(products, f"分片目錄 {page}",
+                                                             seeding=payload.get('seeding', False))
+            if meta.get('is_last_page'):
+                result['last_page'] = page if products else page - 1
+                break
+            self.queue.renew(task_id, self.owner)
+        if result['failed_pages'] and not result['pages']:
+            raise RuntimeError(f"第 {payload['start']}-{payload['end']} 頁全部獲取失敗")
+        return result
+
+    async def _run_inventory(self, task_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """批量查詢一組產品的庫存"""
+        product_ids = payload.get('product_ids', [])
+        inventory = await self.api_client.check_inventory(product_ids)
+        if product_ids and not inventory:
+            raise RuntimeError(f"庫存批量查詢失敗 ({len(product_ids)} 個產品)")
+        changed = await self.monitor_service._apply_inventory(inventory)
+        return {'products': len(inventory), 'changed': changed}
+
+    async def _run_details(self, task_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """並發獲取一組產品的詳情"""
+        product_ids = payload.get('product_ids', [])
+        details = await asyncio.gather(*(self.api_client.get_product_details(product_id)
+                                         for product_id in product_ids))
+        products = [product for product in details if product is not None]
+        if product_ids and not products:
+            raise RuntimeError(f"商品詳情全部獲取失敗 ({len(product_ids)} 個產品)")
+        await self.monitor_service._process_products(products, "分片詳情")
+        return {'products': len(products), 'missing': len(product_ids) - len(products)}
@@ -0,0 +1,59 @@
+"""分片輪詢 worker：從數據庫任務隊列領取目錄分頁、庫存批次與詳情任務並執行
+
+用法: python -m src.worker [--concurrency 4] [--kinds pages,inventory,details] [--poll-interval 5]
+
+可在一台或多台共享同一數據庫的主機上運行任意數量的 worker；
+需要 Web 進程設置 POPMART_WORK_QUEUE=1，規劃器才會寫入任務。
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+
+# worker 進程只執行分片任務，不運行排程器
+os.environ.setdefault('POPMART_SCHEDULER_AUTOSTART', '0')
+
+from src.main import app  # noqa: E402
+from src.services.work_queue import WORK_TASK_KINDS, ShardWorker, WorkQueue  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Popmart 分片輪詢 worker')
+    parser.add_argument('--concurrency', type=int, default=4, help='同時執行的任務數')
+    parser.add_argument('--kinds', default=','.join(WORK_TASK_KINDS), help='只領取指定類型的任務（逗號分隔）')
+    parser.add_argument('--poll-interval', type=float, default=5, help='隊列為空時的檢查間隔（秒）')
+    parser.add_argument('--lease', type=float, default=120, help='任務租約時長（秒）')
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in WORK_TASK_KINDS]
+    if unknown:
+        parser.error(f"未知的任務類型: {', '.join(unknown)}")
+
+    queue = app.monitor_service.work_queue or WorkQueue()
+    queue.lease_seconds = args.lease
+    # 任務的請求預算已由規劃器在寫入時預留，worker 不再按本進程的預算重複限制
+    app.api_client.request_guard = None
+    worker = ShardWorker(app.monitor_service, queue, concurrency=args.concurrency, kinds=kinds)
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    async def run():
+        try:
+            await worker.run(poll_interval=args.poll_interval, should_stop=lambda: bool(stopping))
+        finally:
+            await app.api_client.close_session()
+
+    with app.app_context():
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            logger.info("分片 worker 已中斷")
+
+
+if __name__ == '__main__':
+    main()